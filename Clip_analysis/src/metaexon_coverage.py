@@ -125,8 +125,8 @@ def get_control_exon_information(cnx, exon_type):
     if exon_type != "ALL":
         query = """SELECT gene_id, exon_pos
                    FROM sed
-                   WHERE exon_type LIKE '%{}%'
-                   """.format(exon_type)
+                   WHERE {}
+                   """.format(union_dataset_function.get_exon_type_condition(cnx, exon_type))
     else:
         query = """SELECT  gene_id, exon_pos
                    FROM sed
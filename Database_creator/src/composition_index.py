@@ -0,0 +1,242 @@
+#!/usr/bin/python3.5
+
+"""
+Description:
+
+    This script creates, for every gene of **FasterDB Lite**, a composition index: \
+    the cumulative number of A, C, G and T along the gene sequence. With it, the \
+    composition of any region of a gene is obtained with two lookups, whatever the \
+    size of the region and without reading the gene sequence.
+
+    The index is stored next to **FasterDB Lite**, in a folder ``<base_name>.composition`` \
+    containing:
+
+    * ``prefix_counts.npy``: (uint32 array of shape (total gene length + number of genes, 4)). \
+      For a gene of length L, L + 1 consecutive rows give the number of A, C, G, T in its first \
+      0, 1, ..., L nucleotides.
+    * ``genes.npy``: (int64 array of shape (number of genes, 3)) the id of each gene, the row of \
+      ``prefix_counts.npy`` where its counts start and its length.
+    * ``track_<resolution>.npy``: (float16 array of shape (total number of bins, 4)) the composition \
+      track of every gene at a resolution (50, 500 and 5000 nt): each gene is cut into bins of \
+      ``resolution`` nucleotides (the last one may be shorter) and each row gives the frequency of A, C, \
+      G and T among the defined nucleotides of a bin. The bins of a gene are consecutive, in the order \
+      of ``genes.npy``.
+"""
+
+import os
+import sqlite3
+import numpy as np
+from exon_class import iupac_frequencies
+from packed_sequence import NT_CODE, is_packed, get_sequence
+from database_creator import base_name, out_path
+
+TRACK_RESOLUTIONS = (50, 500, 5000)  # size of the bins of the composition tracks (in nucleotides)
+
+
+def index_folder(fasterdb):
+    """
+    :param fasterdb: (string) path to fasterDB Lite
+    :return: (string) the folder containing the composition index of ``fasterdb``
+    """
+    return os.path.splitext(fasterdb)[0] + ".composition/"
+
+
+def build_composition_index(fasterdb):
+    """
+    Create the composition index of every gene in ``fasterdb``
+
+    :param fasterdb: (string) path to fasterDB Lite
+    :return: (string) the folder containing the composition index
+    """
+    folder = index_folder(fasterdb)
+    if not os.path.isdir(folder):
+        os.mkdir(folder)
+    cnx = sqlite3.connect(fasterdb)
+    cursor = cnx.cursor()
+    packed = is_packed(cnx)
+    if packed:
+        cursor.execute("SELECT COUNT(*), SUM(length) FROM packed_genes;")
+    else:
+        cursor.execute("SELECT COUNT(*), SUM(LENGTH(sequence)) FROM genes;")
+    nb_gene, total_length = cursor.fetchone()
+    prefix_counts = np.lib.format.open_memmap(folder + "prefix_counts.npy", mode="w+", dtype=np.uint32,
+                                              shape=(nb_gene + (total_length or 0), 4))
+    genes = np.zeros((nb_gene, 3), dtype=np.int64)
+    cursor.execute("SELECT id, sequence FROM genes ORDER BY id;")
+    offset = 0
+    for i, (gene_id, sequence) in enumerate(cursor.fetchall() if packed else cursor):
+        if packed:
+            sequence = get_sequence(cnx, gene_id)
+        codes = NT_CODE[np.frombuffer(sequence.encode(), dtype=np.uint8)]
+        for code in range(4):
+            prefix_counts[offset + 1:offset + len(codes) + 1, code] = np.cumsum(codes == code)
+        genes[i] = gene_id, offset, len(codes)
+        offset += len(codes) + 1
+    prefix_counts.flush()
+    np.save(folder + "genes.npy", genes)
+    cnx.close()
+    build_composition_tracks(folder)
+    return folder
+
+
+def gene_bins(lengths, resolution):
+    """
+    :param lengths: (int or numpy array of int) the length of genes
+    :param resolution: (int) the size of the bins
+    :return: (int or numpy array of int) the number of bins of each gene
+    """
+    return (lengths + resolution - 1) // resolution
+
+
+def build_composition_tracks(folder, resolutions=TRACK_RESOLUTIONS):
+    """
+    Create the composition tracks of every gene from its composition index: the counts \
+    of a bin are the difference of two rows of ``prefix_counts.npy``.
+
+    :param folder: (string) the folder containing the composition index (see ``index_folder``)
+    :param resolutions: (tuple of int) the size of the bins of each track
+    """
+    prefix_counts = np.load(folder + "prefix_counts.npy", mmap_mode="r")
+    genes = np.load(folder + "genes.npy")
+    for resolution in resolutions:
+        track = np.lib.format.open_memmap(folder + "track_%s.npy" % resolution, mode="w+", dtype=np.float16,
+                                          shape=(int(gene_bins(genes[:, 2], resolution).sum()), 4))
+        row = 0
+        for gene_id, offset, length in genes:
+            bounds = np.append(np.arange(0, length, resolution), length)
+            counts = prefix_counts[offset + bounds[1:]].astype(np.int64) - prefix_counts[offset + bounds[:-1]]
+            with np.errstate(invalid="ignore"):
+                track[row:row + len(counts)] = counts / counts.sum(axis=1, keepdims=True)
+            row += len(counts)
+        track.flush()
+
+
+class CompositionIndex:
+    """
+    Gives the composition of any region of a gene from the composition index of fasterDB Lite
+    """
+    def __init__(self, fasterdb):
+        """
+        Load the composition index of ``fasterdb``, the counts are memory-mapped, not read.
+
+        :param fasterdb: (string) path to fasterDB Lite
+        """
+        self.fasterdb = fasterdb
+        self.folder = index_folder(fasterdb)
+        self.prefix_counts = np.load(self.folder + "prefix_counts.npy", mmap_mode="r")
+        genes = np.load(self.folder + "genes.npy")
+        self.genes = {int(gene_id): (int(offset), int(length)) for gene_id, offset, length in genes}
+        self.gene_order = genes[:, [0, 2]]
+        self.tracks = {}
+        self.gene_coordinates = None
+
+    def counts(self, gene_id, start, stop):
+        """
+        Get the number of each nucleotide in a region of a gene.
+
+        :param gene_id: (int) the id of a gene
+        :param start: (int) start of the region, its bounds are those of the python \
+        slice ``sequence[start:stop]`` of the gene sequence (0-based, ``stop`` excluded)
+        :param stop: (int) end of the region
+        :return: (list of 4 int) the number of nucleotides A, C, G, T respectively in the region
+        """
+        offset, length = self.genes[gene_id]
+        start, stop, step = slice(start, stop).indices(length)
+        stop = max(start, stop)
+        return list(map(int, self.prefix_counts[offset + stop] - self.prefix_counts[offset + start]))
+
+    def iupac(self, gene_id, start, stop):
+        """
+        Get the iupac frequencies of a region of a gene.
+
+        :param gene_id: (int) the id of a gene
+        :param start: (int) start of the region (see ``counts``)
+        :param stop: (int) end of the region (see ``counts``)
+        :return: (list of float) the frequency of nucleotides A, C, G, T, S, W, R, Y, K, M respectively \
+        or None if the region is empty or if less than 95% of its nucleotides are defined \
+        (see ``exon_class.full_defined``)
+        """
+        offset, length = self.genes[gene_id]
+        start, stop, step = slice(start, stop).indices(length)
+        nt_count = self.counts(gene_id, start, stop)
+        if stop <= start or sum(nt_count) / (stop - start) < 0.95:
+            return None
+        return iupac_frequencies(None, (nt_count, None))
+
+    def track(self, gene_id, resolution=500):
+        """
+        Get the composition track of a gene.
+
+        :param gene_id: (int) the id of a gene
+        :param resolution: (int) the size of the bins of the track (one of ``TRACK_RESOLUTIONS``)
+        :return: (float16 array of shape (number of bins, 4)) the frequency of A, C, G and T in each bin \
+        of ``resolution`` nucleotides of the gene (NaN for the bins without defined nucleotides), \
+        the track is memory-mapped, not read
+        """
+        if resolution not in self.tracks:
+            bins = gene_bins(self.gene_order[:, 1], resolution)
+            offsets = np.cumsum(bins) - bins
+            self.tracks[resolution] = (np.load(self.folder + "track_%s.npy" % resolution, mmap_mode="r"),
+                                       dict(zip(self.gene_order[:, 0].tolist(), offsets.tolist())))
+        track, offsets = self.tracks[resolution]
+        offset = offsets[gene_id]
+        return track[offset:offset + gene_bins(self.genes[gene_id][1], resolution)]
+
+    def gc_track(self, gene_id, resolution=500):
+        """
+        Get the GC track of a gene.
+
+        :param gene_id: (int) the id of a gene
+        :param resolution: (int) the size of the bins of the track (see ``track``)
+        :return: (float32 array) the GC frequency of each bin of ``resolution`` nucleotides of the gene
+        """
+        track = self.track(gene_id, resolution).astype(np.float32)
+        return track[:, 1] + track[:, 2]
+
+    def track_at(self, gene_id, position, resolution=500):
+        """
+        Get the composition of the bin containing a position of a gene.
+
+        :param gene_id: (int) the id of a gene
+        :param position: (int) a position on the gene (0-based, as in ``counts``)
+        :param resolution: (int) the size of the bins of the track (see ``track``)
+        :return: (list of float) the frequency of A, C, G, T and GC in the bin of ``resolution`` nucleotides \
+        containing ``position``
+        """
+        frequencies = self.track(gene_id, resolution)[position // resolution].astype(float).tolist()
+        return frequencies + [frequencies[1] + frequencies[2]]
+
+    def genomic_track_at(self, chromosome, position, resolution=500):
+        """
+        Get the composition of the bin containing a genomic position, for every gene containing it. \
+        The position on a gene is ``position - start_on_chromosome`` if the gene is on the strand 1 \
+        and ``end_on_chromosome - position`` if it is on the strand -1 (the gene sequences are read \
+        in the direction of the gene).
+
+        :param chromosome: (string) a chromosome (ex: ``1``, ``X``)
+        :param position: (int) a position on the chromosome, in the coordinates of the **genes** table
+        :param resolution: (int) the size of the bins of the track (see ``track``)
+        :return: (dictionary of list of float) links the id of every gene containing ``position`` to the \
+        composition of the bin containing it (see ``track_at``)
+        """
+        if self.gene_coordinates is None:
+            cnx = sqlite3.connect(self.fasterdb)
+            cursor = cnx.cursor()
+            cursor.execute("SELECT chromosome, id, strand, start_on_chromosome, end_on_chromosome FROM genes;")
+            self.gene_coordinates = {}
+            for row in cursor.fetchall():
+                self.gene_coordinates.setdefault(row[0], []).append(row[1:])
+            cnx.close()
+            self.gene_coordinates = {key: np.array(value, dtype=np.int64)
+                                     for key, value in self.gene_coordinates.items()}
+        coordinates = self.gene_coordinates.get(chromosome, np.zeros((0, 4), dtype=np.int64))
+        result = {}
+        for gene_id, strand, start, stop in coordinates[(coordinates[:, 2] <= position) &
+                                                        (coordinates[:, 3] >= position)].tolist():
+            gene_position = stop - position if strand == -1 else position - start
+            result[gene_id] = self.track_at(gene_id, gene_position, resolution)
+        return result
+
+
+if __name__ == "__main__":
+    build_composition_index(out_path + base_name)
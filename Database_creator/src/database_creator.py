@@ -155,9 +155,73 @@ def creation_of_force_splicing_table(new_db):
     new_db.commit()
 
 
-def database_creator():
+def creation_of_packed_sequence_tables(new_db):
+    """
+    Create the packed_genes, sequence_blocks and sequence_masks tables in ``new_db``. \
+    They store the gene sequences in the packed layout described in ``packed_sequence``.
+
+    :param new_db: (sqlite3 object) all the info we need to connect to sqlite3
+    """
+    cursor = new_db.cursor()
+    query = """
+    CREATE TABLE packed_genes (
+        id_gene int(10),
+        length int(10) NOT NULL,
+        PRIMARY KEY (id_gene),
+        FOREIGN KEY (id_gene) REFERENCES genes(id)
+    );
+    """
+    cursor.execute(query)
+    query = """
+    CREATE TABLE sequence_blocks (
+        id_gene int(10),
+        block_pos int(10),
+        data BLOB NOT NULL,
+        PRIMARY KEY (id_gene, block_pos),
+        FOREIGN KEY (id_gene) REFERENCES genes(id)
+    );
+    """
+    cursor.execute(query)
+    query = """
+    CREATE TABLE sequence_masks (
+        id_gene int(10) NOT NULL,
+        start_on_gene int(10) NOT NULL,
+        end_on_gene int(10) NOT NULL,
+        nucleotide VARCHAR(1) NOT NULL,
+        FOREIGN KEY (id_gene) REFERENCES genes(id)
+    );
+    """
+    cursor.execute(query)
+    cursor.execute("CREATE INDEX sequence_masks_index ON sequence_masks(id_gene, start_on_gene);")
+    new_db.commit()
+
+
+def creation_of_exon_types_table(new_db):
+    """
+    Create an exon_types table in ``new_db``: one row for each type of each exon \
+    (the column ``exon_type`` of the **exons** table may contain many types separated by a ',').
+
+    :param new_db: (sqlite3 object) all the info we need to connect to sqlite3
+    """
+    cursor = new_db.cursor()
+    query = """
+    CREATE TABLE exon_types (
+        exon_type VARCHAR(3) NOT NULL,
+        id_gene int(10) NOT NULL,
+        pos_on_gene int(10) NOT NULL,
+        PRIMARY KEY(exon_type, id_gene, pos_on_gene),
+        FOREIGN KEY (id_gene, pos_on_gene) REFERENCES exons(id_gene, pos_on_gene)
+    );
+    """
+    cursor.execute(query)
+    new_db.commit()
+
+
+def database_creator(packed=False):
     """
     Create an empty database
+
+    :param packed: (boolean) True to also create the tables of the packed layout of the gene sequences
     """
     new_db = new_db_connection(out_path + base_name)
     creation_of_gene_table(new_db)
@@ -165,6 +229,9 @@ def database_creator():
     creation_of_exon_table(new_db)
     creation_of_full_exon_table(new_db)
     creation_of_force_splicing_table(new_db)
+    creation_of_exon_types_table(new_db)
+    if packed:
+        creation_of_packed_sequence_tables(new_db)
     new_db.close()
     return out_path + base_name
 
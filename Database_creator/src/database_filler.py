@@ -13,68 +13,154 @@ Description:
 
 # sets the environment
 import pymysql
+import pymysql.cursors
 import sqlite3
 import conf
 import database_creator
+import argparse
+import os
+import time
+from packed_sequence import pack_sequence
+from interval_index import create_interval_index
+from memory_budget import BatchBudget, parse_memory_size
 
+# schemas used in the queries of fasterDB, a sqlite stand-in is attached under each of them
+source_schemas = ["fasterdb_humain", "fasterdb_protein", "Nicolas"]
 
 
 # Functions
-def connection():
+def connection(source=None):
     """
-    :return: (pymysql object to connected to the fasterDB database)
+    :param source: (string) None to connect to fasterDB, else a stand-in of fasterDB: the path to \
+    a sqlite database containing the fasterDB tables used by the queries of this script or the path to \
+    a folder containing, for each table filled from fasterDB, a file ``<table>.tsv`` with the rows \
+    of the table (tab separated values, ``\\N`` for NULL values)
+    :return: (pymysql object to connected to the fasterDB database with an unbuffered cursor, \
+    sqlite3 object or string) the connection to the source
     """
-    cnx = pymysql.connect(user=conf.user, password=conf.password, host=conf.host, database=conf.fasterDB)
+    if source is None:
+        cnx = pymysql.connect(user=conf.user, password=conf.password, host=conf.host, database=conf.fasterDB,
+                              cursorclass=pymysql.cursors.SSCursor)
+        return cnx
+    if os.path.isdir(source):
+        return source
+    cnx = sqlite3.connect(source)
+    for schema in source_schemas:
+        cnx.execute("ATTACH DATABASE ? AS %s" % schema, (source,))
     return cnx
 
 
-def fill_gene_table_content(cnx, new_db):
+def get_batches(cnx, query, table, batch_size, max_mem=None):
+    """
+    Get the rows of a query, batch by batch. The rows are streamed from the source: \
+    at most one batch is kept in memory.
+
+    :param cnx: (pymysql object, sqlite3 object or string) connection to the source (see ``connection``)
+    :param query: (string) the query to execute on fasterDB or on its sqlite stand-in
+    :param table: (string) the table filled with the rows (the file ``<table>.tsv`` is read \
+    if the source is a folder of tsv files)
+    :param batch_size: (int) the number of rows in a batch
+    :param max_mem: (int) the memory budget in bytes: the size of each batch is then adjusted \
+    to the memory allocated by the previous one (see ``memory_budget.BatchBudget``), None to keep ``batch_size``
+    :return: (generator of list of tuple) the batches of rows
+    """
+    budget = BatchBudget(batch_size, max_mem)
+    if isinstance(cnx, str):
+        batch = []
+        with open(os.path.join(cnx, table + ".tsv")) as tsv_file:
+            for line in tsv_file:
+                batch.append(tuple(None if value == "\\N" else value
+                                   for value in line.rstrip("\n").split("\t")))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch_size = budget.next_batch_size(len(batch))
+                    batch = []
+        if batch:
+            yield batch
+    else:
+        cursor = cnx.cursor()
+        cursor.execute(query)
+        batch = cursor.fetchmany(batch_size)
+        while batch:
+            yield batch
+            batch_size = budget.next_batch_size(len(batch))
+            batch = cursor.fetchmany(batch_size)
+        cursor.close()
+    budget.stop()
+
+
+def transfer_table(cnx, new_db, query, table, batch_size, max_mem=None):
+    """
+    Fill a table of ``new_db`` with the result of a query on the source, batch by batch, \
+    with one transaction per batch. The throughput of the transfer is printed.
+
+    :param cnx: (pymysql object, sqlite3 object or string) connection to the source (see ``connection``)
+    :param new_db: (sqlite3 object) connection to ``new_db``
+    :param query: (string) the query to execute on fasterDB or on its sqlite stand-in
+    :param table: (string) the table of ``new_db`` to fill
+    :param batch_size: (int) the number of rows inserted per transaction
+    :param max_mem: (int) the memory budget in bytes (see ``get_batches``) or None
+    """
+    start = time.time()
+    cursor = new_db.cursor()
+    insert = None
+    count = 0
+    for batch in get_batches(cnx, query, table, batch_size, max_mem):
+        if insert is None:
+            insert = "INSERT INTO %s VALUES (%s)" % (table, ", ".join(["?"] * len(batch[0])))
+        cursor.executemany(insert, batch)
+        new_db.commit()
+        count += len(batch)
+    duration = time.time() - start
+    print("   %s : %s rows in %s s (%s rows/s)" % (table, count, round(duration, 1),
+                                                   round(count / duration) if duration > 0 else count))
+
+
+def fill_gene_table_content(cnx, new_db, batch_size=1000, max_mem=None):
     """
     Fill the table **genes** in ``new_db``
 
-    :param cnx: (pymysql object) connection to fasterDB human
+    :param cnx: (pymysql object, sqlite3 object or string) connection to fasterDB human \
+    or to its stand-in (see ``connection``)
     :param new_db: (sqlite3 object) connection to ``new_db``
+    :param batch_size: (int) the number of rows inserted per transaction
+    :param max_mem: (int) the memory budget in bytes (see ``get_batches``) or None
     """
-    cursor = cnx.cursor()
     query = """
     SELECT id, official_symbol, chromosome,	strand, start_sur_chromosome, end_sur_chromosome, sequence
     FROM genes;
     """
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor = new_db.cursor()
-    cursor.executemany("INSERT INTO genes VALUES (?, ?, ?, ?, ?, ?, ?)", result)
-    new_db.commit()
+    transfer_table(cnx, new_db, query, "genes", batch_size, max_mem)
 
 
-def fill_intron_table(cnx, new_db):
+def fill_intron_table(cnx, new_db, batch_size=1000, max_mem=None):
     """
     Fill the table **intron** in ``new_db``
 
-    :param cnx: (pymysql object) connection to fasterDB human
+    :param cnx: (pymysql object, sqlite3 object or string) connection to fasterDB human \
+    or to its stand-in (see ``connection``)
     :param new_db: (sqlite3 object) connection to ``new_db``
+    :param batch_size: (int) the number of rows inserted per transaction
+    :param max_mem: (int) the memory budget in bytes (see ``get_batches``) or None
     """
-    cursor = cnx.cursor()
     query = """
     SELECT id_gene, pos_sur_gene, start_sur_gene, end_sur_gene, start_sur_chromosome,
            end_sur_chromosome
     FROM introns_genomiques_bis;
     """
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor = new_db.cursor()
-    cursor.executemany("INSERT INTO introns VALUES (?, ?, ?, ?, ?, ?)", result)
-    new_db.commit()
+    transfer_table(cnx, new_db, query, "introns", batch_size, max_mem)
 
 
-def fill_exon_partial_table(cnx, new_db):
+def fill_exon_partial_table(cnx, new_db, batch_size=1000, max_mem=None):
     """
     Fill the table **exon_partial** in ``new_db``
 
-    :param cnx: (pymysql object) connection to fasterDB human
+    :param cnx: (pymysql object, sqlite3 object or string) connection to fasterDB human \
+    or to its stand-in (see ``connection``)
     :param new_db: (sqlite3 object) connection to ``new_db``
+    :param batch_size: (int) the number of rows inserted per transaction
+    :param max_mem: (int) the memory budget in bytes (see ``get_batches``) or None
     """
-    cursor = cnx.cursor()
     query = """
     SELECT t1.id_gene, t1.pos_sur_gene, t1.start_sur_gene, t1.end_sur_gene, t1.exon_types, t2.fragment_start_on_gene, t2.fragment_end_on_gene, t2.offset_before_exon, t2.offset_after_exon, t1.chromosome, t1.start_sur_chromosome, t1.end_sur_chromosome
     FROM (
@@ -85,54 +171,108 @@ def fill_exon_partial_table(cnx, new_db):
     )t1 LEFT JOIN Nicolas.hsapiens_exonpeptides_filtered t2 ON t1.id_gene = t2.gene_id
     AND t1.pos_sur_gene = t2.exon_position_on_gene;
     """
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor = new_db.cursor()
-    cursor.executemany("INSERT INTO exon_partial VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", result)
-    new_db.commit()
+    transfer_table(cnx, new_db, query, "exon_partial", batch_size, max_mem)
 
 
-def fill_force_table(cnx, new_db):
+def fill_force_table(cnx, new_db, batch_size=1000, max_mem=None):
     """
     Fill the table **force_splicing_site** in ``new_db``
 
-    :param cnx: (pymysql object) connection to fasterDB human
+    :param cnx: (pymysql object, sqlite3 object or string) connection to fasterDB human \
+    or to its stand-in (see ``connection``)
     :param new_db: (sqlite3 object) connection to ``new_db``
+    :param batch_size: (int) the number of rows inserted per transaction
+    :param max_mem: (int) the memory budget in bytes (see ``get_batches``) or None
     """
-    cursor = cnx.cursor()
     query = """
     SELECT id_gene, est_site_donor, exon_pos, `force`
     FROM force_splicing_site WHERE est_alternatif=0
     """
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor = new_db.cursor()
-    cursor.executemany("INSERT INTO force_splicing_site VALUES (?, ?, ?, ?)", result)
-    new_db.commit()
+    transfer_table(cnx, new_db, query, "force_splicing_site", batch_size, max_mem)
 
 
 def fill_exon_genomiques_table(new_db):
     """
-    Fill the table **exon_genomiques** in ``new_db``
+    Fill the table **exon_genomiques** in ``new_db``. The table is filled inside sqlite, \
+    with the help of a temporary index on **force_splicing_site** created for the join. \
+    The duration of each step is printed.
 
     :param new_db: (sqlite3 object) connection to ``new_db``
     """
     cursor = new_db.cursor()
+    start = time.time()
+    cursor.execute("CREATE INDEX force_splicing_site_tmp_index ON force_splicing_site(id_gene, pos_on_gene, is_donor);")
+    print("   index on force_splicing_site created in %s s" % round(time.time() - start, 1))
+    start = time.time()
     query = """
-    SELECT t1.id_gene, t1.pos_on_gene, t1.start_on_gene, t1.end_on_gene, t1.exon_type, t1.cds_start_on_gene, t1.cds_end_on_gene, t1.offset_before_exon, t1.offset_after_exon, t1.force_donor, t2.force as force_acceptor, t1.chromosome, t1.start_on_chromosome, t1.end_on_chromosome
-    FROM(
-        SELECT t1.id_gene, t1.pos_on_gene, t1.start_on_gene, t1.end_on_gene, t1.exon_type, t1.cds_start_on_gene, t1.cds_end_on_gene, t1.offset_before_exon, t1.offset_after_exon, t1.chromosome, t1.start_on_chromosome, t1.end_on_chromosome, t2.force as force_donor
-        FROM exon_partial t1 LEFT JOIN (SELECT * FROM force_splicing_site WHERE is_donor = 1) t2
-        ON t1.id_gene = t2.id_gene
-        AND t1.pos_on_gene = t2.pos_on_gene) t1
-    LEFT JOIN (SELECT * FROM force_splicing_site WHERE is_donor = 0) t2
+    INSERT INTO exons
+    SELECT t1.id_gene, t1.pos_on_gene, t1.start_on_gene, t1.end_on_gene, t1.exon_type, t1.cds_start_on_gene, t1.cds_end_on_gene, t1.offset_before_exon, t1.offset_after_exon, t2.force as force_donor, t3.force as force_acceptor, t1.chromosome, t1.start_on_chromosome, t1.end_on_chromosome
+    FROM exon_partial t1
+    LEFT JOIN force_splicing_site t2
     ON t1.id_gene = t2.id_gene
     AND t1.pos_on_gene = t2.pos_on_gene
+    AND t2.is_donor = 1
+    LEFT JOIN force_splicing_site t3
+    ON t1.id_gene = t3.id_gene
+    AND t1.pos_on_gene = t3.pos_on_gene
+    AND t3.is_donor = 0
     """
     cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.executemany("INSERT INTO exons VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", result)
     new_db.commit()
+    print("   exons table filled with %s rows in %s s" % (cursor.rowcount, round(time.time() - start, 1)))
+    start = time.time()
+    cursor.execute("DROP INDEX force_splicing_site_tmp_index;")
+    new_db.commit()
+    print("   index on force_splicing_site dropped in %s s" % round(time.time() - start, 1))
+
+
+def fill_exon_types_table(new_db):
+    """
+    Fill the table **exon_types** in ``new_db`` from the column ``exon_type`` of the **exons** table: \
+    its types, separated by a ',', are split inside sqlite with a recursive query.
+
+    :param new_db: (sqlite3 object) connection to ``new_db``
+    """
+    cursor = new_db.cursor()
+    query = """
+    WITH RECURSIVE split(id_gene, pos_on_gene, exon_type, rest) AS (
+        SELECT id_gene, pos_on_gene, '', exon_type || ','
+        FROM exons
+        WHERE exon_type IS NOT NULL
+        UNION ALL
+        SELECT id_gene, pos_on_gene, substr(rest, 1, instr(rest, ',') - 1), substr(rest, instr(rest, ',') + 1)
+        FROM split
+        WHERE rest <> ''
+    )
+    INSERT OR IGNORE INTO exon_types
+    SELECT exon_type, id_gene, pos_on_gene
+    FROM split
+    WHERE exon_type <> ''
+    """
+    cursor.execute(query)
+    new_db.commit()
+
+
+def fill_packed_sequence_tables(new_db):
+    """
+    Fill the tables **packed_genes**, **sequence_blocks** and **sequence_masks** in ``new_db`` \
+    from the sequences of the **genes** table. Those sequences are then removed from the **genes** table.
+
+    :param new_db: (sqlite3 object) connection to ``new_db``
+    """
+    read_cursor = new_db.cursor()
+    cursor = new_db.cursor()
+    read_cursor.execute("SELECT id, sequence FROM genes;")
+    for gene_id, sequence in read_cursor:
+        blocks, masks = pack_sequence(sequence)
+        cursor.execute("INSERT INTO packed_genes VALUES (?, ?)", (gene_id, len(sequence)))
+        cursor.executemany("INSERT INTO sequence_blocks VALUES (?, ?, ?)",
+                           [(gene_id, i, block) for i, block in enumerate(blocks)])
+        cursor.executemany("INSERT INTO sequence_masks VALUES (?, ?, ?, ?)",
+                           [(gene_id,) + mask for mask in masks])
+    cursor.execute("UPDATE genes SET sequence = '';")
+    new_db.commit()
+    cursor.execute("VACUUM;")
 
 
 def remove_exon_patial_and_force_splicing_site(new_db):
@@ -146,30 +286,75 @@ def remove_exon_patial_and_force_splicing_site(new_db):
     new_db.commit()
 
 
-def database_maker():
+def database_maker(packed=False, source=None, batch_size=1000, max_mem=None):
     """
+    :param packed: (boolean) True to store the gene sequences in the packed layout \
+    (see ``packed_sequence``), False to store them as text in the **genes** table
+    :param source: (string) None to read the data from fasterDB, else the path to a stand-in \
+    of fasterDB (see ``connection``)
+    :param batch_size: (int) the number of rows transferred per transaction
+    :param max_mem: (int) the memory budget in bytes: the number of rows transferred per transaction \
+    is then adjusted to the memory used, None to keep ``batch_size``
     :return:  Create the fasterDB lite database
     """
     print("database_creation")
-    base_name = database_creator.database_creator()
+    base_name = database_creator.database_creator(packed)
     print("establishing connextion betwwen 2 cards")
     new_db = database_creator.new_db_connection(base_name)
-    cnx = connection()
+    cnx = connection(source)
     print("filling genes content tables")
-    fill_gene_table_content(cnx, new_db)
+    fill_gene_table_content(cnx, new_db, batch_size, max_mem)
     print("filling intron table")
-    fill_intron_table(cnx, new_db)
+    fill_intron_table(cnx, new_db, batch_size, max_mem)
     print("filling partial exon table...")
-    fill_exon_partial_table(cnx, new_db)
+    fill_exon_partial_table(cnx, new_db, batch_size, max_mem)
     print("force table")
-    fill_force_table(cnx, new_db)
+    fill_force_table(cnx, new_db, batch_size, max_mem)
     print("filling full force table")
     fill_exon_genomiques_table(new_db)
     print("removing tables exon_partial and force_splicing_site")
     remove_exon_patial_and_force_splicing_site(new_db)
+    print("filling exon_types table")
+    fill_exon_types_table(new_db)
+    print("creating interval index of exons and introns")
+    create_interval_index(new_db)
+    if packed:
+        print("packing gene sequences")
+        fill_packed_sequence_tables(new_db)
     print("succefully ending...")
-    cnx.close()
+    if not isinstance(cnx, str):
+        cnx.close()
     new_db.close()
 
+
+def launcher():
+    """
+    function that contains a parser to launch the program
+    """
+    # description on how to use the program
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="""
+    Create the fasterDB lite database
+    """)
+    # Arguments for the parser
+    parser.add_argument('--packed', dest='packed',
+                        help="True to store the gene sequences with 2 bits per nucleotide in blocks, "
+                             "False to store them as text",
+                        default="False")
+    parser.add_argument('--source', dest='source',
+                        help="path to a sqlite database or to a folder of tsv files used instead of fasterDB "
+                             "(see the function connection)",
+                        default=None)
+    parser.add_argument('--batch_size', dest='batch_size',
+                        help="number of rows read from fasterDB and inserted per transaction",
+                        default=1000, type=int)
+    parser.add_argument('--max_mem', dest='max_mem',
+                        help="memory budget of the program (ex: 4G, 500M): the number of rows read and inserted "
+                             "per transaction is adjusted to stay below it",
+                        default=None, type=parse_memory_size)
+    args = parser.parse_args()
+    database_maker(args.packed == "True", args.source, args.batch_size, args.max_mem)
+
+
 if __name__ == "__main__":
-    database_maker()
+    launcher()
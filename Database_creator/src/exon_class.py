@@ -10,6 +10,7 @@ Description:
 """
 
 import numpy as np
+from packed_sequence import NT_CODE, is_packed, get_sequence
 
 
 class ExonClassMain:
@@ -17,7 +18,7 @@ class ExonClassMain:
     A class corresponding to an exon. This class allows to \
     extract easily information about and exons and its vicinity sequence.
     """
-    def __init__(self, cnx, gene_name, gene_id, exon_position):
+    def __init__(self, cnx, gene_name, gene_id, exon_position, context=None):
         """
         Initiate the creation of an exon
 
@@ -25,31 +26,42 @@ class ExonClassMain:
         :param gene_name: (string) official symbol for an exons
         :param gene_id: (int) the id of a gene
         :param exon_position:  (int) the position of the exon on the gene
+        :param context: (GeneContext object) data already loaded for the gene ``gene_id`` or None \
+        to get them from fasterDB Lite
         """
-        self.gene = Gene(gene_name, gene_id)
+        if context is None:
+            self.gene = Gene(gene_name, gene_id)
+        else:
+            self.gene = context.gene
         self.position = exon_position
-        length, exon_type, donor, acceptor = self.get_exon_info(cnx)
+        length, exon_type, donor, acceptor = self.get_exon_info(cnx, context)
         self.length = length
         self.acceptor = acceptor
         self.donor = donor
         self.type = exon_type
 
-    def get_exon_info(self, cnx):
+    def get_exon_info(self, cnx, context=None):
         """
         Check if an exon exist
 
         :param cnx: (sqlite3 object) connection to fasterDB Lite
+        :param context: (GeneContext object) data already loaded for the gene of the exon or None
         :return: (int) the length of the exon
         """
-        cursor = cnx.cursor()
-        query = """
-        SELECT end_on_gene - start_on_gene + 1, exon_type, force_donor, force_acceptor
-        FROM exons
-        WHERE id_gene = \"""" + str(self.gene.id) + """\"
-        AND pos_on_gene = """ + str(self.position) + """ ;
-        """
-        cursor.execute(query)
-        result = cursor.fetchone()
+        if context is not None:
+            result = context.exons.get(self.position)
+            if result is not None:
+                result = (result[1] - result[0] + 1,) + result[2:]
+        else:
+            cursor = cnx.cursor()
+            query = """
+            SELECT end_on_gene - start_on_gene + 1, exon_type, force_donor, force_acceptor
+            FROM exons
+            WHERE id_gene = \"""" + str(self.gene.id) + """\"
+            AND pos_on_gene = """ + str(self.position) + """ ;
+            """
+            cursor.execute(query)
+            result = cursor.fetchone()
         if result is None:
             return None, None, None, None
         else:
@@ -64,7 +76,7 @@ class ExonClass(ExonClassMain):
     """
     Contains every data of interest
     """
-    def __init__(self, cnx, gene_name, gene_id, exon_position):
+    def __init__(self, cnx, gene_name, gene_id, exon_position, context=None, neighbour_exons=True):
         """
         Initiate the creation of an exon
 
@@ -72,35 +84,55 @@ class ExonClass(ExonClassMain):
         :param gene_name: (string) official symbol for an exons
         :param gene_id: (int) the id of a gene
         :param exon_position:  (int) the position of the exon on the gene
+        :param context: (GeneContext object) data already loaded for the gene ``gene_id`` or None \
+        to get them from fasterDB Lite
+        :param neighbour_exons: (boolean) True to get the upstream and downstream exons, False if \
+        they are read elsewhere (from the table **exon_neighbours**): ``upstream_exon`` and \
+        ``downstream_exon`` are then None
         """
         printd("Exon " + str(gene_name) + "_" + str(exon_position))
-        ExonClassMain.__init__(self, cnx, gene_name, gene_id, exon_position)
-        self.gene.gene_filler(cnx)
-        iupac, dnt, exon_sequence = self.get_iupac_dnt_exon(cnx)
+        ExonClassMain.__init__(self, cnx, gene_name, gene_id, exon_position, context)
+        if context is None:
+            self.gene.gene_filler(cnx)
+        self.counts = None
+        iupac, dnt, exon_sequence = self.get_iupac_dnt_exon(cnx, context)
         self.iupac = iupac
         self.dnt = dnt
-        self.upstream_exon = ExonClassMain(cnx, gene_name, gene_id, exon_position - 1)
-        self.downstream_exon = ExonClassMain(cnx, gene_name, gene_id, exon_position + 1)
-        self.upstream_intron = Intron(cnx, gene_id, self.position - 1, self.gene.sequence, "upstream", exon_sequence)
-        self.downstream_intron = Intron(cnx, gene_id, self.position, self.gene.sequence, "downstream", exon_sequence)
+        self.upstream_exon = None
+        self.downstream_exon = None
+        if neighbour_exons:
+            self.upstream_exon = ExonClassMain(cnx, gene_name, gene_id, exon_position - 1, context)
+            self.downstream_exon = ExonClassMain(cnx, gene_name, gene_id, exon_position + 1, context)
+        self.upstream_intron = Intron(cnx, gene_id, self.position - 1, self.gene.sequence, "upstream", exon_sequence,
+                                      context)
+        self.downstream_intron = Intron(cnx, gene_id, self.position, self.gene.sequence, "downstream", exon_sequence,
+                                        context)
         # once the exon is fully created we delete the gene sequence for memory efficiency
-        self.gene.sequence = None
+        # (a gene shared through a context is released by the context itself)
+        if context is None:
+            self.gene.sequence = None
         self.iupac_exon_env = None
         self.dnt_exon_env = None
         self.get_environment()
 
-    def get_iupac_dnt_exon(self, cnx):
+    def get_iupac_dnt_exon(self, cnx, context=None):
         """
         Get the iupac and dnt content of the exon
+
+        :param cnx: (sqlite3 object) connection to fasterDB Lite
+        :param context: (GeneContext object) data already loaded for the gene of the exon or None
         :return: (string) the iupac content of the exon
         """
-        cursor = cnx.cursor()
-        query = """SELECT start_on_gene, end_on_gene
-                   FROM exons
-                   WHERE id_gene = """ + str(self.gene.id) + """
-                   AND pos_on_gene = """ + str(self.position) + ";"
-        cursor.execute(query)
-        result = cursor.fetchall()
+        if context is not None:
+            result = [context.exons[self.position][0:2]]
+        else:
+            cursor = cnx.cursor()
+            query = """SELECT start_on_gene, end_on_gene
+                       FROM exons
+                       WHERE id_gene = """ + str(self.gene.id) + """
+                       AND pos_on_gene = """ + str(self.position) + ";"
+            cursor.execute(query)
+            result = cursor.fetchall()
         if len(result) > 1:
             print("More than one exon was retrieve with a sing exon id")
             print("Exiting...")
@@ -110,13 +142,15 @@ class ExonClass(ExonClassMain):
         if start >= stop:
             return None, None, None
         sequence = self.gene.sequence[start:stop]
-        if not full_defined(sequence):
+        counts = composition_counts(sequence)
+        self.counts = region_counts(sequence, counts)
+        if not full_defined(sequence, counts):
             return None, None, None
         printd("Exon sequence:")
         printd(sequence)
-        iupac = iupac_frequencies(sequence)
+        iupac = iupac_frequencies(sequence, counts)
         if len(sequence) > 1:
-            dnt = ";".join(list(map(str, dinucleotide_frequencies(sequence))))
+            dnt = ";".join(list(map(str, dinucleotide_frequencies(sequence, counts))))
         else:
             dnt = None
         return ";".join(list(map(str, iupac))), dnt, sequence
@@ -170,16 +204,19 @@ class Gene:
             print("Exiting...")
             exit(1)
         sequence = result[0][0]
+        if not sequence and is_packed(cnx):
+            sequence = get_sequence(cnx, self.id)
         self.sequence = sequence
         if len(sequence) > 0:
             self.length = len(sequence)
         else:
             self.length = None
-        if full_defined(sequence):
-            iupac = iupac_frequencies(sequence)
+        counts = composition_counts(sequence)
+        if full_defined(sequence, counts):
+            iupac = iupac_frequencies(sequence, counts)
             res = ";".join(list(map(str, iupac)))
             self.iupac = res
-            dnt = dinucleotide_frequencies(sequence)
+            dnt = dinucleotide_frequencies(sequence, counts)
             res = ";".join(list(map(str, dnt)))
             self.dnt = res
         else:
@@ -215,9 +252,68 @@ class Gene:
         self.get_nb_intron_and_median_intron_size(cnx)
 
 
+class GeneContext:
+    """
+    Gathers every data of a gene shared by all its exons: the filled ``Gene`` \
+    (with its sequence), the coordinates of its exons and introns and the composition \
+    of its whole introns. It allows to build the exons of a gene while reading and \
+    analysing the gene only once.
+    """
+    def __init__(self, cnx, gene_name, gene_id):
+        """
+        Load the data of the gene ``gene_id``
+
+        :param cnx: (sqlite3 object) connection to fasterDB Lite
+        :param gene_name: (string) official symbol of the gene
+        :param gene_id: (int) the id of the gene
+        """
+        self.gene = Gene(gene_name, gene_id)
+        self.gene.gene_filler(cnx)
+        self.exons = self.get_gene_exons(cnx)
+        self.introns = self.get_gene_introns(cnx)
+        # composition of whole introns, computed once for the two exons flanking each intron
+        self.intron_composition = {}
+
+    def get_gene_exons(self, cnx):
+        """
+        Get every exon of the gene
+
+        :param cnx: (sqlite3 object) connection to fasterDB Lite
+        :return: (dictionary of tuple) links each exon position to its start and end on gene, \
+        its type, its donor and acceptor forces.
+        """
+        cursor = cnx.cursor()
+        query = """SELECT pos_on_gene, start_on_gene, end_on_gene, exon_type, force_donor, force_acceptor
+                   FROM exons
+                   WHERE id_gene = """ + str(self.gene.id) + ";"
+        cursor.execute(query)
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    def get_gene_introns(self, cnx):
+        """
+        Get every intron of the gene
+
+        :param cnx: (sqlite3 object) connection to fasterDB Lite
+        :return: (dictionary of tuple) links each intron position to its start and end on gene
+        """
+        cursor = cnx.cursor()
+        query = """SELECT pos_on_gene, start_on_gene, end_on_gene
+                   FROM introns
+                   WHERE id_gene = """ + str(self.gene.id) + ";"
+        cursor.execute(query)
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    def release(self):
+        """
+        Delete the gene sequence once every exon of the gene is created, for memory efficiency
+        """
+        self.gene.sequence = None
+        self.intron_composition = {}
+
+
 class Intron:
     """Create an intron"""
-    def __init__(self, cnx, gene_id, pos_on_gene, gene_sequence, location, exon_sequence):
+    def __init__(self, cnx, gene_id, pos_on_gene, gene_sequence, location, exon_sequence, context=None):
         """
 
         :param cnx: (sqlite3 object) allow connection to **FasterDB Lite** database
@@ -226,6 +322,8 @@ class Intron:
         :param gene_sequence: (string) the sequence of the gene, gene_id
         :param location: (string) upstream or downstream
         :param exon_sequence: (string) the sequence of the exon of interest
+        :param context: (GeneContext object) data already loaded for the gene ``gene_id`` or None \
+        to get them from fasterDB Lite
         """
         self.gene_id = gene_id
         self.position = pos_on_gene
@@ -240,27 +338,32 @@ class Intron:
         self.dnt_proxi = None
         self.dnt = None
         self.dnt_ei = None
-        self.get_intron_information(cnx, gene_sequence, exon_sequence)
+        self.counts = {}  # region of the intron -> its length and its nucleotides and di-nucleotides counts
+        self.get_intron_information(cnx, gene_sequence, exon_sequence, context)
 
-    def get_intron_information(self, cnx, gene_seq, exon_sequence):
+    def get_intron_information(self, cnx, gene_seq, exon_sequence, context=None):
         """
         Get the intron size and the iupac composition of distal and proximal sequence
 
         :param cnx: (sqlite3 object) allows connection to **FasterDB Lite** database
         :param gene_seq: (string) the sequence of the gene, gene_id
         :param exon_sequence: (string) the sequence of the interest exons
+        :param context: (GeneContext object) data already loaded for the gene of the intron or None
         :return: The following information is returned
             - length: (int) intron length
             - proximal: (string) the proximal (0:25) frequency in the intron
             - distal: (string)  the proximal (26:100) iupac frequency in the intorn
         """
-        cursor = cnx.cursor()
-        query = """SELECT start_on_gene, end_on_gene
-                   FROM introns
-                   WHERE id_gene = """ + str(self.gene_id) + """
-                   AND pos_on_gene = """ + str(self.position) + ";"
-        cursor.execute(query)
-        result = cursor.fetchall()
+        if context is not None:
+            result = [context.introns[self.position]] if self.position in context.introns else []
+        else:
+            cursor = cnx.cursor()
+            query = """SELECT start_on_gene, end_on_gene
+                       FROM introns
+                       WHERE id_gene = """ + str(self.gene_id) + """
+                       AND pos_on_gene = """ + str(self.position) + ";"
+            cursor.execute(query)
+            result = cursor.fetchall()
         if len(result) > 1:
             print("Error : multiple intron find from a simple intron id")
             print("exiting...")
@@ -272,10 +375,17 @@ class Intron:
         sequence = gene_seq[start:end]
         printd("Intron " + self.location + " sequence : ")
         printd(sequence)
-        if len(sequence) > 0 and full_defined(sequence):
-            self.iupac = ";".join(list(map(str, iupac_frequencies(sequence))))
-        if len(sequence) > 1 and full_defined(sequence):
-            self.dnt = ";".join(list(map(str, dinucleotide_frequencies(sequence))))
+        if context is not None and self.position in context.intron_composition:
+            self.iupac, self.dnt, self.counts["intron"] = context.intron_composition[self.position]
+        else:
+            counts = composition_counts(sequence)
+            self.counts["intron"] = region_counts(sequence, counts)
+            if len(sequence) > 0 and full_defined(sequence, counts):
+                self.iupac = ";".join(list(map(str, iupac_frequencies(sequence, counts))))
+            if len(sequence) > 1 and full_defined(sequence, counts):
+                self.dnt = ";".join(list(map(str, dinucleotide_frequencies(sequence, counts))))
+            if context is not None:
+                context.intron_composition[self.position] = (self.iupac, self.dnt, self.counts["intron"])
         if self.location == "upstream":
             sequence = sequence[::-1]
         proxi_seq = sequence[0:100]
@@ -295,25 +405,41 @@ class Intron:
         printd(proxi_seq2)
         printd("Intron " + self.location + " sequence ppt_seq: ")
         printd(ppt_seq)
-        if len(proxi_seq) > 0 and full_defined(proxi_seq):
-            self.iupac_proxi = ";".join(list(map(str, iupac_frequencies(proxi_seq)))) + ";%s" % (len(proxi_seq))
-        if len(proxi_seq1) > 0 and full_defined(proxi_seq1):
-            self.iupac_adjacent1 = ";".join(list(map(str, iupac_frequencies(proxi_seq1)))) + ";%s" % (len(proxi_seq1))
-        if len(ppt_seq) > 0 and full_defined(ppt_seq):
-            self.iupac_ppt_area = ";".join(list(map(str, iupac_frequencies(ppt_seq)))) + ";%s" % (len(ppt_seq))
-        if len(proxi_seq2) > 0 and full_defined(proxi_seq2):
-            self.iupac_adjacent2 = ";".join(list(map(str, iupac_frequencies(proxi_seq2)))) + ";%s" % (len(proxi_seq2))
-        if len(proxi_seq) > 1 and full_defined(proxi_seq):
-            self.dnt_proxi = ";".join(list(map(str, dinucleotide_frequencies(proxi_seq)))) + ";%s" % (len(proxi_seq))
+        proxi_counts = composition_counts(proxi_seq)
+        adjacent1_counts = composition_counts(proxi_seq1)
+        adjacent2_counts = composition_counts(proxi_seq2)
+        ppt_counts = composition_counts(ppt_seq)
+        self.counts["proxi"] = region_counts(proxi_seq, proxi_counts)
+        self.counts["adjacent1"] = region_counts(proxi_seq1, adjacent1_counts)
+        self.counts["adjacent2"] = region_counts(proxi_seq2, adjacent2_counts)
+        self.counts["ppt_area"] = region_counts(ppt_seq, ppt_counts)
+        if len(proxi_seq) > 0 and full_defined(proxi_seq, proxi_counts):
+            self.iupac_proxi = ";".join(list(map(str, iupac_frequencies(proxi_seq, proxi_counts)))) + \
+                               ";%s" % (len(proxi_seq))
+        if len(proxi_seq1) > 0 and full_defined(proxi_seq1, adjacent1_counts):
+            self.iupac_adjacent1 = ";".join(list(map(str, iupac_frequencies(proxi_seq1, adjacent1_counts)))) + \
+                                   ";%s" % (len(proxi_seq1))
+        if len(ppt_seq) > 0 and full_defined(ppt_seq, ppt_counts):
+            self.iupac_ppt_area = ";".join(list(map(str, iupac_frequencies(ppt_seq, ppt_counts)))) + \
+                                  ";%s" % (len(ppt_seq))
+        if len(proxi_seq2) > 0 and full_defined(proxi_seq2, adjacent2_counts):
+            self.iupac_adjacent2 = ";".join(list(map(str, iupac_frequencies(proxi_seq2, adjacent2_counts)))) + \
+                                   ";%s" % (len(proxi_seq2))
+        if len(proxi_seq) > 1 and full_defined(proxi_seq, proxi_counts):
+            self.dnt_proxi = ";".join(list(map(str, dinucleotide_frequencies(proxi_seq, proxi_counts)))) + \
+                             ";%s" % (len(proxi_seq))
         if proxi_seq is not None and exon_sequence is not None:
             if len(proxi_seq) > 0 and len(exon_sequence) > 0:
                 if self.location == "upstream":
                     exon_intron = proxi_seq + exon_sequence[0:50]
                 else:
                     exon_intron = exon_sequence[-50:] + proxi_seq
-                if full_defined(exon_intron):
-                    self.iupac_ei = ";".join(list(map(str, iupac_frequencies(exon_intron)))) + ";%s" % (len(exon_intron))
-                    self.dnt_ei = ";".join(list(map(str, dinucleotide_frequencies(exon_intron)))) + \
+                ei_counts = composition_counts(exon_intron)
+                self.counts["ei"] = region_counts(exon_intron, ei_counts)
+                if full_defined(exon_intron, ei_counts):
+                    self.iupac_ei = ";".join(list(map(str, iupac_frequencies(exon_intron, ei_counts)))) + \
+                                    ";%s" % (len(exon_intron))
+                    self.dnt_ei = ";".join(list(map(str, dinucleotide_frequencies(exon_intron, ei_counts)))) + \
                                   ";%s" % (len(exon_intron))
                 printd("Exon intron %s jonction sequence" % self.location)
                 printd(exon_intron)
@@ -323,60 +449,90 @@ class Intron:
             self.length = None
 
 
+def composition_counts(sequence):
+    """
+    Count, in one go, the nucleotides A, C, G, T and the di-nucleotides made of them in a sequence.
+
+    :param sequence: (string) a nucleotide sequence
+    :return: (tuple of 2 list of int) the number of nucleotides A, C, G, T respectively and the number \
+    of di-nucleotides AA, AC, AG, AT, CA, CC, CG, CT, GA, GC, GG, GT, TA, TC, TG, TT respectively
+    """
+    codes = NT_CODE[np.frombuffer(sequence.encode(), dtype=np.uint8)]
+    nt_count = np.bincount(codes, minlength=5)[0:4]
+    defined = (codes[:-1] < 4) & (codes[1:] < 4)
+    dnt_count = np.bincount((codes[:-1] * 4 + codes[1:])[defined], minlength=16)
+    # python integers ensure that frequencies are computed and rounded exactly as before
+    return list(map(int, nt_count)), list(map(int, dnt_count))
+
+
+def region_counts(sequence, counts):
+    """
+    Gather the counts of a region, those counts can be added between regions.
+
+    :param sequence: (string) the nucleotide sequence of the region
+    :param counts: (tuple of 2 list of int) the result of ``composition_counts`` for ``sequence``
+    :return: (list of 21 int) the length of the region, the number of nucleotides A, C, G, T and \
+    the number of di-nucleotides AA, AC, ..., TT in the region or None if the region is empty
+    """
+    if len(sequence) == 0:
+        return None
+    return [len(sequence)] + counts[0] + counts[1]
+
+
 # simple function for getting iupac frequencies
-def iupac_frequencies(sequence):
+def iupac_frequencies(sequence, counts=None):
     """
     Get iupac frequencies info for a sequence
 
     :param sequence: (string) a nucleotide sequence
+    :param counts: (tuple of 2 list of int) the result of ``composition_counts`` for \
+    ``sequence`` if already computed
     :return: (list of float) the frequency of nucleotides A, C, G, T, S, W, R, Y, K, M respectively
     """
+    if counts is None:
+        counts = composition_counts(sequence)
+    nt_count = dict(zip("ACGT", counts[0]))
     iupac = {"S": ["C", "G"], "W": ["A", "T"], "R": ["A", "G"],
              "Y": ["C", "T"], "K": ["T", "G"], "M": ["A", "C"]}
     result = []
-    seq_len = sequence.count("A") + sequence.count("T") + sequence.count("G") + sequence.count("C")
+    seq_len = nt_count["A"] + nt_count["T"] + nt_count["G"] + nt_count["C"]
     for nt in ["A", "C", "G", "T", "S", "W", "R", "Y", "K", "M"]:
         if nt not in iupac:
-            result.append(round((float(sequence.count(nt)) / seq_len) * 100, 1))
+            result.append(round((float(nt_count[nt]) / seq_len) * 100, 1))
         else:
-            result.append(round((float(sequence.count(iupac[nt][0]) +
-                                       sequence.count(iupac[nt][1])) / seq_len) * 100, 1))
+            result.append(round((float(nt_count[iupac[nt][0]] +
+                                       nt_count[iupac[nt][1]]) / seq_len) * 100, 1))
     return result
 
 
-def dinucleotide_frequencies(sequence):
+def dinucleotide_frequencies(sequence, counts=None):
     """
     Get di-nucleotides frequencies for a sequence.
 
     :param sequence: (string) a nucleotide sequence
+    :param counts: (tuple of 2 list of int) the result of ``composition_counts`` for \
+    ``sequence`` if already computed
     :return:  (list of float) the frequency of di-nucleotides \
     AA, AC, AG, AT, CA, CC, CG, CT, GA, GC, GG, GT, TA, TC, TG, TT respectively
     """
+    if counts is None:
+        counts = composition_counts(sequence)
+    count = sum(counts[1])
+    return [round(float(dnt_count) / count * 100, 1) for dnt_count in counts[1]]
+
 
-    dnt_list = ["AA", "AC", "AG", "AT", "CA", "CC", "CG", "CT", "GA", "GC", "GG", "GT", "TA", "TC", "TG", "TT"]
-    dnt_dic = {"AA": 0., "AC": 0., "AG": 0., "AT": 0., "CA": 0., "CC": 0., "CG": 0., "CT": 0., "GA": 0.,
-               "GC": 0., "GG": 0., "GT": 0., "TA": 0., "TC": 0., "TG": 0., "TT": 0.}
-    results = []
-    seqlen = len(sequence) - 1
-    count = 0
-    for i in range(seqlen):
-        cdnt = sequence[i] + sequence[i+1]
-        if cdnt in dnt_dic:
-            dnt_dic[cdnt] += 1
-            count += 1
-    for dnt in dnt_list:
-        results.append(round(dnt_dic[dnt] / count * 100, 1))
-    return results
-
-
-def full_defined(sequence):
+def full_defined(sequence, counts=None):
     """
     Says if all the nucleotide are well defined within the sequence
 
     :param sequence: (string) nucleotide sequence
+    :param counts: (tuple of 2 list of int) the result of ``composition_counts`` for \
+    ``sequence`` if already computed
     :return: (boolean) True if all nucleotide are well defined, False else
     """
-    seq_defined = sequence.count("A") + sequence.count("T") + sequence.count("G") + sequence.count("C")
+    if counts is None:
+        counts = composition_counts(sequence)
+    seq_defined = sum(counts[0])
     if seq_defined / len(sequence) >= 0.95:
         return True
     return False
@@ -6,11 +6,38 @@
 
 import exon_class
 import sqlite3
+import hashlib
 from database_creator import base_name, out_path
 import sys
 import re
 import conf
 import pymysql
+import argparse
+import itertools
+import multiprocessing
+import os
+import numpy as np
+from packed_sequence import is_packed, get_sequence
+from memory_budget import BatchBudget, parse_memory_size
+
+coordinates_pattern = re.compile(":|-")  # separators of the coordinates of ASE events (chromosome:start-stop)
+# selection of the exons regulated by a splicing factor (sf_exon_set table), the same as in union_dataset_function.py
+bad_id_projects = [139, 13, 164]  # the projects ignored (group_factor.bad_id_projects)
+delta_psi_threshold = 0.1  # minimum absolute delta psi of a regulated exon
+pvalue_threshold = 0.05  # maximum p-value (pvalue_glm_cor, or pvalue if not available) of a regulated exon
+# the columns of the sed_exon table following gene_id, exon_pos and exon_type
+sed_exon_columns = ["upstream_exon_size", "exon_size", "downstream_exon_size", "upstream_intron_size",
+                    "downstream_intron_size", "force_acceptor_upstream_exon", "force_acceptor",
+                    "force_acceptor_downstream_exon", "force_donor_upstream_exon", "force_donor",
+                    "force_donor_downstream_exon", "iupac_exon", "dnt_exon", "iupac_upstream_intron",
+                    "dnt_upstream_intron", "iupac_upstream_intron_ppt_area", "iupac_upstream_intron_adjacent1",
+                    "iupac_upstream_intron_adjacent2", "iupac_upstream_intron_proxi", "dnt_upstream_intron_proxi",
+                    "iupac_downstream_intron_adjacent1", "iupac_downstream_intron_adjacent2",
+                    "iupac_downstream_intron_proxi", "dnt_downstream_intron_proxi", "iupac_downstream_intron",
+                    "dnt_downstream_intron", "iupac_intron_exon", "dnt_intron_exon", "iupac_exon_intron",
+                    "dnt_exon_intron", "iupac_exon_env", "dnt_exon_env", "relative_donor_upstream",
+                    "relative_donor_downstream", "relative_acceptor_upstream", "relative_acceptor_downstream"]
+
 
 # functions
 def connection_sl():
@@ -21,12 +48,15 @@ def connection_sl():
     return cnx
 
 
-def fasterdbl_connection(fasterdb):
+def fasterdbl_connection(fasterdb, read_only=False):
     """
     :param fasterdb: (string) path to fasterDB database
+    :param read_only: (boolean) True to open fasterDB Lite in read-only mode
 
     Allow connection to fasterDB Lite
     """
+    if read_only:
+        return sqlite3.connect("file:%s?mode=ro" % fasterdb, uri=True)
     return sqlite3.connect(fasterdb)
 
 
@@ -45,33 +75,222 @@ def exon_finder(cnx):
     cursor = cnx.cursor()
     query = """SELECT t2.official_symbol , t1.id_gene, t1.pos_on_gene
                FROM genes t2, exons t1
-               WHERE t2.id = t1.id_gene"""
+               WHERE t2.id = t1.id_gene
+               ORDER BY t1.id_gene, t1.pos_on_gene"""
     cursor.execute(query)
     return cursor.fetchall()
 
 
-def get_exon_info(cnx, info_list, debug):
+def create_exon_neighbours_table(cnx):
     """
-    Get every information we need on an exon
+    Create (or re-create) the helper table **exon_neighbours** in fasterDB lite. For every exon, \
+    it contains the length and the splice site forces of its upstream and downstream exons \
+    and the length of its upstream and downstream introns. They are computed in one pass over \
+    the **exons** table with the window functions ``LAG`` and ``LEAD``.
+
+    :param cnx: (sqlite3 object) allows connection to fasterDB lite
+    """
+    cursor = cnx.cursor()
+    cursor.execute("DROP TABLE IF EXISTS exon_neighbours;")
+    query = """
+    CREATE TABLE exon_neighbours AS
+    SELECT t1.id_gene, t1.pos_on_gene,
+           CASE WHEN t1.upstream_pos = t1.pos_on_gene - 1 AND t1.upstream_length > 0
+                THEN t1.upstream_length END AS upstream_exon_length,
+           CASE WHEN t1.downstream_pos = t1.pos_on_gene + 1 AND t1.downstream_length > 0
+                THEN t1.downstream_length END AS downstream_exon_length,
+           CASE WHEN t2.end_on_gene - t2.start_on_gene + 1 > 0
+                THEN t2.end_on_gene - t2.start_on_gene + 1 END AS upstream_intron_length,
+           CASE WHEN t3.end_on_gene - t3.start_on_gene + 1 > 0
+                THEN t3.end_on_gene - t3.start_on_gene + 1 END AS downstream_intron_length,
+           CASE WHEN t1.upstream_pos = t1.pos_on_gene - 1 THEN t1.upstream_acceptor END AS upstream_exon_acceptor,
+           CASE WHEN t1.downstream_pos = t1.pos_on_gene + 1 THEN t1.downstream_acceptor END AS downstream_exon_acceptor,
+           CASE WHEN t1.upstream_pos = t1.pos_on_gene - 1 THEN t1.upstream_donor END AS upstream_exon_donor,
+           CASE WHEN t1.downstream_pos = t1.pos_on_gene + 1 THEN t1.downstream_donor END AS downstream_exon_donor
+    FROM (
+        SELECT id_gene, pos_on_gene,
+               LAG(pos_on_gene) OVER gene_exons AS upstream_pos,
+               LAG(end_on_gene - start_on_gene + 1) OVER gene_exons AS upstream_length,
+               LAG(force_acceptor) OVER gene_exons AS upstream_acceptor,
+               LAG(force_donor) OVER gene_exons AS upstream_donor,
+               LEAD(pos_on_gene) OVER gene_exons AS downstream_pos,
+               LEAD(end_on_gene - start_on_gene + 1) OVER gene_exons AS downstream_length,
+               LEAD(force_acceptor) OVER gene_exons AS downstream_acceptor,
+               LEAD(force_donor) OVER gene_exons AS downstream_donor
+        FROM exons
+        WINDOW gene_exons AS (PARTITION BY id_gene ORDER BY pos_on_gene)
+    ) t1
+    LEFT JOIN introns t2 ON t2.id_gene = t1.id_gene AND t2.pos_on_gene = t1.pos_on_gene - 1
+    LEFT JOIN introns t3 ON t3.id_gene = t1.id_gene AND t3.pos_on_gene = t1.pos_on_gene
+    ORDER BY t1.id_gene, t1.pos_on_gene;
+    """
+    cursor.execute(query)
+    cursor.execute("CREATE INDEX exon_neighbours_index ON exon_neighbours(id_gene, pos_on_gene);")
+    cnx.commit()
+
+
+def iter_exon_neighbours(cnx, info_list):
+    """
+    Get the row of the table **exon_neighbours** of every exon in ``info_list``
+
+    :param cnx: (sqlite3 object) allows connection to fasterDB lite
+    :param info_list: (list of list of string and int and int) each sublist contains \
+    a string : gene_symbol and 2 int : the gene_id and the exon position on gene respectively, \
+    sorted by gene_id and exon position (see ``exon_finder``)
+    :return: (generator of tuple) the rows of **exon_neighbours**, in the order of ``info_list``
+    """
+    if not info_list:
+        return
+    cursor = cnx.cursor()
+    query = """SELECT * FROM exon_neighbours
+               WHERE id_gene BETWEEN ? AND ?
+               ORDER BY id_gene, pos_on_gene"""
+    cursor.execute(query, (info_list[0][1], info_list[-1][1]))
+    row = cursor.fetchone()
+    for exon_info in info_list:
+        while row is not None and (row[0], row[1]) < (exon_info[1], exon_info[2]):
+            row = cursor.fetchone()
+        if row is None or (row[0], row[1]) != (exon_info[1], exon_info[2]):
+            print("Exon %s_%s not found in the table exon_neighbours" % (exon_info[1], exon_info[2]))
+            print("Exiting...")
+            exit(1)
+        yield row
+
+
+def iter_exon_info(cnx, info_list, debug, neighbour_exons=True):
+    """
+    Get every information we need on an exon, one exon at a time
 
     :param debug: (int) 0 no debug, 1 debug mode
     :param cnx: (sqlite3 object) return all the information we need to connect to FasterDB lite
     :param info_list: (list of list of string and int and int) each sublist contains \
     a string : gene_symbol and 2 int : the gene_id and the exobn position on gene respectively
-    :return: (a list of ExonClass object) list of exons
+    :param neighbour_exons: (boolean) True to get the upstream and downstream exons of each exon, \
+    False if they are read from the table **exon_neighbours** (see ``iter_exon_neighbours``)
+    :return: (generator of ExonClass object) the exons of ``info_list``
     """
     print("Getting exons information !")
-    exon_list = []
     exon_class.set_debug(debug)
     count = 0
     ll = str(len(info_list))
     for exon_info in info_list:
-        exon_list.append(exon_class.ExonClass(cnx, exon_info[0], exon_info[1], exon_info[2]))
+        yield exon_class.ExonClass(cnx, exon_info[0], exon_info[1], exon_info[2], neighbour_exons=neighbour_exons)
         count += 1
         percent = round(float(count) / len(info_list) * 100, 1)
         sys.stdout.write("Progression : " + str(count) + " / " + ll + " - " + str(percent) + " %\r")
         sys.stdout.flush()
-    return exon_list
+
+
+def get_exon_info(cnx, info_list, debug):
+    """
+    Get every information we need on an exon
+
+    :param debug: (int) 0 no debug, 1 debug mode
+    :param cnx: (sqlite3 object) return all the information we need to connect to FasterDB lite
+    :param info_list: (list of list of string and int and int) each sublist contains \
+    a string : gene_symbol and 2 int : the gene_id and the exobn position on gene respectively
+    :return: (a list of ExonClass object) list of exons
+    """
+    return list(iter_exon_info(cnx, info_list, debug))
+
+
+def iter_exon_info_by_gene(cnx, info_list, debug, neighbour_exons=True):
+    """
+    Get every information we need on an exon, gene by gene: the sequence and the composition \
+    of a gene, the coordinates of its exons and introns and the composition of its whole introns \
+    are computed only once and shared by every exon of the gene.
+
+    :param debug: (int) 0 no debug, 1 debug mode
+    :param cnx: (sqlite3 object) return all the information we need to connect to FasterDB lite
+    :param info_list: (list of list of string and int and int) each sublist contains \
+    a string : gene_symbol and 2 int : the gene_id and the exobn position on gene respectively. \
+    The exons of a gene must follow each other in this list (see ``exon_finder``).
+    :param neighbour_exons: (boolean) True to get the upstream and downstream exons of each exon, \
+    False if they are read from the table **exon_neighbours** (see ``iter_exon_neighbours``)
+    :return: (generator of ExonClass object) the exons of ``info_list``, only the \
+    information of the current gene is kept in memory
+    """
+    print("Getting exons information gene by gene !")
+    exon_class.set_debug(debug)
+    count = 0
+    ll = str(len(info_list))
+    for gene_id, gene_exons in itertools.groupby(info_list, key=lambda x: x[1]):
+        gene_exons = list(gene_exons)
+        context = exon_class.GeneContext(cnx, gene_exons[0][0], gene_id)
+        for exon_info in gene_exons:
+            yield exon_class.ExonClass(cnx, exon_info[0], exon_info[1], exon_info[2], context, neighbour_exons)
+            count += 1
+            percent = round(float(count) / len(info_list) * 100, 1)
+            sys.stdout.write("Progression : " + str(count) + " / " + ll + " - " + str(percent) + " %\r")
+            sys.stdout.flush()
+        context.release()
+
+
+def get_exon_info_by_gene(cnx, info_list, debug):
+    """
+    Get every information we need on an exon, gene by gene (see ``iter_exon_info_by_gene``)
+
+    :param debug: (int) 0 no debug, 1 debug mode
+    :param cnx: (sqlite3 object) return all the information we need to connect to FasterDB lite
+    :param info_list: (list of list of string and int and int) each sublist contains \
+    a string : gene_symbol and 2 int : the gene_id and the exobn position on gene respectively. \
+    The exons of a gene must follow each other in this list (see ``exon_finder``).
+    :return: (a list of ExonClass object) list of exons
+    """
+    return list(iter_exon_info_by_gene(cnx, info_list, debug))
+
+
+def relative_force(force, neighbour_force):
+    """
+    :param force: (int) the force of a splice site of an exon
+    :param neighbour_force: (int) the force of the same splice site of a neighbour exon
+    :return: (float) the relative difference (in %) between ``force`` and ``neighbour_force`` \
+    or None if it cannot be computed
+    """
+    if neighbour_force is not None and neighbour_force != 0 and force is not None:
+        return round(((force - neighbour_force) / neighbour_force) * 100, 1)
+    return None
+
+
+def exon_row(exon, neighbours=None):
+    """
+
+    :param exon: (ExonClass object) an exon
+    :param neighbours: (tuple) the row of ``exon`` in the table **exon_neighbours** (see \
+    ``create_exon_neighbours_table``) or None to take the neighbours information from ``exon``
+    :return: (list) **list info exon**: every information of ``exon`` stored in the **sed** table
+    """
+    if neighbours is None:
+        neighbours = [exon.upstream_exon.length, exon.downstream_exon.length,
+                      exon.upstream_intron.length, exon.downstream_intron.length,
+                      exon.upstream_exon.acceptor, exon.downstream_exon.acceptor,
+                      exon.upstream_exon.donor, exon.downstream_exon.donor]
+    else:
+        neighbours = neighbours[2:]
+    (upstream_exon_length, downstream_exon_length, upstream_intron_length, downstream_intron_length,
+     upstream_acceptor, downstream_acceptor, upstream_donor, downstream_donor) = neighbours
+    relative_donor_upstream = relative_force(exon.donor, upstream_donor)
+    relative_donor_downstream = relative_force(exon.donor, downstream_donor)
+    relative_acceptor_upstream = relative_force(exon.acceptor, upstream_acceptor)
+    relative_acceptor_downstream = relative_force(exon.acceptor, downstream_acceptor)
+    cur_list = [exon.gene.name, exon.gene.id, exon.position, exon.type, exon.gene.length,
+                exon.gene.nb_intron, exon.gene.median_intron_size, exon.gene.iupac, exon.gene.dnt,
+                upstream_exon_length, exon.length, downstream_exon_length,
+                upstream_intron_length, downstream_intron_length,
+                upstream_acceptor, exon.acceptor, downstream_acceptor,
+                upstream_donor, exon.donor, downstream_donor, exon.iupac, exon.dnt,
+                exon.upstream_intron.iupac, exon.upstream_intron.dnt, exon.upstream_intron.iupac_ppt_area,
+                exon.upstream_intron.iupac_adjacent1, exon.upstream_intron.iupac_adjacent2,
+                exon.upstream_intron.iupac_proxi, exon.upstream_intron.dnt_proxi,
+                exon.downstream_intron.iupac_adjacent1, exon.downstream_intron.iupac_adjacent2,
+                exon.downstream_intron.iupac_proxi, exon.downstream_intron.dnt_proxi,
+                exon.downstream_intron.iupac, exon.downstream_intron.dnt,
+                exon.upstream_intron.iupac_ei, exon.upstream_intron.dnt_ei,
+                exon.downstream_intron.iupac_ei, exon.downstream_intron.dnt_ei,
+                exon.iupac_exon_env, exon.dnt_exon_env,
+                relative_donor_upstream, relative_donor_downstream, relative_acceptor_upstream,
+                relative_acceptor_downstream]
+    return cur_list
 
 
 def get_exon_tuple(exon_list):
@@ -81,44 +300,41 @@ def get_exon_tuple(exon_list):
     :return: list of **list info exon**. **list info exon** contains every information \
     necessary for an exon.
     """
-    list_tuple = []
-    for exon in exon_list:
-        if exon.upstream_exon.donor is not None and exon.upstream_exon.donor != 0 and exon.donor is not None:
-            relative_donor_upstream = round(((exon.donor - exon.upstream_exon.donor) / exon.upstream_exon.donor) * 100, 1)
-        else:
-            relative_donor_upstream = None
-        if exon.downstream_exon.donor is not None and exon.downstream_exon.donor != 0 and exon.donor is not None:
-            relative_donor_downstream = round(((exon.donor - exon.downstream_exon.donor) / exon.downstream_exon.donor) * 100, 1)
-        else:
-            relative_donor_downstream = None
+    return [exon_row(exon) for exon in exon_list]
 
-        if exon.upstream_exon.acceptor is not None and exon.upstream_exon.acceptor != 0 and exon.acceptor is not None:
-            relative_acceptor_upstream = round(((exon.acceptor - exon.upstream_exon.acceptor) / exon.upstream_exon.acceptor) * 100, 1)
-        else:
-            relative_acceptor_upstream = None
-        if exon.downstream_exon.acceptor is not None and exon.downstream_exon.acceptor != 0 and exon.acceptor is not None:
-            relative_acceptor_downstream = round(((exon.acceptor - exon.downstream_exon.acceptor) / exon.downstream_exon.acceptor) * 100, 1)
-        else:
-            relative_acceptor_downstream = None
-        cur_list = [exon.gene.name, exon.gene.id, exon.position, exon.type, exon.gene.length,
-                    exon.gene.nb_intron, exon.gene.median_intron_size, exon.gene.iupac, exon.gene.dnt,
-                    exon.upstream_exon.length, exon.length, exon.downstream_exon.length,
-                    exon.upstream_intron.length, exon.downstream_intron.length,
-                    exon.upstream_exon.acceptor, exon.acceptor, exon.downstream_exon.acceptor,
-                    exon.upstream_exon.donor, exon.donor, exon.downstream_exon.donor, exon.iupac, exon.dnt,
-                    exon.upstream_intron.iupac, exon.upstream_intron.dnt, exon.upstream_intron.iupac_ppt_area,
-                    exon.upstream_intron.iupac_adjacent1, exon.upstream_intron.iupac_adjacent2,
-                    exon.upstream_intron.iupac_proxi, exon.upstream_intron.dnt_proxi,
-                    exon.downstream_intron.iupac_adjacent1, exon.downstream_intron.iupac_adjacent2,
-                    exon.downstream_intron.iupac_proxi, exon.downstream_intron.dnt_proxi,
-                    exon.downstream_intron.iupac, exon.downstream_intron.dnt,
-                    exon.upstream_intron.iupac_ei, exon.upstream_intron.dnt_ei,
-                    exon.downstream_intron.iupac_ei, exon.downstream_intron.dnt_ei,
-                    exon.iupac_exon_env, exon.dnt_exon_env,
-                    relative_donor_upstream, relative_donor_downstream, relative_acceptor_upstream,
-                    relative_acceptor_downstream]
-        list_tuple.append(cur_list)
-    return list_tuple
+
+def exon_region_counts(exon):
+    """
+    Get the counts of every region of an exon.
+
+    :param exon: (ExonClass object) an exon
+    :return: (list of list) each sublist corresponds to a region of ``exon`` and contains the gene id, \
+    the exon position, the name of the region, its length and its counts of nucleotides and di-nucleotides \
+    (see ``exon_class.region_counts``)
+    """
+    regions = [("exon", exon.counts)]
+    for location, intron in [("upstream", exon.upstream_intron), ("downstream", exon.downstream_intron)]:
+        for region, counts in intron.counts.items():
+            if region == "intron":
+                regions.append(("%s_intron" % location, counts))
+            elif region == "ei":
+                regions.append(("intron_exon" if location == "upstream" else "exon_intron", counts))
+            else:
+                regions.append(("%s_intron_%s" % (location, region), counts))
+    return [[exon.gene.id, exon.position, region] + counts for region, counts in regions if counts is not None]
+
+
+def get_exon_counts(exon_list):
+    """
+    Get the counts of every region of every exon.
+
+    :param exon_list: (a list of ExonClass object) list of exons
+    :return: (list of list) the counts of every region of every exon (see ``exon_region_counts``)
+    """
+    list_counts = []
+    for exon in exon_list:
+        list_counts += exon_region_counts(exon)
+    return list_counts
 
 
 def sed_connection(seddb):
@@ -132,20 +348,29 @@ def sed_connection(seddb):
 
 def create_sed_exon_table(sed_cnx):
     """
+    Create the tables **sed_gene** (the information of every gene, one row per gene) and **sed_exon** \
+    (the information of every exon) and the view **sed** that joins them: it has the columns of the \
+    former **sed** table (one row per exon, with the information of its gene).
+
     :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
     SED database.
     """
     cursor = sed_cnx.cursor()
-    query = """CREATE TABLE sed (
-               gene_symbol VARCHAR(17) NOT NULL,
+    query = """CREATE TABLE sed_gene (
                gene_id INT(10) NOT NULL,
-               exon_pos INT(10) NOT NULL,
-               exon_type VARCHAR(10),
+               gene_symbol VARCHAR(17) NOT NULL,
                gene_size INT(10) NOT NULL,
                nb_intron_gene INT NOT NULL,
                median_intron_size INT,
                iupac_gene VARCHAR(50),
                dnt_gene VARCHAR(80),
+               PRIMARY KEY(gene_id));
+               """
+    cursor.execute(query)
+    query = """CREATE TABLE sed_exon (
+               gene_id INT(10) NOT NULL,
+               exon_pos INT(10) NOT NULL,
+               exon_type VARCHAR(10),
                upstream_exon_size INT,
                exon_size INT,
                downstream_exon_size INT,
@@ -182,12 +407,59 @@ def create_sed_exon_table(sed_cnx):
                relative_donor_downstream FLOAT,
                relative_acceptor_upstream FLOAT,
                relative_acceptor_downstream FLOAT,
-               PRIMARY KEY(gene_id, exon_pos));
+               PRIMARY KEY(gene_id, exon_pos),
+               FOREIGN KEY (gene_id) REFERENCES sed_gene(gene_id));
                """
     cursor.execute(query)
+    query = """CREATE VIEW sed AS
+               SELECT t2.gene_symbol, t1.gene_id, t1.exon_pos, t1.exon_type, t2.gene_size, t2.nb_intron_gene,
+               t2.median_intron_size, t2.iupac_gene, t2.dnt_gene, %s
+               FROM sed_exon t1, sed_gene t2
+               WHERE t1.gene_id = t2.gene_id;
+               """ % ", ".join(["t1.%s" % column for column in sed_exon_columns])
+    cursor.execute(query)
     sed_cnx.commit()
 
 
+def create_sed_counts_table(sed_cnx):
+    """
+    Create the **sed_counts** table: for every region of every exon, its length and its number of nucleotides \
+    and di-nucleotides. Those counts can be added to get the composition of any union of regions.
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    """
+    cursor = sed_cnx.cursor()
+    query = """CREATE TABLE sed_counts (
+               gene_id INT(10) NOT NULL,
+               exon_pos INT(10) NOT NULL,
+               region VARCHAR(30) NOT NULL,
+               length INT NOT NULL,
+               a INT, c INT, g INT, t INT,
+               aa INT, ac INT, ag INT, at INT, ca INT, cc INT, cg INT, ct INT,
+               ga INT, gc INT, gg INT, gt INT, ta INT, tc INT, tg INT, tt INT,
+               PRIMARY KEY(gene_id, exon_pos, region),
+               FOREIGN KEY (gene_id, exon_pos) REFERENCES sed_exon(gene_id, exon_pos));
+               """
+    cursor.execute(query)
+    sed_cnx.commit()
+
+
+def sed_counts_filler(sed_cnx, list_counts, commit=True):
+    """
+    Fill the **sed_counts** table
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    :param list_counts: (list of list) the counts of every region of every exon (see ``get_exon_counts``)
+    :param commit: (boolean) False to leave the transaction open
+    """
+    cursor = sed_cnx.cursor()
+    cursor.executemany("INSERT INTO sed_counts VALUES (%s)" % ", ".join(["?"] * 24), list_counts)
+    if commit:
+        sed_cnx.commit()
+
+
 def creation_rnaseq_projects_table(sed_cnx):
     """
     Create a rnaseq_projects table in ``sed_cnx``
@@ -263,39 +535,520 @@ def creation_ase_event_table(sed_cnx):
         pvalue_glm_cor FLOAT,
         PRIMARY KEY (id),
         FOREIGN KEY (id_project) REFERENCES rnaseq_projects(id),
-        FOREIGN KEY (gene_id, exon_skipped) REFERENCES sed(gene_id, exon_pos)
+        FOREIGN KEY (gene_id, exon_skipped) REFERENCES sed_exon(gene_id, exon_pos)
     );
     """
     cursor.execute(query)
     sed_cnx.commit()
 
 
-def sed_filler(sed_cnx, list_tuple):
+def creation_ase_event_unmapped_table(sed_cnx):
+    """
+    Create an ase_event_unmapped table in ``sed_cnx``: the ASE events that failed to map to an exon \
+    of fasterDB lite, kept to map them again when fasterDB lite changes (see ``update_sed``)
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    """
+    cursor = sed_cnx.cursor()
+    query = """
+    CREATE TABLE ase_event_unmapped (
+        id INT,
+        id_project INT NOT NULL,
+        gene_symbol VARCHAR(20) NOT NULL,
+        exon_skipped INT NOT NULL,
+        chromosome VARCHAR(1) NOT NULL,
+        start INT NOT NULL,
+        stop INT NOT NULL,
+        exons_flanquants VARCHAR(15),
+        delta_psi FLOAT,
+        pvalue FLOAT,
+        pvalue_glm_cor FLOAT,
+        PRIMARY KEY (id),
+        FOREIGN KEY (id_project) REFERENCES rnaseq_projects(id)
+    );
+    """
+    cursor.execute(query)
+    sed_cnx.commit()
+
+
+def has_table(sed_cnx, table):
+    """
+    :param sed_cnx: (sqlite3 object) connection to ``sed database``
+    :param table: (string) the name of a table
+    :return: (boolean) True if ``sed_cnx`` contains the table ``table``
+    """
+    cursor = sed_cnx.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?;", (table,))
+    return cursor.fetchone() is not None
+
+
+def sed_filler(sed_cnx, list_tuple, index=True, commit=True):
     """
-    Fill the **sed table**
+    Fill the **sed_gene** and **sed_exon** tables (**sed** view)
 
     :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
     SED database.
     :param list_tuple: (list of **list info exon**). **list info exon** contains every information \
     necessary for an exon.
+    :param index: (boolean) True to create the index ``sed_index`` once the table is filled
+    :param commit: (boolean) False to leave the transaction open (``index`` must then be False)
+    """
+    cursor = sed_cnx.cursor()
+    # the gene information is stored once, with the first exon of the gene
+    cursor.executemany("INSERT OR IGNORE INTO sed_gene VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       ([row[1], row[0]] + row[4:9] for row in list_tuple))
+    cursor.executemany("INSERT INTO sed_exon VALUES (%s)" % ", ".join(["?"] * (len(sed_exon_columns) + 3)),
+                       (row[1:4] + row[9:] for row in list_tuple))
+    if commit:
+        sed_cnx.commit()
+    if index:
+        create_sed_index(sed_cnx)
+
+
+def sed_stream_filler(sed_cnx, exons, batch_size=1000, index=True, neighbours=None, max_mem=None):
+    """
+    Fill the **sed_gene**, **sed_exon** (read through the **sed** view) and **sed_counts** tables from \
+    a stream of exons. The rows are inserted by batches of ``batch_size`` exons, one transaction per batch, \
+    so only one batch is kept in memory. As the rows of the three tables are committed together, an exon \
+    in the **sed** view is complete.
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    :param exons: (iterable of ExonClass object) the exons to store (see ``iter_exon_info`` and \
+    ``iter_exon_info_by_gene``)
+    :param batch_size: (int) the number of exons inserted per transaction
+    :param index: (boolean) True to create the index ``sed_index`` (on ``sed_gene(gene_symbol)``) \
+    once the tables are filled
+    :param neighbours: (iterable of tuple) the rows of the table **exon_neighbours** of the exons, \
+    in the same order as ``exons`` (see ``iter_exon_neighbours``) or None to take the neighbours \
+    information from the exons
+    :param max_mem: (int) the memory budget in bytes: the number of exons of each batch is then \
+    adjusted to the memory allocated by the previous batch (see ``memory_budget.BatchBudget``), None to keep \
+    ``batch_size``
+    """
+    if neighbours is None:
+        neighbours = itertools.repeat(None)
+    budget = BatchBudget(batch_size, max_mem)
+    list_tuple = []
+    list_counts = []
+    for exon, exon_neighbours in zip(exons, neighbours):
+        list_tuple.append(exon_row(exon, exon_neighbours))
+        list_counts += exon_region_counts(exon)
+        if len(list_tuple) >= batch_size:
+            sed_filler(sed_cnx, list_tuple, index=False, commit=False)
+            sed_counts_filler(sed_cnx, list_counts)
+            batch_size = budget.next_batch_size(len(list_tuple))
+            list_tuple = []
+            list_counts = []
+    if list_tuple:
+        sed_filler(sed_cnx, list_tuple, index=False, commit=False)
+        sed_counts_filler(sed_cnx, list_counts)
+    budget.stop()
+    if index:
+        create_sed_index(sed_cnx)
+
+
+def create_sed_index(sed_cnx):
+    """
+    Create an index on gene_symbol of the **sed_gene** table: the exons of the **sed** view are selected \
+    by gene_symbol and exon_pos through it and the primary key of **sed_exon**
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
     """
     cursor = sed_cnx.cursor()
-    cursor.executemany(
-        "INSERT INTO sed VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        list_tuple)
+    query = """ CREATE INDEX IF NOT EXISTS sed_index on sed_gene(gene_symbol);"""
+    cursor.execute(query)
     sed_cnx.commit()
-    # creation of an index on gene_symbol and exon_pos
-    query = """ CREATE INDEX sed_index on sed(gene_symbol, exon_pos);"""
+
+
+def get_sed_exons(sed_cnx):
+    """
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    :return: (set of tuple of 2 int) the gene id and the position of every exon already in the **sed** table
+    """
+    cursor = sed_cnx.cursor()
+    cursor.execute("SELECT gene_id, exon_pos FROM sed_exon;")
+    return set(cursor.fetchall())
+
+
+def remove_sed_tables(sed_cnx, tables):
+    """
+    Remove some tables of the sed database
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    :param tables: (list of string) the tables to remove
+    """
+    cursor = sed_cnx.cursor()
+    for table in tables:
+        cursor.execute("DROP TABLE IF EXISTS %s;" % table)
+    sed_cnx.commit()
+
+
+def get_composition_columns(sed_cnx):
+    """
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    :return: (list of string) the columns of the **sed** table containing iupac or dnt frequencies
+    """
+    cursor = sed_cnx.cursor()
+    cursor.execute("PRAGMA table_info(sed);")
+    return [column[1] for column in cursor.fetchall() if column[1].startswith(("iupac_", "dnt_"))]
+
+
+def composition_vector(composition):
+    """
+    Turn frequencies separated by a ';' into a float32 vector.
+
+    :param composition: (string) frequency of each nucleotides/dnt separated by a ';' (value of an iupac or \
+    dnt column of the **sed** table)
+    :return: (bytes) the frequencies stored as little-endian float32 values, in the same order
+    """
+    if composition is None:
+        return None
+    return np.array(composition.split(";"), dtype="<f4").tobytes()
+
+
+def fill_sed_composition(sed_cnx, update=False):
+    """
+    Create and fill the table **sed_composition**: it contains, for every exon, the content \
+    of each iupac and dnt column of the **sed** table as a float32 vector (see ``composition_vector``).
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    :param update: (boolean) True if the table **sed_composition** already exists: only the exons \
+    of the **sed** table missing from it are added
+    """
+    columns = get_composition_columns(sed_cnx)
+    cursor = sed_cnx.cursor()
+    condition = ""
+    if update:
+        condition = """WHERE NOT EXISTS (SELECT 1 FROM sed_composition t2
+                                         WHERE t2.gene_id = sed.gene_id AND t2.exon_pos = sed.exon_pos)"""
+    else:
+        query = """CREATE TABLE sed_composition (
+                   gene_id INT(10) NOT NULL,
+                   exon_pos INT(10) NOT NULL,
+                   %s,
+                   PRIMARY KEY(gene_id, exon_pos),
+                   FOREIGN KEY (gene_id, exon_pos) REFERENCES sed_exon(gene_id, exon_pos));
+                   """ % ",\n".join(["%s BLOB" % column for column in columns])
+        cursor.execute(query)
+    read_cursor = sed_cnx.cursor()
+    read_cursor.execute("SELECT gene_id, exon_pos, %s FROM sed %s ORDER BY gene_id, exon_pos;"
+                        % (", ".join(columns), condition))
+    cursor.executemany("INSERT INTO sed_composition VALUES (%s)" % ", ".join(["?"] * (len(columns) + 2)),
+                       ([row[0], row[1]] + [composition_vector(value) for value in row[2:]]
+                        for row in read_cursor))
+    sed_cnx.commit()
+
+
+def fill_sed_exon_types(sed_cnx):
+    """
+    Create (again) and fill the table **sed_exon_types**: one row for each type of each exon of the \
+    **sed** table (the column ``exon_type`` may contain many types separated by a ','). Its primary \
+    key allows to select the exons of a type without scanning the **sed** table.
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    """
+    cursor = sed_cnx.cursor()
+    cursor.execute("DROP TABLE IF EXISTS sed_exon_types;")
+    query = """CREATE TABLE sed_exon_types (
+               exon_type VARCHAR(3) NOT NULL,
+               gene_id INT(10) NOT NULL,
+               exon_pos INT(10) NOT NULL,
+               PRIMARY KEY(exon_type, gene_id, exon_pos),
+               FOREIGN KEY (gene_id, exon_pos) REFERENCES sed_exon(gene_id, exon_pos));
+               """
     cursor.execute(query)
+    query = """WITH RECURSIVE split(gene_id, exon_pos, exon_type, rest) AS (
+                   SELECT gene_id, exon_pos, '', exon_type || ','
+                   FROM sed_exon
+                   WHERE exon_type IS NOT NULL
+                   UNION ALL
+                   SELECT gene_id, exon_pos, substr(rest, 1, instr(rest, ',') - 1),
+                   substr(rest, instr(rest, ',') + 1)
+                   FROM split
+                   WHERE rest <> ''
+               )
+               INSERT OR IGNORE INTO sed_exon_types
+               SELECT exon_type, gene_id, exon_pos
+               FROM split
+               WHERE exon_type <> ''"""
+    cursor.execute(query)
+    sed_cnx.commit()
+
+
+def get_gene_hashes(cnx):
+    """
+    Compute the hash of every gene of fasterDB Lite. The hash of a gene covers everything \
+    its rows of the **sed** table are computed from: its symbol, its sequence and the \
+    coordinates, types and splice site forces of its exons and introns, and everything its ASE \
+    events are mapped with (see ``map_ase_events``): the genomic coordinates of its exons.
+
+    :param cnx: (sqlite3 object) allows connection to fasterDB lite
+    :return: (dictionary of string) links each gene id to its hash
+    """
+    packed = is_packed(cnx)
+    gene_cursor = cnx.cursor()
+    cursor = cnx.cursor()
+    gene_cursor.execute("SELECT id, official_symbol, sequence FROM genes ORDER BY id;")
+    hashes = {}
+    for gene_id, gene_symbol, sequence in gene_cursor:
+        if packed and not sequence:
+            sequence = get_sequence(cnx, gene_id)
+        gene_hash = hashlib.sha1()
+        gene_hash.update(gene_symbol.encode())
+        gene_hash.update(sequence.encode())
+        cursor.execute("""SELECT pos_on_gene, start_on_gene, end_on_gene, exon_type, force_donor, force_acceptor,
+                          chromosome, start_on_chromosome, end_on_chromosome
+                          FROM exons WHERE id_gene = ? ORDER BY pos_on_gene;""", (gene_id,))
+        gene_hash.update(repr(cursor.fetchall()).encode())
+        cursor.execute("""SELECT pos_on_gene, start_on_gene, end_on_gene
+                          FROM introns WHERE id_gene = ? ORDER BY pos_on_gene;""", (gene_id,))
+        gene_hash.update(repr(cursor.fetchall()).encode())
+        hashes[gene_id] = gene_hash.hexdigest()
+    return hashes
+
+
+def create_sed_manifest_table(sed_cnx):
+    """
+    Create the table **sed_manifest**: the hash of every gene of fasterDB Lite used to build the \
+    **sed** table (see ``get_gene_hashes``).
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    """
+    cursor = sed_cnx.cursor()
+    query = """CREATE TABLE sed_manifest (
+               gene_id INT(10) NOT NULL,
+               gene_hash VARCHAR(40) NOT NULL,
+               PRIMARY KEY(gene_id));
+               """
+    cursor.execute(query)
+    sed_cnx.commit()
+
+
+def fill_sed_manifest(sed_cnx, hashes):
+    """
+    Add or replace the hash of genes in the table **sed_manifest**
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    :param hashes: (dictionary of string) links gene ids to their hash
+    """
+    cursor = sed_cnx.cursor()
+    cursor.executemany("INSERT OR REPLACE INTO sed_manifest VALUES (?, ?)", hashes.items())
+    sed_cnx.commit()
+
+
+def remove_sed_genes(sed_cnx, gene_ids):
+    """
+    Remove every row of some genes from the tables **sed**, **sed_counts**, **sed_composition** \
+    and **sed_manifest**.
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    :param gene_ids: (list of int) the ids of the genes to remove
+    """
+    cursor = sed_cnx.cursor()
+    cursor.execute("CREATE TEMP TABLE removed_genes (gene_id INT PRIMARY KEY);")
+    cursor.executemany("INSERT INTO removed_genes VALUES (?)", [(gene_id,) for gene_id in gene_ids])
+    for table in ["sed_exon", "sed_gene", "sed_counts", "sed_composition", "sed_manifest"]:
+        cursor.execute("DELETE FROM %s WHERE gene_id IN (SELECT gene_id FROM removed_genes);" % table)
+    cursor.execute("DROP TABLE removed_genes;")
     sed_cnx.commit()
 
 
-def fill_rnaseq_projects_content(cnx, sed_cnx):
+def update_sed(fasterdblite, seddb, batch_size=1000, debug=0, max_mem=None):
+    """
+    Update an existing sed database after a change of fasterDB Lite: only the genes whose hash \
+    changed (see ``get_gene_hashes``) are computed again, the genes that disappeared are removed. \
+    The ASE events of these genes and the events that were not mapped to any exon are mapped again \
+    (see ``remap_ase_events``) and the table **sf_exon_set** is filled again. The tables **sed**, \
+    **sed_counts**, **sed_composition**, **sed_exon_types**, **sed_manifest**, **ase_event**, \
+    **ase_event_unmapped** and **sf_exon_set** then have the same content as after a full build. \
+    The update is refused if the sed database contains ASE events but not the table **ase_event_unmapped** \
+    (built before it existed): the events that failed to map can't be mapped again.
+
+    :param fasterdblite: (string) path to fasterDB Lite
+    :param seddb: (string) path to a sed database containing the table **sed_manifest**
+    :param batch_size: (int) the number of exons inserted per transaction in the sed table
+    :param debug: (int) 0 no debug, 1 debug mode
+    :param max_mem: (int) the memory budget in bytes (see ``sed_stream_filler``) or None
+    """
+    cnx = fasterdbl_connection(fasterdblite)
+    print("Creation of exon_neighbours table")
+    create_exon_neighbours_table(cnx)
+    print("Computing the hash of every gene")
+    hashes = get_gene_hashes(cnx)
+    sed_cnx = sed_connection(seddb)
+    cursor = sed_cnx.cursor()
+    cursor.execute("SELECT gene_id, gene_hash FROM sed_manifest;")
+    old_hashes = dict(cursor.fetchall())
+    changed = {gene_id: gene_hash for gene_id, gene_hash in hashes.items() if old_hashes.get(gene_id) != gene_hash}
+    removed = [gene_id for gene_id in old_hashes if gene_id not in hashes]
+    print("%s genes changed or added, %s genes removed" % (len(changed), len(removed)))
+    events = has_table(sed_cnx, "ase_event")
+    if events and not has_table(sed_cnx, "ase_event_unmapped") and (changed or removed):
+        print("The sed database doesn't contain the table ase_event_unmapped: the ASE events can't be mapped again")
+        print("Build the sed database again without --incremental")
+        print("Exiting...")
+        exit(1)
+    remove_sed_genes(sed_cnx, list(changed) + removed)
+    info_list = [exon_info for exon_info in exon_finder(cnx) if exon_info[1] in changed]
+    print("Filling sed table")
+    sed_stream_filler(sed_cnx, iter_exon_info_by_gene(cnx, info_list, debug, neighbour_exons=False), batch_size,
+                      index=False, neighbours=iter_exon_neighbours(cnx, info_list), max_mem=max_mem)
+    print("Filling sed_composition table")
+    fill_sed_composition(sed_cnx, update=True)
+    print("Filling sed_exon_types table")
+    fill_sed_exon_types(sed_cnx)
+    fill_sed_manifest(sed_cnx, changed)
+    if events:
+        print("Mapping again the ASE events of the genes changed or removed")
+        remap_ase_events(sed_cnx, fasterdblite, list(changed) + removed)
+        print("Filling sf_exon_set table")
+        fill_sf_exon_set(sed_cnx)
+    cnx.close()
+    sed_cnx.close()
+    print("successfully ended ! ")
+
+
+def gene_partition(info_list, workers):
+    """
+    Split ``info_list`` into ``workers`` blocks of consecutive genes having about the same number of exons.
+
+    :param info_list: (list of list of string and int and int) each sublist contains \
+    a string : gene_symbol and 2 int : the gene_id and the exon position on gene respectively. \
+    The exons of a gene must follow each other in this list (see ``exon_finder``).
+    :param workers: (int) the number of blocks wanted
+    :return: (list of list of list of string and int and int) ``info_list`` split in blocks, \
+    the exons of a gene are never split between two blocks
+    """
+    block_size = len(info_list) / workers
+    partition = [[]]
+    count = 0
+    for gene_id, gene_exons in itertools.groupby(info_list, key=lambda x: x[1]):
+        if count >= block_size * len(partition) and len(partition) < workers:
+            partition.append([])
+        gene_exons = list(gene_exons)
+        partition[-1] += gene_exons
+        count += len(gene_exons)
+    return [block for block in partition if block]
+
+
+def build_sed_shard(shard_info):
+    """
+    Compute the exons information of a block of genes and store them in the **sed** table \
+    of its own shard database. The table **exon_neighbours** of fasterDB Lite must exist \
+    (see ``create_exon_neighbours_table``).
+
+    :param shard_info: (tuple of string, string, list of list of string and int and int, int, int, boolean, \
+    int) the path to fasterDB Lite, the path of the shard database to create, the exons of the block of genes \
+    (see ``gene_partition``), the debug mode, the number of exons inserted per transaction, True \
+    to keep the exons of the block already in the shard database and compute only the missing ones \
+    and the memory budget of the process in bytes (or None)
+    :return: (string) the path of the shard database
+    """
+    fasterdblite, shard_path, info_list, debug, batch_size, resume, max_mem = shard_info
+    if resume and os.path.isfile(shard_path):
+        shard_cnx = sed_connection(shard_path)
+        done = get_sed_exons(shard_cnx)
+        stale = done - {(exon_info[1], exon_info[2]) for exon_info in info_list}
+        for table in ["sed_exon", "sed_counts"]:
+            shard_cnx.executemany("DELETE FROM %s WHERE gene_id = ? AND exon_pos = ?" % table, stale)
+        shard_cnx.execute("DELETE FROM sed_gene WHERE gene_id NOT IN (SELECT gene_id FROM sed_exon);")
+        shard_cnx.commit()
+        info_list = [exon_info for exon_info in info_list if (exon_info[1], exon_info[2]) not in done]
+    else:
+        if os.path.isfile(shard_path):
+            os.remove(shard_path)
+        shard_cnx = sed_connection(shard_path)
+        create_sed_exon_table(shard_cnx)
+        create_sed_counts_table(shard_cnx)
+    cnx = fasterdbl_connection(fasterdblite, read_only=True)
+    sed_stream_filler(shard_cnx, iter_exon_info_by_gene(cnx, info_list, debug, neighbour_exons=False), batch_size,
+                      index=False, neighbours=iter_exon_neighbours(cnx, info_list), max_mem=max_mem)
+    cnx.close()
+    shard_cnx.close()
+    return shard_path
+
+
+def build_sed_shards(fasterdblite, info_list, workers, debug, batch_size=1000, done=None, max_mem=None):
+    """
+    Compute the exons information with a pool of ``workers`` processes, each one working \
+    on its own block of genes with its own read-only connection to fasterDB Lite.
+
+    :param fasterdblite: (string) path to fasterDB Lite
+    :param info_list: (list of list of string and int and int) every exon in fasterDB Lite \
+    (see ``exon_finder``)
+    :param workers: (int) the number of processes to use
+    :param debug: (int) 0 no debug, 1 debug mode
+    :param batch_size: (int) the number of exons inserted per transaction in each shard
+    :param done: (set of tuple of 2 int) the exons already in the **sed** table (see ``get_sed_exons``) \
+    to resume a previous build or None to start a new one. When resuming, only the exons missing \
+    from the **sed** table are computed and the shards keep the exons they already contain.
+    :param max_mem: (int) the memory budget in bytes shared by the processes (or None): each process \
+    adjusts its batches to ``max_mem / workers`` (see ``sed_stream_filler``)
+    :return: (list of string) the shard databases, in the order of ``info_list``
+    """
+    shard_dir = out_path + "sed_shards/"
+    if not os.path.isdir(shard_dir):
+        os.mkdir(shard_dir)
+    shard_infos = []
+    shard_mem = None if max_mem is None else max_mem // workers
+    for i, block in enumerate(gene_partition(info_list, workers)):
+        shard_path = shard_dir + "sed_shard_%s.db" % i
+        if done is not None:
+            block = [exon_info for exon_info in block if (exon_info[1], exon_info[2]) not in done]
+        if block:
+            shard_infos.append((fasterdblite, shard_path, block, debug, batch_size, done is not None, shard_mem))
+        elif os.path.isfile(shard_path):
+            # the shard was merged in the sed table before the build stopped
+            os.remove(shard_path)
+    pool = multiprocessing.Pool(processes=workers)
+    shard_list = pool.map(build_sed_shard, shard_infos)
+    pool.close()
+    pool.join()
+    return shard_list
+
+
+def merge_sed_shards(sed_cnx, shard_list):
+    """
+    Fill the **sed** and **sed_counts** tables with the content of the shard databases and create \
+    the index of **sed**. The shards are removed once merged.
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    :param shard_list: (list of string) the shard databases, in the order of the exons \
+    given by ``exon_finder``
+    """
+    cursor = sed_cnx.cursor()
+    for shard_path in shard_list:
+        cursor.execute("ATTACH DATABASE ? as shard", (shard_path,))
+        cursor.execute("INSERT OR IGNORE INTO sed_gene SELECT * FROM shard.sed_gene ORDER BY rowid;")
+        cursor.execute("INSERT INTO sed_exon SELECT * FROM shard.sed_exon ORDER BY rowid;")
+        cursor.execute("INSERT INTO sed_counts SELECT * FROM shard.sed_counts;")
+        sed_cnx.commit()
+        cursor.execute("DETACH DATABASE shard")
+        os.remove(shard_path)
+    create_sed_index(sed_cnx)
+
+
+def fill_rnaseq_projects_content(cnx, sed_cnx, append=False):
     """
     Fill the table **rnaseq_projects** in ``sed database``.
 
     :param cnx: (pymysql object) connection to splicing lore
     :param sed_cnx: (sqlite3 object) connection to ``sed database``
+    :param append: (boolean) True to add only the projects of splicing lore missing from the table \
+    **rnaseq_projects**
+    :return: (list of tuple) the projects added to the table **rnaseq_projects**
     """
     cursor = cnx.cursor()
     query = """
@@ -308,16 +1061,38 @@ def fill_rnaseq_projects_content(cnx, sed_cnx):
     cursor.execute(query)
     result = cursor.fetchall()
     cursor = sed_cnx.cursor()
+    if append:
+        cursor.execute("SELECT id FROM rnaseq_projects;")
+        known_projects = {row[0] for row in cursor.fetchall()}
+        result = [project for project in result if project[0] not in known_projects]
     cursor.executemany("INSERT INTO rnaseq_projects VALUES (?, ?, ?, ?, ?, ?)", result)
     sed_cnx.commit()
+    return result
+
+
+def parse_ase_events(rows):
+    """
+    Parse the coordinates of ASE events into typed columns.
+
+    :param rows: (iterable of tuple) ASE events of splicing lore: id, id_project, gene_symbol, exon_skipped, \
+    coordinates (``chromosome:start-stop``), exons_flanquants, delta_psi, pvalue, pvalue_glm_cor
+    :return: (generator of list) the same events where the coordinates are replaced by 3 columns: \
+    chromosome (string), start (int) and stop (int)
+    """
+    for row in rows:
+        chromosome, start, stop = coordinates_pattern.split(row[4])
+        yield list(row[0:4]) + [chromosome, int(start), int(stop)] + list(row[5:])
 
 
-def fill_ase_event_tmp_content(cnx, sed_cnx):
+def fill_ase_event_tmp_content(cnx, sed_cnx, id_projects=None):
     """
-    Fill the table **ase_event_tmp** in ``sed database``.
+    Fill the table **ase_event_tmp** in ``sed database``: the ASE events are streamed from \
+    splicing lore and their coordinates parsed once into typed columns (see ``parse_ase_events``).
 
     :param cnx: (pymysql object) connection to splicing lore
     :param sed_cnx: (sqlite3 object) connection to ``sed database``
+    :param id_projects: (list of int) the projects whose events are added, None to add the events of \
+    every project
     """
     cursor = cnx.cursor()
     # selection of ASE events show in splicing Lore.
@@ -328,52 +1103,117 @@ def fill_ase_event_tmp_content(cnx, sed_cnx):
     WHERE t1.id_project = t2.id
     AND t2.show_in_website = 1
     """
+    if id_projects is not None:
+        query += "AND t1.id_project IN (%s)" % ", ".join(map(str, id_projects))
     cursor.execute(query)
-    result = cursor.fetchall()
-    new_result = []
-    for row in result:
-        new_row = [row[i] for i in range(4)]
-        coord = re.split(":|-", row[4])
-        new_row.append(coord[0])
-        new_row.append(int(coord[1]))
-        new_row.append(int(coord[2]))
-        new_row += [row[i] for i in range(5, len(row), 1)]
-        new_result.append(new_row)
-
-    cursor = sed_cnx.cursor()
-    my_tuple = str(tuple((["?"] * len(new_result[0])))).replace("'", "")
-    cursor.executemany("INSERT INTO ase_event_tmp VALUES %s" % my_tuple, new_result)
+    sed_cursor = sed_cnx.cursor()
+    sed_cursor.executemany("INSERT INTO ase_event_tmp VALUES (%s)" % ", ".join(["?"] * 11),
+                           parse_ase_events(cursor))
     sed_cnx.commit()
 
 
-def fill_ase_event_content(sed_cnx, seddb, fasterdblite):
+def get_exon_coordinates_map(fasterdblite):
     """
-    Fill the table **ase_event** in ``sed_cnx``.
+    Get every exon of fasterDB lite with its genomic coordinates.
 
-    :param sed_cnx: (sqlite3 object) connection to ``sed database``
-    :param seddb: (string) path to sed database
     :param fasterdblite: (string) path to fasterdblite database
+    :return: (dictionary of list) links each (chromosome, start, stop) to the exons located there: \
+    list of (gene id, position on gene, gene symbol)
     """
+    cnx = fasterdbl_connection(fasterdblite, read_only=True)
+    cursor = cnx.cursor()
     query = """
-    SELECT t1.id, t1.id_project, t2.id_gene, t1.gene_symbol,
-    t1.exon_skipped, t1.chromosome, t1.start, t1.stop, t1.exons_flanquants, t1.delta_psi, t1.pvalue, t1.pvalue_glm_cor
-    FROM sed.ase_event_tmp t1, fasterdb.exons t2, fasterdb.genes t3
-    WHERE t2.id_gene = t3.id
-    AND t1.chromosome = t2.chromosome
-    AND t1.start = t2.start_on_chromosome
-    AND t1.stop = t2.end_on_chromosome
-    AND t3.official_symbol = t1.gene_symbol
-    AND t1.exon_skipped = t2.pos_on_gene
+    SELECT t1.chromosome, t1.start_on_chromosome, t1.end_on_chromosome, t1.id_gene, t1.pos_on_gene,
+    t2.official_symbol
+    FROM exons t1, genes t2
+    WHERE t1.id_gene = t2.id
+    """
+    cursor.execute(query)
+    coordinates_map = {}
+    for chromosome, start, stop, gene_id, exon_pos, gene_symbol in cursor:
+        coordinates_map.setdefault((chromosome, start, stop), []).append((gene_id, exon_pos, gene_symbol))
+    cnx.close()
+    return coordinates_map
+
+
+def map_ase_events(rows, coordinates_map):
+    """
+    Map ASE events to the exons of fasterDB lite: an event is mapped to the exons having its \
+    coordinates, its gene symbol and its position on gene, through a hash map of the exons coordinates.
+
+    :param rows: (iterable of tuple) ASE events with the columns of the table **ase_event_tmp**
+    :param coordinates_map: (dictionary of list) the exons of fasterDB lite by coordinates \
+    (see ``get_exon_coordinates_map``)
+    :return: (list of tuple, list of tuple) the rows of the table **ase_event** of the events mapped \
+    to an exon and the events that failed to map (columns of **ase_event_tmp**)
     """
+    result = []
+    unmapped = []
+    for row in rows:
+        row = tuple(row)
+        exons = [exon for exon in coordinates_map.get((row[4], row[5], row[6]), [])
+                 if exon[2] == row[2] and exon[1] == row[3]]
+        if not exons:
+            unmapped.append(row)
+        result += [(row[0], row[1], exon[0]) + row[2:] for exon in exons]
+    return result, unmapped
+
 
+def remap_ase_events(sed_cnx, fasterdblite, gene_ids):
+    """
+    Map again, after a change of fasterDB lite, the events of the table **ase_event** mapped to some genes \
+    and the events of the table **ase_event_unmapped** (see ``map_ase_events``): they are removed from both \
+    tables and stored again in the one matching their new mapping.
+
+    :param sed_cnx: (sqlite3 object) connection to ``sed database``
+    :param fasterdblite: (string) path to fasterdblite database
+    :param gene_ids: (list of int) the genes that changed or disappeared from fasterDB lite
+    """
     cursor = sed_cnx.cursor()
-    cursor.execute("ATTACH DATABASE ? as sed", (seddb,))
-    cursor.execute("ATTACH DATABASE ? as fasterdb", (fasterdblite,))
-    cursor.execute(query)
-    result = cursor.fetchall()
-    my_tuple = str(tuple((["?"] * len(result[0])))).replace("'", "")
-    cursor.executemany("INSERT INTO ase_event VALUES %s" % my_tuple, result)
+    cursor.execute("CREATE TEMP TABLE remapped_genes (gene_id INT PRIMARY KEY);")
+    cursor.executemany("INSERT INTO remapped_genes VALUES (?)", [(gene_id,) for gene_id in gene_ids])
+    cursor.execute("""SELECT id, id_project, gene_symbol, exon_skipped, chromosome, start, stop, exons_flanquants,
+                      delta_psi, pvalue, pvalue_glm_cor
+                      FROM ase_event
+                      WHERE gene_id IN (SELECT gene_id FROM remapped_genes)
+                      UNION ALL
+                      SELECT * FROM ase_event_unmapped
+                      ORDER BY id;""")
+    rows = cursor.fetchall()
+    cursor.execute("DELETE FROM ase_event WHERE gene_id IN (SELECT gene_id FROM remapped_genes);")
+    cursor.execute("DELETE FROM ase_event_unmapped;")
+    cursor.execute("DROP TABLE remapped_genes;")
+    result, unmapped = map_ase_events(rows, get_exon_coordinates_map(fasterdblite))
+    print("   %s ASE events mapped to an exon, %s events failed to map" % (len(result), len(unmapped)))
+    cursor.executemany("INSERT INTO ase_event VALUES (%s)" % ", ".join(["?"] * 12), result)
+    cursor.executemany("INSERT INTO ase_event_unmapped VALUES (%s)" % ", ".join(["?"] * 11), unmapped)
     sed_cnx.commit()
+
+
+def fill_ase_event_content(sed_cnx, fasterdblite, index=True):
+    """
+    Fill the table **ase_event** in ``sed_cnx``: each event of the table **ase_event_tmp** is mapped \
+    to the exon of fasterDB lite having the same coordinates, gene symbol and position on gene \
+    (see ``map_ase_events``). The events that fail to map are stored in the table **ase_event_unmapped** \
+    if the sed database contains it.
+
+    :param sed_cnx: (sqlite3 object) connection to ``sed database``
+    :param fasterdblite: (string) path to fasterdblite database
+    :param index: (boolean) True to create the indexes of the tables **ase_event** and **rnaseq_projects** \
+    once the table is filled, False if they already exist (they are then updated in place)
+    :return: (int) the number of events that failed to map to an exon of fasterDB lite
+    """
+    read_cursor = sed_cnx.cursor()
+    read_cursor.execute("SELECT * FROM ase_event_tmp ORDER BY rowid;")
+    result, unmapped = map_ase_events(read_cursor, get_exon_coordinates_map(fasterdblite))
+    print("   %s ASE events mapped to an exon, %s events failed to map" % (len(result), len(unmapped)))
+    cursor = sed_cnx.cursor()
+    cursor.executemany("INSERT INTO ase_event VALUES (%s)" % ", ".join(["?"] * 12), result)
+    if has_table(sed_cnx, "ase_event_unmapped"):
+        cursor.executemany("INSERT INTO ase_event_unmapped VALUES (%s)" % ", ".join(["?"] * 11), unmapped)
+    sed_cnx.commit()
+    if not index:
+        return len(unmapped)
     query = """ CREATE INDEX sed_project on ase_event(id_project);"""
     cursor.execute(query)
     sed_cnx.commit()
@@ -386,6 +1226,7 @@ def fill_ase_event_content(sed_cnx, seddb, fasterdblite):
     query = """ CREATE INDEX project on rnaseq_projects(sf_name, cl_name);"""
     cursor.execute(query)
     sed_cnx.commit()
+    return len(unmapped)
 
 
 def remove_ase_event_tmp(sed_cnx):
@@ -399,35 +1240,228 @@ def remove_ase_event_tmp(sed_cnx):
     sed_cnx.commit()
 
 
-def main():
+def fill_sf_exon_set(sed_cnx):
+    """
+    Create (again) and fill the table **sf_exon_set**: the exons regulated by each splicing factor. An exon is \
+    regulated in a project if its absolute delta psi is at least ``delta_psi_threshold`` and its p-value \
+    (``pvalue_glm_cor``, or ``pvalue`` for the projects without any event selected with ``pvalue_glm_cor``) \
+    is at most ``pvalue_threshold``. The projects in ``bad_id_projects`` are ignored and the exons regulated \
+    in opposite directions by the projects of a splicing factor are removed. Each exon is stored with \
+    its regulation (up or down), the number of projects of the splicing factor regulating it and its rank \
+    (``exon_order``): the exons of a splicing factor sorted by ``exon_order`` are in the order of their first \
+    event, the events being sorted by project id and event id (as in ``union_dataset_function``). \
+    The thresholds and the ignored projects are stored in the table **sf_exon_set_parameters**.
+
+    :param sed_cnx: (sqlite3 object) connection to ``sed database``
+    """
+    cursor = sed_cnx.cursor()
+    cursor.execute("DROP TABLE IF EXISTS sf_exon_set;")
+    cursor.execute("DROP TABLE IF EXISTS sf_exon_set_parameters;")
+    query = """
+    CREATE TABLE sf_exon_set_parameters (
+        delta_psi_threshold FLOAT NOT NULL,
+        pvalue_threshold FLOAT NOT NULL,
+        bad_id_projects VARCHAR(100) NOT NULL
+    );
+    """
+    cursor.execute(query)
+    cursor.execute("INSERT INTO sf_exon_set_parameters VALUES (?, ?, ?)",
+                   (delta_psi_threshold, pvalue_threshold, ",".join(map(str, sorted(bad_id_projects)))))
+    query = """
+    CREATE TABLE sf_exon_set (
+        sf_name VARCHAR(25) NOT NULL,
+        regulation VARCHAR(4) NOT NULL,
+        gene_id INT NOT NULL,
+        exon_pos INT NOT NULL,
+        n_projects INT NOT NULL,
+        exon_order INT NOT NULL,
+        PRIMARY KEY (sf_name, regulation, gene_id, exon_pos)
+    );
+    """
+    cursor.execute(query)
+    query = """
+    INSERT INTO sf_exon_set
+    WITH glm_projects AS (
+        SELECT DISTINCT id_project
+        FROM ase_event
+        WHERE (delta_psi >= {0} OR delta_psi <= -{0})
+        AND pvalue_glm_cor <= {1}
+    ),
+    events AS (
+        SELECT t1.sf_name, t2.id_project, t2.gene_id, t2.exon_skipped,
+               CASE WHEN t2.delta_psi < 0 THEN 'down' ELSE 'up' END AS regulation,
+               ROW_NUMBER() OVER (ORDER BY t1.id, t2.id) AS event_order
+        FROM rnaseq_projects t1, ase_event t2
+        WHERE t1.id = t2.id_project
+        AND t1.id NOT IN ({2})
+        AND (t2.delta_psi >= {0} OR t2.delta_psi <= -{0})
+        AND ((t2.id_project IN (SELECT id_project FROM glm_projects) AND t2.pvalue_glm_cor <= {1})
+             OR (t2.id_project NOT IN (SELECT id_project FROM glm_projects) AND t2.pvalue <= {1}))
+    )
+    SELECT sf_name, MIN(regulation), gene_id, exon_skipped, COUNT(DISTINCT id_project), MIN(event_order)
+    FROM events
+    GROUP BY sf_name, gene_id, exon_skipped
+    HAVING COUNT(DISTINCT regulation) = 1
+    """.format(delta_psi_threshold, pvalue_threshold, ", ".join(map(str, bad_id_projects)))
+    cursor.execute(query)
+    sed_cnx.commit()
+
+
+def create_rnaseq_projects_updates_table(sed_cnx):
+    """
+    Create, if it doesn't exist, the table **rnaseq_projects_updates**: the projects added to an \
+    existing sed database (see ``append_rnaseq_projects``), with their splicing factor and the date \
+    they were added.
+
+    :param sed_cnx: (sqlite3 object) contains every information we need to connect to \
+    SED database.
+    """
+    cursor = sed_cnx.cursor()
+    query = """
+    CREATE TABLE IF NOT EXISTS rnaseq_projects_updates (
+        id_project INT NOT NULL,
+        sf_name VARCHAR(25) NOT NULL,
+        cl_name VARCHAR(25) NOT NULL,
+        update_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id_project),
+        FOREIGN KEY (id_project) REFERENCES rnaseq_projects(id)
+    );
+    """
+    cursor.execute(query)
+    sed_cnx.commit()
+
+
+def append_rnaseq_projects(fasterdblite, seddb):
+    """
+    Add to an existing sed database the projects of splicing lore it doesn't contain yet: their events \
+    are mapped to the exons and added to the table **ase_event** (its indexes are updated in place) and the \
+    table **sf_exon_set** is filled again. The new projects are recorded in the table **rnaseq_projects_updates** so that the results \
+    computed for their splicing factors can be refreshed selectively.
+
+    :param fasterdblite: (string) path to fasterDB Lite
+    :param seddb: (string) path to sed database
+    :return: (list of string) the splicing factors of the added projects
+    """
+    cnx = connection_sl()
+    sed_cnx = sed_connection(seddb)
+    print("Adding the new projects to rnaseq_projects table")
+    projects = fill_rnaseq_projects_content(cnx, sed_cnx, append=True)
+    print("   %s new projects" % len(projects))
+    splicing_factors = sorted({project[4] for project in projects})
+    if projects:
+        remove_sed_tables(sed_cnx, ["ase_event_tmp"])
+        creation_ase_event_tmp_table(sed_cnx)
+        print("Filling ase_event_tmp table")
+        fill_ase_event_tmp_content(cnx, sed_cnx, [project[0] for project in projects])
+        print("Adding the events of the new projects to ase_event table")
+        fill_ase_event_content(sed_cnx, fasterdblite, index=False)
+        remove_ase_event_tmp(sed_cnx)
+        create_rnaseq_projects_updates_table(sed_cnx)
+        cursor = sed_cnx.cursor()
+        cursor.executemany("INSERT INTO rnaseq_projects_updates (id_project, sf_name, cl_name) VALUES (?, ?, ?)",
+                           [(project[0], project[4], project[5]) for project in projects])
+        sed_cnx.commit()
+        print("Filling sf_exon_set table")
+        fill_sf_exon_set(sed_cnx)
+        print("Splicing factors with new projects: %s" % ", ".join(splicing_factors))
+    cnx.close()
+    sed_cnx.close()
+    return splicing_factors
+
+
+def main(by_gene=True, workers=1, batch_size=1000, incremental=False, resume=False, append_projects=False,
+         max_mem=None):
+    """
+    Create the sed database
+
+    :param by_gene: (boolean) True to compute the exons information gene by gene, \
+    False to compute them exon by exon
+    :param workers: (int) the number of processes used to compute the exons information. \
+    If greater than 1, the exons information are computed gene by gene.
+    :param batch_size: (int) the number of exons inserted per transaction in the sed table
+    :param incremental: (boolean) True to update an existing sed database instead of creating it \
+    (see ``update_sed``)
+    :param resume: (boolean) True to resume a build that stopped: the exons already in the **sed** \
+    table are kept and only the missing ones are computed
+    :param append_projects: (boolean) True to only add the new projects of splicing lore to an existing \
+    sed database (see ``append_rnaseq_projects``)
+    :param max_mem: (int) the memory budget in bytes: the number of exons inserted per transaction is then \
+    adjusted to the memory used, None to keep ``batch_size``
+    """
     # debug mode
     debug = 0  # 1 = enabled , 0 disabled
     fasterdblite = out_path + base_name
     seddb = out_path + "sed_new.db"
+    if incremental:
+        update_sed(fasterdblite, seddb, batch_size, debug, max_mem)
+        return
+    if append_projects:
+        append_rnaseq_projects(fasterdblite, seddb)
+        return
     cnx = fasterdbl_connection(out_path + base_name)
     info_list = exon_finder(cnx)
     # info_list = info_list[0:2]
-    exon_list = get_exon_info(cnx, info_list, debug)
-    list_tuple = get_exon_tuple(exon_list)
-    cnx.close()
+    print("Creation of exon_neighbours table")
+    create_exon_neighbours_table(cnx)
+    print("Computing the hash of every gene")
+    hashes = get_gene_hashes(cnx)
+    shard_list = None
+    done = None
+    if resume and os.path.isfile(seddb):
+        sed_cnx = sed_connection(seddb)
+        done = get_sed_exons(sed_cnx)
+        sed_cnx.close()
+        print("Resuming the build: %s exons already in the sed table" % len(done))
+    if workers > 1:
+        cnx.close()
+        shard_list = build_sed_shards(fasterdblite, info_list, workers, debug, batch_size, done, max_mem)
+    elif done is not None:
+        info_list = [exon_info for exon_info in info_list if (exon_info[1], exon_info[2]) not in done]
+    fasterdb_cnx = cnx
     cnx = connection_sl()
     sed_cnx = sed_connection(seddb)
-    print("Creation of SED table")
-    create_sed_exon_table(sed_cnx)
+    if done is None:
+        print("Creation of SED table")
+        create_sed_exon_table(sed_cnx)
+        create_sed_counts_table(sed_cnx)
+    else:
+        remove_sed_tables(sed_cnx, ["sed_composition", "sed_exon_types", "sed_manifest", "rnaseq_projects",
+                                    "rnaseq_projects_updates", "ase_event_tmp", "ase_event",
+                                    "ase_event_unmapped", "sf_exon_set", "sf_exon_set_parameters"])
     print("Creation of rnaseq_projects table")
     creation_rnaseq_projects_table(sed_cnx)
     print("Creation of ase_event_tmp table")
     creation_ase_event_tmp_table(sed_cnx)
     print("Creation of ase_event table")
     creation_ase_event_table(sed_cnx)
+    print("Creation of ase_event_unmapped table")
+    creation_ase_event_unmapped_table(sed_cnx)
     print("Filling sed table")
-    sed_filler(sed_cnx, list_tuple)
+    if shard_list is not None:
+        merge_sed_shards(sed_cnx, shard_list)
+    else:
+        if by_gene:
+            exons = iter_exon_info_by_gene(fasterdb_cnx, info_list, debug, neighbour_exons=False)
+        else:
+            exons = iter_exon_info(fasterdb_cnx, info_list, debug, neighbour_exons=False)
+        sed_stream_filler(sed_cnx, exons, batch_size, neighbours=iter_exon_neighbours(fasterdb_cnx, info_list),
+                          max_mem=max_mem)
+        fasterdb_cnx.close()
+    print("Filling sed_composition table")
+    fill_sed_composition(sed_cnx)
+    print("Filling sed_exon_types table")
+    fill_sed_exon_types(sed_cnx)
+    print("Filling sed_manifest table")
+    create_sed_manifest_table(sed_cnx)
+    fill_sed_manifest(sed_cnx, hashes)
     print("Filling rnaseq_projects table")
     fill_rnaseq_projects_content(cnx, sed_cnx)
     print("Filling ase_event_tmp table")
     fill_ase_event_tmp_content(cnx, sed_cnx)
     print("Filling ase_event table")
-    fill_ase_event_content(sed_cnx, seddb, fasterdblite)
+    fill_ase_event_content(sed_cnx, fasterdblite)
+    print("Filling sf_exon_set table")
+    fill_sf_exon_set(sed_cnx)
     print("Removing ase_event_tmp table")
     remove_ase_event_tmp(sed_cnx)
     print("closing connections")
@@ -436,5 +1470,48 @@ def main():
     print("successfully ended ! ")
 
 
+def launcher():
+    """
+    function that contains a parser to launch the program
+    """
+    # description on how to use the program
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="""
+    Create the sed database from fasterDB Lite and splicing lore databases
+    """)
+    # Arguments for the parser
+    parser.add_argument('--by_gene', dest='by_gene',
+                        help="True to compute the exons information gene by gene (each gene sequence is read "
+                             "and analysed once), False to compute them exon by exon",
+                        default="True")
+    parser.add_argument('--workers', dest='workers',
+                        help="number of processes used to compute the exons information, the genes are split "
+                             "between them and their results merged in the sed table",
+                        default=1, type=int)
+    parser.add_argument('--batch_size', dest='batch_size',
+                        help="number of exons inserted per transaction in the sed table, the exons are computed "
+                             "and stored as a stream so only one batch is kept in memory",
+                        default=1000, type=int)
+    parser.add_argument('--incremental', dest='incremental',
+                        help="True to update the existing sed database: only the genes of fasterDB Lite that "
+                             "changed since the last build are computed again",
+                        default="False")
+    parser.add_argument('--resume', dest='resume',
+                        help="True to resume a build of the sed database that stopped: the exons already stored "
+                             "are kept and only the missing ones are computed",
+                        default="False")
+    parser.add_argument('--append_projects', dest='append_projects',
+                        help="True to only add to the existing sed database the projects of splicing lore it "
+                             "doesn't contain yet",
+                        default="False")
+    parser.add_argument('--max_mem', dest='max_mem',
+                        help="memory budget of the program (ex: 4G, 500M), shared by the workers: the number of "
+                             "exons inserted per transaction is adjusted to stay below it",
+                        default=None, type=parse_memory_size)
+    args = parser.parse_args()
+    main(args.by_gene == "True", args.workers, args.batch_size, args.incremental == "True",
+         args.resume == "True", args.append_projects == "True", args.max_mem)
+
+
 if __name__ == "__main__":
-    main()
+    launcher()
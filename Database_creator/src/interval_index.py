@@ -0,0 +1,143 @@
+#!/usr/bin/python3.5
+
+"""
+Description:
+
+    This script creates, in **FasterDB Lite**, an interval index over the genomic coordinates \
+    of the exons and the introns. With it, every exon or intron overlapping a genomic interval \
+    is found with a search in a R*Tree, without scanning the **exons** and **introns** tables.
+
+    The index is made of three tables:
+
+    * ``interval_chromosomes``: the code (``id``) of each chromosome.
+    * ``interval_features``: one row (``id``) for each exon and each intron: its type (``feature``: \
+      exon or intron), its gene (``id_gene``) and its position on the gene (``pos_on_gene``).
+    * ``interval_index``: a R*Tree virtual table giving, for each row of ``interval_features``, \
+      the code of its chromosome and its coordinates on the chromosome.
+"""
+
+import sqlite3
+from database_creator import base_name, out_path
+
+
+def create_interval_index(cnx):
+    """
+    Create (again) the interval index of the exons and the introns of fasterDB Lite.
+
+    :param cnx: (sqlite3 object) connection to fasterDB Lite
+    """
+    cursor = cnx.cursor()
+    for table in ["interval_index", "interval_features", "interval_chromosomes"]:
+        cursor.execute("DROP TABLE IF EXISTS %s;" % table)
+    query = """
+    CREATE TABLE interval_chromosomes (
+        id INTEGER PRIMARY KEY,
+        chromosome VARCHAR(2) NOT NULL UNIQUE
+    );
+    """
+    cursor.execute(query)
+    query = """
+    CREATE TABLE interval_features (
+        id INTEGER PRIMARY KEY,
+        feature VARCHAR(6) NOT NULL,
+        id_gene int(10) NOT NULL,
+        pos_on_gene int(10) NOT NULL
+    );
+    """
+    cursor.execute(query)
+    cursor.execute("CREATE VIRTUAL TABLE interval_index USING rtree_i32(id, chromosome_min, chromosome_max, "
+                   "start_on_chromosome, end_on_chromosome);")
+    query = """
+    INSERT INTO interval_chromosomes (chromosome)
+    SELECT chromosome FROM genes
+    UNION
+    SELECT chromosome FROM exons WHERE chromosome IS NOT NULL
+    """
+    cursor.execute(query)
+    query = """
+    CREATE TEMP TABLE interval_tmp AS
+    SELECT 'exon' AS feature, id_gene, pos_on_gene, chromosome, start_on_chromosome, end_on_chromosome
+    FROM exons
+    WHERE chromosome IS NOT NULL
+    AND start_on_chromosome IS NOT NULL
+    AND end_on_chromosome IS NOT NULL
+    UNION ALL
+    SELECT 'intron', t1.id_gene, t1.pos_on_gene, t2.chromosome, t1.start_on_chromosome, t1.end_on_chromosome
+    FROM introns t1, genes t2
+    WHERE t1.id_gene = t2.id
+    ORDER BY feature, id_gene, pos_on_gene
+    """
+    cursor.execute(query)
+    cursor.execute("INSERT INTO interval_features SELECT rowid, feature, id_gene, pos_on_gene FROM interval_tmp;")
+    query = """
+    INSERT INTO interval_index
+    SELECT t1.rowid, t2.id, t2.id, MIN(t1.start_on_chromosome, t1.end_on_chromosome),
+    MAX(t1.start_on_chromosome, t1.end_on_chromosome)
+    FROM interval_tmp t1, interval_chromosomes t2
+    WHERE t1.chromosome = t2.chromosome
+    """
+    cursor.execute(query)
+    cursor.execute("DROP TABLE interval_tmp;")
+    cnx.commit()
+
+
+class IntervalIndex:
+    """
+    Gives the exons and the introns of fasterDB Lite overlapping a genomic interval
+    """
+    def __init__(self, fasterdb):
+        """
+        Connection to the interval index of ``fasterdb``.
+
+        :param fasterdb: (string) path to fasterDB Lite (containing the interval index, \
+        see ``create_interval_index``)
+        """
+        self.cnx = sqlite3.connect(fasterdb)
+        cursor = self.cnx.cursor()
+        cursor.execute("SELECT chromosome, id FROM interval_chromosomes;")
+        self.chromosomes = dict(cursor.fetchall())
+
+    def overlapping(self, chromosome, start, stop, feature=None):
+        """
+        Get every exon or intron overlapping a genomic interval.
+
+        :param chromosome: (string) the chromosome of the interval (ex: ``1``, ``X``)
+        :param start: (int) start of the interval, in the coordinates of the columns \
+        ``start_on_chromosome`` and ``end_on_chromosome`` of fasterDB Lite (bounds included)
+        :param stop: (int) end of the interval (included)
+        :param feature: (string) ``exon`` or ``intron`` to get only one type of feature, None to get both
+        :return: (list of tuple) the type (exon or intron), the gene id, the position on the gene, \
+        the start and the end on the chromosome of every feature overlapping the interval, sorted by start
+        """
+        if chromosome not in self.chromosomes:
+            return []
+        query = """SELECT t2.feature, t2.id_gene, t2.pos_on_gene, t1.start_on_chromosome, t1.end_on_chromosome
+                   FROM interval_index t1, interval_features t2
+                   WHERE t1.id = t2.id
+                   AND t1.chromosome_min <= ?
+                   AND t1.chromosome_max >= ?
+                   AND t1.start_on_chromosome <= ?
+                   AND t1.end_on_chromosome >= ?"""
+        code = self.chromosomes[chromosome]
+        parameters = [code, code, stop, start]
+        if feature is not None:
+            query += """
+                   AND t2.feature = ?"""
+            parameters.append(feature)
+        cursor = self.cnx.cursor()
+        cursor.execute(query + """
+                   ORDER BY t1.start_on_chromosome, t1.end_on_chromosome, t2.feature, t2.id_gene, t2.pos_on_gene""",
+                       parameters)
+        return cursor.fetchall()
+
+    def close(self):
+        """
+        Close the connection to fasterDB Lite
+        """
+        self.cnx.close()
+
+
+if __name__ == "__main__":
+    fasterdb_cnx = sqlite3.connect(out_path + base_name)
+    create_interval_index(fasterdb_cnx)
+    fasterdb_cnx.close()
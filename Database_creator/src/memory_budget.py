@@ -0,0 +1,109 @@
+#!/usr/bin/python3.5
+
+"""
+Description:
+
+    This script contains the functions used to keep the memory used by the creation of \
+    **FasterDB Lite** and of the **Sed database** below a budget (``--max_mem`` option). \
+    The rows are read, computed and inserted by batches. The part of the budget left once the \
+    process is started (the interpreter, numpy, sqlite...) is given to the batches: the memory \
+    allocated by each batch is traced (``tracemalloc``) and turned into a cost per row, from \
+    which the size of the next batch is computed.
+"""
+
+import os
+import resource
+import tracemalloc
+
+MAX_BATCH_SIZE = 100000  # the batches never grow beyond this number of rows
+MIN_BATCH_SIZE = 100  # the batches never shrink below this number of rows (or the initial batch size if lower)
+BATCH_SHARE = 0.8  # share of the memory left to the batches that one batch may use
+units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+warned = False  # True once the process was warned that its budget is too low
+
+
+def parse_memory_size(size):
+    """
+    Get the number of bytes of a memory size.
+
+    :param size: (string) a memory size: a number of bytes followed by an optional unit K, M, G or T \
+    (ex: ``4G``, ``500M``)
+    :return: (int) the number of bytes of ``size``
+    """
+    size = size.strip().upper().rstrip("B")
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def current_memory():
+    """
+    :return: (int) the resident memory of the current process, in bytes (its peak resident memory \
+    if the current one is not available)
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class BatchBudget:
+    """
+    Gives the size of the batches of rows so that the memory allocated by one batch stays within \
+    the part of a memory budget left by the process
+    """
+    def __init__(self, batch_size, max_mem):
+        """
+        Start tracing the memory allocated by the batches if there is a budget. If the budget is below \
+        the memory already used by the process, a warning is printed (once per process) and the batches \
+        are kept to their minimal size.
+
+        :param batch_size: (int) the size of the first batch
+        :param max_mem: (int) the memory budget in bytes, None for no budget
+        """
+        global warned
+        self.batch_size = batch_size
+        self.max_mem = max_mem
+        self.min_size = min(MIN_BATCH_SIZE, batch_size)
+        self.started = False
+        if max_mem is None:
+            return
+        baseline = current_memory()
+        self.available = max_mem - baseline
+        if self.available <= 0 and not warned:
+            print("WARNING : the memory budget (%s bytes) is below the memory already used by the process "
+                  "(%s bytes), the batches are kept to %s rows" % (max_mem, baseline, self.min_size))
+            warned = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        tracemalloc.clear_traces()
+
+    def next_batch_size(self, rows):
+        """
+        Get the size of the next batch from the memory allocated by the last one.
+
+        :param rows: (int) the number of rows of the last batch
+        :return: (int) the number of rows that fit in ``BATCH_SHARE`` of the memory left to the batches, \
+        given the peak memory allocated per row by the last batch (at most twice the size of the last batch, \
+        between the minimal size and ``MAX_BATCH_SIZE``); the first batch size if there is no budget
+        """
+        if self.max_mem is None or rows == 0:
+            return self.batch_size
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.clear_traces()
+        if self.available <= 0:
+            self.batch_size = self.min_size
+        else:
+            fitting = int(BATCH_SHARE * self.available * rows / max(peak, 1))
+            self.batch_size = max(self.min_size, min(MAX_BATCH_SIZE, 2 * rows, fitting))
+        return self.batch_size
+
+    def stop(self):
+        """
+        Stop tracing the memory allocations if they were traced for this budget.
+        """
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
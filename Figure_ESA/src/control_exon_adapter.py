@@ -20,16 +20,15 @@ def get_control_exon_size_information(cnx, exon_type, exon2remove):
         * names: (list of string) the name of every column in sed table
     """
     cursor = cnx.cursor()
+    # the intron frequencies are read from the typed sed_composition table when it exists
+    query = """SELECT t1.gene_id, t1.exon_pos, t1.upstream_intron_size, t1.exon_size, t1.downstream_intron_size,
+               t2.iupac_upstream_intron, t2.iupac_downstream_intron
+               FROM sed t1, {} t2
+               WHERE t1.gene_id = t2.gene_id
+               AND t1.exon_pos = t2.exon_pos""".format(functions.get_composition_table(cnx))
     if exon_type != "ALL":
-        query = """SELECT gene_id, exon_pos, upstream_intron_size, exon_size, downstream_intron_size,
-                   iupac_upstream_intron, iupac_downstream_intron
-                   FROM sed
-                   WHERE exon_type LIKE '%{}%'""".format(exon_type)
-    else:
-        query = """SELECT gene_id, exon_pos, upstream_intron_size, exon_size, downstream_intron_size,
-                   iupac_upstream_intron, iupac_downstream_intron
-                   FROM sed
-                """
+        query += """
+               AND {}""".format(union_dataset_function.get_exon_type_condition(cnx, exon_type, alias="t1"))
     cursor.execute(query)
     names = [description[0] for description in cursor.description]
     result = cursor.fetchall()
@@ -44,15 +43,15 @@ def get_median_iupac_introns(upstream, downstream):
     """
     Get the median value for every iupac nucleotide frequencies in upstream and downstream intron of an exon.
 
-    :param upstream: (string) frequency of each nucleotides/dnt in full upstream intron separated by a ';' \
+    :param upstream: (string or bytes) frequency of each nucleotides/dnt in full upstream intron separated by a ';' \
     the last value corresponds to the size of the upstream sequence
-    :param downstream: (string) frequency of each nucleotides/dnt in full downstream intron separated by a ';' \
+    :param downstream: (string or bytes) frequency of each nucleotides/dnt in full downstream intron separated by a ';' \
     the last value corresponds to the size of the downstream sequence
     :return: (list of float) the frequencies of nt and dnt in the introns
     """
     if upstream is not None and downstream is not None:
-        upstream = list(map(float, upstream.split(";")))
-        downstream = list(map(float, downstream.split(";")))
+        upstream = functions.get_composition_vector(upstream)
+        downstream = functions.get_composition_vector(downstream)
         result = []
         for i in range(len(upstream)):
             result.append(np.mean([upstream[i], downstream[i]]))
@@ -79,11 +78,11 @@ def tmp_dic_creator(exon_info):
         exon = np.array(exon[:-2], dtype=float)
         mean_intron_iupac = get_median_iupac_introns(intron[0], intron[1])
         if intron[0] is not None:
-            upstream = list(map(float, intron[0].split(";")))
+            upstream = functions.get_composition_vector(intron[0])
         else:
             upstream = [None] * 10
         if intron[1] is not None:
-            downstream = list(map(float, intron[1].split(";")))
+            downstream = functions.get_composition_vector(intron[1])
         else:
             downstream = [None] * 10
         for key in new_dic["iupac_mean_intron"].keys():
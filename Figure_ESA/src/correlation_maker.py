@@ -60,12 +60,8 @@ def get_interest_values(cnx, exon_list, target_column, nt):
                               dtype=float)
     else:
         if target_column in ["median_flanking_intron_size", "min_flanking_intron_size", "introns_size"]:
-            values_up = np.array(
-                functions.get_redundant_list_of_value(cnx, exon_list, "upstream_intron_size"),
-                dtype=float)
-            values_down = np.array(
-                functions.get_redundant_list_of_value(cnx, exon_list, "downstream_intron_size"),
-                dtype=float)
+            values_up, values_down = [column.astype(float) for column in functions.get_exon_values(
+                cnx, exon_list, ["upstream_intron_size", "downstream_intron_size"])]
             if target_column == "median_flanking_intron_size":
                 values = np.array([np.nanmedian([values_up[i], values_down[i]]) for i in range(len(values_up))],
                                   dtype=float)
@@ -90,7 +86,7 @@ def get_control_exon(cnx, exon_type):
     if exon_type != "ALL":
         query = """SELECT gene_id, exon_pos
                    FROM sed
-                   WHERE exon_type LIKE '%{}%'""".format(exon_type)
+                   WHERE {}""".format(union_dataset_function.get_exon_type_condition(cnx, exon_type))
     else:
         query = """SELECT gene_id, exon_pos
                    FROM sed
@@ -734,42 +730,9 @@ def get_list_of_value_iupac_dnt(cnx, exon_list, target_column, nt_dnt):
     :param nt_dnt: (string) a nucleotide or di_nucleotide
     :return: (list of float) values of ``target_column`` for the exons in  ``exon_list``.
     """
-    cursor = cnx.cursor()
-    res = []
-    if target_column not in ["iupac_gene", "dnt_gene"]:
-        for exon in exon_list:
-            query = """SELECT %s
-                       FROM sed
-                       where gene_id = %s
-                       AND exon_pos = %s """ % (target_column, exon[0], exon[1])
-            cursor.execute(query)
-            r = cursor.fetchone()[0]
-            if r is not None:
-                if len(nt_dnt) == 1:
-                    res.append(float(r.split(";")[nt_dic[nt_dnt]]))
-                else:
-                    res.append(float(r.split(";")[dnt_dic[nt_dnt]]))
-            else:
-                res.append(None)
-    else:
-        redundancy_gene_dic = {}
-        for exon in exon_list:
-            if exon[0] not in redundancy_gene_dic.keys():
-                query = """SELECT %s
-                       FROM sed
-                       where gene_id = %s
-                       AND exon_pos = %s """ % (target_column, exon[0], exon[1])
-                cursor.execute(query)
-                r = cursor.fetchone()[0]
-                if r is not None:
-                    if len(nt_dnt) == 1:
-                        res.append(float(r.split(";")[nt_dic[nt_dnt]]))
-                    else:
-                        res.append(float(r.split(";")[dnt_dic[nt_dnt]]))
-                else:
-                    res.append(None)
-                redundancy_gene_dic[exon[0]] = 1
-    return res
+    if target_column in ["iupac_gene", "dnt_gene"]:
+        exon_list = functions.get_first_exon_of_genes(exon_list)
+    return functions.get_column_values(cnx, exon_list, target_column, nt_dnt)
 
 
 def remove_wrong_size_values(list_values1, name_value1, name_exon, list_values2, name_value2):
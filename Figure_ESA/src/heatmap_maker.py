@@ -176,20 +176,12 @@ def create_matrix(cnx, id_projects, names, target_columns, control_dic, ctrl_ful
                     # ctrl_val = np.array(ctrl_full[name_col][nt], dtype=float)
                 else:
                     if new_targets[j] == "median_flanking_intron_size":
-                        values1 = np.array(
-                            functions.get_redundant_list_of_value(cnx, exon_list, "upstream_intron_size"),
-                            dtype=float)
-                        values2 = np.array(
-                            functions.get_redundant_list_of_value(cnx, exon_list, "downstream_intron_size"),
-                            dtype=float)
+                        values1, values2 = [column.astype(float) for column in functions.get_exon_values(
+                            cnx, exon_list, ["upstream_intron_size", "downstream_intron_size"])]
                         values = np.array([np.nanmedian([values1[i], values2[i]]) for i in range(len(values1))])
                     elif new_targets[j] == "min_flanking_intron_size":
-                        values1 = np.array(
-                            functions.get_redundant_list_of_value(cnx, exon_list, "upstream_intron_size"),
-                            dtype=float)
-                        values2 = np.array(
-                            functions.get_redundant_list_of_value(cnx, exon_list, "downstream_intron_size"),
-                            dtype=float)
+                        values1, values2 = [column.astype(float) for column in functions.get_exon_values(
+                            cnx, exon_list, ["upstream_intron_size", "downstream_intron_size"])]
                         values = np.array([np.nanmin([values1[i], values2[i]]) for i in range(len(values1))])
                     else:
 
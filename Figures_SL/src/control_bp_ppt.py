@@ -31,8 +31,9 @@ def get_control_exon_information(cnx, exon_type, exon2remove, regulation):
     if exon_type != "ALL":
         query = """SELECT t2.official_symbol, t1.id_gene, t1.pos_on_gene
                    FROM exons t1, genes t2
-                   WHERE t1.exon_type LIKE '%{}%'
-                   AND t1.id_gene = t2.id""".format(exon_type)
+                   WHERE {}
+                   AND t1.id_gene = t2.id""".format(
+            union_dataset_function.get_exon_type_condition(cnx, exon_type, "exons", "t1"))
     else:
         query = """SELECT t2.official_symbol, t1.id_gene, t1.pos_on_gene
                    FROM exons t1, genes t2
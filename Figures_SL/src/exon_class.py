@@ -8,6 +8,8 @@ Description:
 
 """
 
+from packed_sequence import is_packed, get_length, get_sequence
+
 
 class ExonClassMain:
     """
@@ -42,7 +44,7 @@ class ExonClass(ExonClassMain):
         printd("Exon " + str(gene_name) + "_" + str(exon_position))
         ExonClassMain.__init__(self, gene_name, gene_id, exon_position)
         self.gene.gene_filler(cnx)
-        self.upstream_intron = Intron(cnx, gene_id, self.position - 1, "upstream", self.gene.sequence)
+        self.upstream_intron = Intron(cnx, gene_id, self.position - 1, "upstream", self.gene)
         # once the exon is fully created we delete the gene sequence for memory efficiency
         printd("Upstream proxi sequence")
         printd(self.upstream_intron.sequence_proxi)
@@ -67,7 +69,8 @@ class Gene:
 
     def gene_filler(self, cnx):
         """
-        Get iupac-dnt information and length of a gene
+        Get iupac-dnt information and length of a gene. If the gene sequences of fasterDB are packed, \
+        only the length of the gene is read: its regions are decoded by ``get_region``.
 
         :param cnx: (sqlite3 object) connection to fasterDB
         """
@@ -82,23 +85,41 @@ class Gene:
             print("Exiting...")
             exit(1)
         sequence = result[0][0]
+        if not sequence and is_packed(cnx):
+            self.length = get_length(cnx, self.id) or None
+            return None
         self.sequence = sequence
         if len(sequence) > 0:
             self.length = len(sequence)
         else:
             self.length = None
 
+    def get_region(self, cnx, start, end):
+        """
+        Get a region of the gene sequence.
+
+        :param cnx: (sqlite3 object) connection to fasterDB
+        :param start: (int) start of the region, its bounds are those of the python \
+        slice ``sequence[start:end]`` of the gene sequence
+        :param end: (int) end of the region
+        :return: (string) the sequence of the region, only the region is decoded if \
+        the gene sequence is packed
+        """
+        if self.sequence is None:
+            return get_sequence(cnx, self.id, start, end)
+        return self.sequence[start:end]
+
 
 class Intron:
     """Create an intron"""
-    def __init__(self, cnx, gene_id, pos_on_gene, location, gene_seq):
+    def __init__(self, cnx, gene_id, pos_on_gene, location, gene):
         """
 
         :param cnx: (sqlite3 object) allow connection to **FasterDB Lite** database
         :param gene_id:  (int) the id of a gene
         :param pos_on_gene: (int) an intron position on a gene
         :param location: (string) upstream or downstream
-        :param gene_seq: (string) the sequence of the gene
+        :param gene: (Gene object) the gene of the intron
         """
         self.gene_id = gene_id
         self.position = pos_on_gene
@@ -106,14 +127,14 @@ class Intron:
         self.start = None
         self.end = None
         self.sequence_proxi = None
-        self.get_intron_information(cnx, gene_seq)
+        self.get_intron_information(cnx, gene)
 
-    def get_intron_information(self, cnx, gene_seq):
+    def get_intron_information(self, cnx, gene):
         """
         Get the intron coordinates on it's gene
 
         :param cnx: (sqlite3 object) allows connection to **FasterDB Lite** database
-        :param gene_seq: (string) the sequence of the gene
+        :param gene: (Gene object) the gene of the intron
         :return: The following information is returned
             - length: (int) intron length
             - proximal: (string) the proximal (0:25) frequency in the intron
@@ -139,12 +160,10 @@ class Intron:
             self.end = end
         else:
             return None
-        sequence = gene_seq[start:end]
-        if len(sequence) > 19:
-            if len(sequence) < 100:
-                self.sequence_proxi = sequence
-            else:
-                self.sequence_proxi = sequence[-100:]
+        # bounds of the intron within the gene sequence: only its last 100 nucleotides are read
+        start, end, step = slice(start, end).indices(gene.length or 0)
+        if end - start > 19:
+            self.sequence_proxi = gene.get_region(cnx, max(start, end - 100), end)
 
 
 def set_debug(debug=0):
@@ -50,7 +50,7 @@ def get_control_exon_information(cnx, exon_type, exon_2_remove, regulation):
     if exon_type != "ALL":
         query = """SELECT *
                    FROM sed
-                   WHERE exon_type LIKE '%{}%'""".format(exon_type)
+                   WHERE {}""".format(union_dataset_function.get_exon_type_condition(cnx, exon_type))
     else:
         query = """SELECT *
                    FROM sed
@@ -14,6 +14,7 @@ Description:
 import sqlite3
 import plotly.graph_objs as go
 import numpy as np
+import sed_cache
 import plotly
 import os
 import sys
@@ -53,6 +54,52 @@ def connexion(seddb):
     return sqlite3.connect(seddb)
 
 
+def get_composition_table(cnx):
+    """
+    Get the table from which the iupac and dnt frequencies should be read.
+
+    :param cnx: (sqlite3 connection object) connexion to sed database
+    :return: (string) ``sed_composition`` if the sed database contains the typed frequencies (float32 vectors), \
+    ``sed`` else (frequencies separated by a ';')
+    """
+    cursor = cnx.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sed_composition';")
+    if cursor.fetchone() is not None:
+        return "sed_composition"
+    return "sed"
+
+
+def get_composition_vector(composition):
+    """
+    Get every frequency stored in an iupac or dnt column.
+
+    :param composition: (string or bytes) the value of an iupac or dnt column of the ``sed`` table \
+    (frequencies separated by a ';') or of the ``sed_composition`` table (little-endian float32 vector)
+    :return: (list of float) the frequencies (and the size of the sequence if it was stored)
+    """
+    if isinstance(composition, bytes):
+        return [round(value, 1) for value in np.frombuffer(composition, dtype="<f4").tolist()]
+    return list(map(float, composition.split(";")))
+
+
+def get_composition_value(composition, nt_dnt):
+    """
+    Get the frequency of a nucleotide or a di-nucleotide stored in an iupac or dnt column.
+
+    :param composition: (string or bytes) the value of an iupac or dnt column of the ``sed`` table \
+    (frequencies separated by a ';') or of the ``sed_composition`` table (little-endian float32 vector)
+    :param nt_dnt: (string) a nucleotide or di_nucleotide
+    :return: (float) the frequency of ``nt_dnt``
+    """
+    if len(nt_dnt) == 1:
+        index = nt_dic[nt_dnt]
+    else:
+        index = dnt_dic[nt_dnt]
+    if isinstance(composition, bytes):
+        return round(float(np.frombuffer(composition, dtype="<f4", count=1, offset=4 * index)[0]), 1)
+    return float(composition.split(";")[index])
+
+
 def get_interest_project(cnx):
     """
     Get the id of every project defined in sed database (from splicing lore).
@@ -105,6 +152,80 @@ def get_ase_events(cnx, id_project, regulation):
     return res
 
 
+def get_exon_values(cnx, exon_list, target_columns, table="sed"):
+    """
+    Get the values of some columns for every exon in ``exon_list`` with a single query: the exons are loaded \
+    in a temporary table which is joined to ``table`` on its primary key (gene_id, exon_pos).
+
+    :param cnx: (sqlite3 connection object) connexion to sed database
+    :param exon_list: (list of tuple of 2 int) each sublist corresponds to an exon (gene_id + exon_position on gene)
+    :param target_columns: (list of string) the columns for which we want to get information on exons.
+    :param table: (string) the table containing ``target_columns`` (``sed`` or ``sed_composition``)
+    :return: (list of numpy array) for each column of ``target_columns``, the values of the exons \
+    in the order of ``exon_list`` (None for the NULL values and the exons missing from ``table``)
+    """
+    cursor = cnx.cursor()
+    cursor.execute("DROP TABLE IF EXISTS temp.exon_keys;")
+    cursor.execute("CREATE TEMP TABLE exon_keys (rank INTEGER PRIMARY KEY, gene_id INT NOT NULL, "
+                   "exon_pos INT NOT NULL);")
+    cursor.executemany("INSERT INTO temp.exon_keys VALUES (?, ?, ?)",
+                       [(rank, exon[0], exon[1]) for rank, exon in enumerate(exon_list)])
+    query = """SELECT t1.rank, %s
+               FROM temp.exon_keys t1, %s t2
+               WHERE t1.gene_id = t2.gene_id
+               AND t1.exon_pos = t2.exon_pos""" % (", ".join(["t2.%s" % column for column in target_columns]), table)
+    cursor.execute(query)
+    rows = cursor.fetchall()
+    cursor.execute("DROP TABLE temp.exon_keys;")
+    cnx.commit()
+    values = np.full((len(target_columns), len(exon_list)), None, dtype=object)
+    if rows:
+        ranks = np.array([row[0] for row in rows])
+        for i in range(len(target_columns)):
+            values[i, ranks] = [row[i + 1] for row in rows]
+    return list(values)
+
+
+def get_first_exon_of_genes(exon_list):
+    """
+    Get the first exon of each gene in ``exon_list``.
+
+    :param exon_list: (list of tuple of 2 int) each sublist corresponds to an exon (gene_id + exon_position on gene)
+    :return: (list of tuple of 2 int) the first exon of ``exon_list`` of each gene, in the order of ``exon_list``
+    """
+    redundancy_gene_dic = {}
+    res = []
+    for exon in exon_list:
+        if exon[0] not in redundancy_gene_dic.keys():
+            res.append(exon)
+            redundancy_gene_dic[exon[0]] = 1
+    return res
+
+
+def get_column_values(cnx, exon_list, target_column, nt_dnt=None):
+    """
+    Get the values of ``target_column`` (or the frequencies of ``nt_dnt`` in it) of every exon in ``exon_list``. \
+    The values are read in the columnar cache of the sed database (see ``sed_cache``) if it contains \
+    ``target_column`` and can read it with ``nt_dnt`` (see ``SedCache.has_column``), with one query \
+    (see ``get_exon_values``) else.
+
+    :param cnx: (sqlite3 connection object) connexion to sed database
+    :param exon_list: (list of tuple of 2 int) each sublist corresponds to an exon (gene_id + exon_position on gene)
+    :param target_column: (string) the column for which we want to get information on exons.
+    :param nt_dnt: (string) a nucleotide or di_nucleotide if ``target_column`` is an iupac or dnt column, \
+    None else
+    :return: (list of float or int) values of ``target_column`` for the exons in  ``exon_list`` (None for the NULL \
+    values and the exons missing from the sed database)
+    """
+    cache = sed_cache.get_sed_cache(cnx)
+    if cache is not None and cache.has_column(target_column, nt_dnt):
+        return cache.get_values(exon_list, target_column, nt_dnt).tolist()
+    if nt_dnt is None:
+        return get_exon_values(cnx, exon_list, [target_column])[0].tolist()
+    values = get_exon_values(cnx, exon_list, [target_column], get_composition_table(cnx))[0]
+    return [get_composition_value(value, nt_dnt) if value is not None else None for value in values.tolist()]
+
+
 def get_list_of_value(cnx, exon_list, target_column):
     """
     Get the individual values for ``target_column`` of every exon in ``exon_list``.
@@ -114,32 +235,10 @@ def get_list_of_value(cnx, exon_list, target_column):
     :param target_column: (string) the column for which we want to get information on exons.
     :return: (list of float) values of ``target_column`` for the exons in  ``exon_list``.
     """
-    cursor = cnx.cursor()
-    res = []
     if target_column not in ["gene_size", "nb_intron_gene", "median_intron_size", "iupac_gene", "dnt_gene"]:
-        for exon in exon_list:
-            query = """SELECT %s
-                       FROM sed
-                       where gene_id = %s
-                       AND exon_pos = %s """ % (target_column, exon[0], exon[1])
-            cursor.execute(query)
-            r = cursor.fetchone()[0]
-            if r is not None:
-                res.append(r)
-    else:
-        redundancy_gene_dic = {}
-        for exon in exon_list:
-            if exon[0] not in redundancy_gene_dic.keys():
-                query = """SELECT %s
-                           FROM sed
-                           where gene_id = %s
-                           AND exon_pos = %s """ % (target_column, exon[0], exon[1])
-                cursor.execute(query)
-                r = cursor.fetchone()[0]
-                if r is not None:
-                    res.append(r)
-                redundancy_gene_dic[exon[0]] = 1
-    return res
+        return [value for value in get_column_values(cnx, exon_list, target_column) if value is not None]
+    values = get_column_values(cnx, get_first_exon_of_genes(exon_list), target_column)
+    return [value for value in values if value is not None]
 
 
 def get_redundant_list_of_value(cnx, exon_list, target_column):
@@ -151,20 +250,7 @@ def get_redundant_list_of_value(cnx, exon_list, target_column):
     :param target_column: (string) the column for which we want to get information on exons.
     :return: (list of float) values of ``target_column`` for the exons in  ``exon_list``.
     """
-    cursor = cnx.cursor()
-    res = []
-    for exon in exon_list:
-        query = """SELECT %s
-                   FROM sed
-                   where gene_id = %s
-                   AND exon_pos = %s """ % (target_column, exon[0], exon[1])
-        cursor.execute(query)
-        r = cursor.fetchone()[0]
-        if r is not None:
-            res.append(r)
-        else:
-            res.append(None)
-    return res
+    return get_column_values(cnx, exon_list, target_column)
 
 
 def get_list_of_value_iupac_dnt(cnx, exon_list, target_column, nt_dnt):
@@ -177,38 +263,9 @@ def get_list_of_value_iupac_dnt(cnx, exon_list, target_column, nt_dnt):
     :param nt_dnt: (string) a nucleotide or di_nucleotide
     :return: (list of float) values of ``target_column`` for the exons in  ``exon_list``.
     """
-    cursor = cnx.cursor()
-    res = []
-    if target_column not in ["iupac_gene", "dnt_gene"]:
-        for exon in exon_list:
-            query = """SELECT %s
-                       FROM sed
-                       where gene_id = %s
-                       AND exon_pos = %s """ % (target_column, exon[0], exon[1])
-            cursor.execute(query)
-            r = cursor.fetchone()[0]
-            if r is not None:
-                if len(nt_dnt) == 1:
-                    res.append(float(r.split(";")[nt_dic[nt_dnt]]))
-                else:
-                    res.append(float(r.split(";")[dnt_dic[nt_dnt]]))
-    else:
-        redundancy_gene_dic = {}
-        for exon in exon_list:
-            if exon[0] not in redundancy_gene_dic.keys():
-                query = """SELECT %s
-                       FROM sed
-                       where gene_id = %s
-                       AND exon_pos = %s """ % (target_column, exon[0], exon[1])
-                cursor.execute(query)
-                r = cursor.fetchone()[0]
-                if r is not None:
-                    if len(nt_dnt) == 1:
-                        res.append(float(r.split(";")[nt_dic[nt_dnt]]))
-                    else:
-                        res.append(float(r.split(";")[dnt_dic[nt_dnt]]))
-                redundancy_gene_dic[exon[0]] = 1
-    return res
+    if target_column in ["iupac_gene", "dnt_gene"]:
+        exon_list = get_first_exon_of_genes(exon_list)
+    return [value for value in get_column_values(cnx, exon_list, target_column, nt_dnt) if value is not None]
 
 
 def get_redundant_list_of_value_iupac_dnt(cnx, exon_list, target_column, nt_dnt):
@@ -221,23 +278,7 @@ def get_redundant_list_of_value_iupac_dnt(cnx, exon_list, target_column, nt_dnt)
     :param nt_dnt: (string) a nucleotide or di_nucleotide
     :return: (list of float) values of ``target_column`` for the exons in  ``exon_list``.
     """
-    cursor = cnx.cursor()
-    res = []
-    for exon in exon_list:
-        query = """SELECT %s
-                   FROM sed
-                   where gene_id = %s
-                   AND exon_pos = %s """ % (target_column, exon[0], exon[1])
-        cursor.execute(query)
-        r = cursor.fetchone()[0]
-        if r is not None:
-            if len(nt_dnt) == 1:
-                res.append(float(r.split(";")[nt_dic[nt_dnt]]))
-            else:
-                res.append(float(r.split(";")[dnt_dic[nt_dnt]]))
-        else:
-            res.append(None)
-    return res
+    return get_column_values(cnx, exon_list, target_column, nt_dnt)
 
 
 def handle_nb_bp_recovering(cnx, exon_list, output, sf_name, regulation, target):
@@ -0,0 +1,122 @@
+#!/usr/bin/python3.5
+
+"""
+Description:
+
+    This script contains the functions used to store the gene sequences of **FasterDB Lite** \
+    in a packed layout and to read them back. In this layout:
+
+    * every nucleotide A, C, G, T is coded on 2 bits (A = 0, C = 1, G = 2, T = 3, the first \
+      nucleotide of a byte being on its 2 highest bits) and the gene sequence is cut into blocks \
+      of ``BLOCK_SIZE`` nucleotides stored in the table **sequence_blocks**.
+    * the runs of any other character (N, lower case or ambiguous nucleotides...) are stored \
+      in the table **sequence_masks** (0-based start, excluded end and the character of the run); \
+      they are coded as A in the blocks.
+    * the length of each gene is stored in the table **packed_genes**.
+
+    Any region of a gene can be decoded from the blocks and masks overlapping it only.
+"""
+
+import numpy as np
+
+BLOCK_SIZE = 4096  # nucleotides per block, a multiple of 4
+
+# code of each nucleotide: A, C, G, T -> 0, 1, 2, 3, any other character -> 4
+NT_CODE = np.full(256, 4, dtype=np.uint8)
+for code, nucleotide in enumerate("ACGT"):
+    NT_CODE[ord(nucleotide)] = code
+NT_LETTER = np.frombuffer(b"ACGT", dtype=np.uint8)
+packed_connections = {}  # result of ``is_packed`` for each connection already checked
+
+
+def pack_sequence(sequence):
+    """
+    Pack a sequence.
+
+    :param sequence: (string) a nucleotide sequence
+    :return: (list of bytes, list of tuple of 2 int and a string) the blocks of the sequence \
+    and its masks (start, end and character of each run of characters other than A, C, G, T)
+    """
+    raw = np.frombuffer(sequence.encode(), dtype=np.uint8)
+    codes = NT_CODE[raw]
+    masked = codes == 4
+    masks = []
+    if masked.any():
+        run_key = np.where(masked, raw.astype(np.int16), -1)
+        bounds = np.concatenate(([0], np.flatnonzero(np.diff(run_key)) + 1, [len(raw)]))
+        masks = [(int(start), int(end), chr(raw[start])) for start, end in zip(bounds[:-1], bounds[1:])
+                 if masked[start]]
+        codes = np.where(masked, 0, codes).astype(np.uint8)
+    codes = np.concatenate((codes, np.zeros(-len(codes) % 4, dtype=np.uint8)))
+    packed = (codes[0::4] << 6) | (codes[1::4] << 4) | (codes[2::4] << 2) | codes[3::4]
+    block_bytes = BLOCK_SIZE // 4
+    blocks = [packed[i:i + block_bytes].tobytes() for i in range(0, len(packed), block_bytes)]
+    return blocks, masks
+
+
+def unpack_codes(data):
+    """
+    :param data: (bytes) one or many consecutive blocks
+    :return: (numpy array of uint8) the code of each nucleotide in ``data``
+    """
+    packed = np.frombuffer(data, dtype=np.uint8)
+    codes = np.empty(len(packed) * 4, dtype=np.uint8)
+    codes[0::4] = packed >> 6
+    codes[1::4] = (packed >> 4) & 3
+    codes[2::4] = (packed >> 2) & 3
+    codes[3::4] = packed & 3
+    return codes
+
+
+def is_packed(cnx):
+    """
+    :param cnx: (sqlite3 object) connection to fasterDB Lite
+    :return: (boolean) True if the gene sequences of fasterDB Lite are stored in the packed layout \
+    (checked once per connection)
+    """
+    if cnx not in packed_connections:
+        cursor = cnx.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'packed_genes';")
+        packed_connections[cnx] = cursor.fetchone() is not None
+    return packed_connections[cnx]
+
+
+def get_length(cnx, gene_id):
+    """
+    :param cnx: (sqlite3 object) connection to fasterDB Lite
+    :param gene_id: (int) the id of a gene
+    :return: (int) the length of the gene sequence stored in the packed layout
+    """
+    cursor = cnx.cursor()
+    cursor.execute("SELECT length FROM packed_genes WHERE id_gene = ?;", (gene_id,))
+    return cursor.fetchone()[0]
+
+
+def get_sequence(cnx, gene_id, start=0, end=None):
+    """
+    Decode a region of a gene sequence stored in the packed layout. Only the blocks \
+    and the masks overlapping the region are read.
+
+    :param cnx: (sqlite3 object) connection to fasterDB Lite
+    :param gene_id: (int) the id of a gene
+    :param start: (int) start of the region, its bounds are those of the python \
+    slice ``sequence[start:end]`` of the gene sequence (0-based, ``end`` excluded)
+    :param end: (int) end of the region, None for the end of the gene
+    :return: (string) the sequence of the region
+    """
+    start, end, step = slice(start, end).indices(get_length(cnx, gene_id))
+    if end <= start:
+        return ""
+    cursor = cnx.cursor()
+    first_block = start // BLOCK_SIZE
+    cursor.execute("""SELECT data FROM sequence_blocks
+                      WHERE id_gene = ? AND block_pos BETWEEN ? AND ?
+                      ORDER BY block_pos;""", (gene_id, first_block, (end - 1) // BLOCK_SIZE))
+    codes = unpack_codes(b"".join(row[0] for row in cursor.fetchall()))
+    offset = first_block * BLOCK_SIZE
+    letters = NT_LETTER[codes[start - offset:end - offset]]
+    cursor.execute("""SELECT start_on_gene, end_on_gene, nucleotide FROM sequence_masks
+                      WHERE id_gene = ? AND start_on_gene < ? AND end_on_gene > ?;""", (gene_id, end, start))
+    for mask_start, mask_end, nucleotide in cursor.fetchall():
+        letters[max(mask_start, start) - start:min(mask_end, end) - start] = ord(nucleotide)
+    return letters.tobytes().decode()
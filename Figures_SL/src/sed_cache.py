@@ -0,0 +1,239 @@
+#!/usr/bin/python3.5
+
+# coding : utf8
+
+"""
+Description:
+
+    This script contains a columnar cache of the ``sed`` table of a sed database. The table is read once \
+    and each numeric column is stored as a numpy array (the integer columns as integers with the mask of their \
+    NULL values, the iupac and dnt columns as a matrix with one column per nucleotide or di-nucleotide) \
+    with the rows sorted by exon key (``gene_id`` and ``exon_pos`` packed in one integer). The cache is saved \
+    next to the sed database (``<sed database>_cache.npz``) and built again when the size or the modification \
+    time of the sed database changes. The values of any list \
+    of exons are then read by indexing the arrays instead of querying the sed database.
+"""
+
+import os
+import sqlite3
+import numpy as np
+nt_dic = {"A": 0, "C": 1, "G": 2, "T": 3, "S": 4, "W": 5, "R": 6, "Y": 7, "K": 8, "M": 9}
+dnt_dic = {"AA": 0, "AC": 1, "AG": 2, "AT": 3, "CA": 4, "CC": 5,
+           "CG": 6, "CT": 7, "GA": 8, "GC": 9, "GG": 10, "GT": 11,
+           "TA": 12, "TC": 13, "TG": 14, "TT": 15}
+exon_pos_bits = 20  # number of bits of the exon key storing exon_pos
+cache_version = 2  # changed when the content of the cache changes, to build the older caches again
+caches = {}  # the caches already loaded, by sed database
+
+
+def get_exon_keys(gene_ids, exon_pos):
+    """
+    Pack exons into integer keys.
+
+    :param gene_ids: (numpy array of int) the gene_id of the exons
+    :param exon_pos: (numpy array of int) the position of the exons on their gene
+    :return: (numpy array of int) the key of each exon
+    """
+    return (np.asarray(gene_ids, dtype=np.int64) << exon_pos_bits) | np.asarray(exon_pos, dtype=np.int64)
+
+
+def get_sed_stamp(seddb):
+    """
+    :param seddb: (string) path to a sed database
+    :return: (numpy array of 2 float) the modification time and the size of ``seddb``
+    """
+    stat = os.stat(seddb)
+    return np.array([stat.st_mtime, stat.st_size], dtype=float)
+
+
+def get_cache_file(seddb):
+    """
+    :param seddb: (string) path to a sed database
+    :return: (string) the path of the cache of ``seddb``
+    """
+    return os.path.splitext(seddb)[0] + "_cache.npz"
+
+
+def get_column_array(name, values):
+    """
+    Turn the values of a column of the ``sed`` table into an array.
+
+    :param name: (string) the name of the column
+    :param values: (list) the values of the column, one per exon
+    :return: (numpy array, numpy array of bool) the values of the column: integers if every value of the \
+    column is an integer, with the mask of its NULL values (0 in the values), floats else (a matrix with one \
+    column per nucleotide or di-nucleotide for the iupac and dnt columns), with nan for the NULL values and \
+    no mask; None and None if the column is not numeric
+    """
+    if name.startswith("iupac_") or name.startswith("dnt_"):
+        vectors = [list(map(float, value.split(";"))) if value else [] for value in values]
+        array = np.full((len(vectors), max([len(vector) for vector in vectors] + [0])), np.nan)
+        for i, vector in enumerate(vectors):
+            array[i, :len(vector)] = vector
+        return array, None
+    if all([value is None or isinstance(value, int) for value in values]):
+        return (np.array([0 if value is None else value for value in values], dtype=np.int64),
+                np.array([value is None for value in values], dtype=bool))
+    if all([value is None or isinstance(value, (int, float)) for value in values]):
+        return np.array([np.nan if value is None else value for value in values], dtype=float), None
+    return None, None
+
+
+def build_sed_cache(seddb):
+    """
+    Read the ``sed`` table of a sed database and save its numeric columns in the cache of the database.
+
+    :param seddb: (string) path to a sed database
+    :return: (dictionary of numpy array) the content of the cache: the sorted exon keys (``keys``), \
+    the stamp of ``seddb`` (``stamp``, see ``get_sed_stamp``), the ``cache_version`` (``version``), \
+    one array per numeric column and the mask of the NULL values of each integer column
+    """
+    stamp = get_sed_stamp(seddb)
+    cnx = sqlite3.connect(seddb)
+    cursor = cnx.cursor()
+    cursor.execute("SELECT * FROM sed ORDER BY gene_id, exon_pos")
+    names = [description[0] for description in cursor.description]
+    rows = cursor.fetchall()
+    cnx.close()
+    content = {"keys": get_exon_keys([row[names.index("gene_id")] for row in rows],
+                                     [row[names.index("exon_pos")] for row in rows]),
+               "stamp": stamp, "version": np.array(cache_version)}
+    for i, name in enumerate(names):
+        array, nulls = get_column_array(name, [row[i] for row in rows])
+        if array is not None:
+            content["column_%s" % name] = array
+        if nulls is not None:
+            content["null_%s" % name] = nulls
+    cache_file = get_cache_file(seddb)
+    try:
+        with open(cache_file + ".tmp", "wb") as outfile:
+            np.savez(outfile, **content)
+        os.replace(cache_file + ".tmp", cache_file)
+    except OSError:
+        print("WARNING : the cache of %s can't be saved in %s" % (seddb, cache_file))
+    return content
+
+
+class SedCache:
+    """
+    Gives the values of the numeric columns of the ``sed`` table of a sed database for lists of exons
+    """
+    def __init__(self, seddb):
+        """
+        Load the cache of ``seddb``, the cache is built if it doesn't exist, if ``seddb`` changed \
+        or if it was built by another version of this script.
+
+        :param seddb: (string) path to a sed database
+        """
+        cache_file = get_cache_file(seddb)
+        content = None
+        if os.path.isfile(cache_file):
+            content = dict(np.load(cache_file))
+            if not np.array_equal(content["stamp"], get_sed_stamp(seddb)) or \
+                    "version" not in content or content["version"] != cache_version:
+                content = None
+        if content is None:
+            print("Building the cache of %s" % seddb)
+            content = build_sed_cache(seddb)
+        self.stamp = content["stamp"]
+        self.keys = content["keys"]
+        self.columns = {name[len("column_"):]: array for name, array in content.items()
+                        if name.startswith("column_")}
+        self.nulls = {name[len("null_"):]: array for name, array in content.items() if name.startswith("null_")}
+
+    def has_column(self, target_column, nt_dnt=None):
+        """
+        :param target_column: (string) a column of the ``sed`` table
+        :param nt_dnt: (string) a nucleotide or di_nucleotide (see ``get_values_at``) or None
+        :return: (boolean) True if ``target_column`` is in the cache (only the numeric columns are) and \
+        can be read with ``nt_dnt``: ``nt_dnt`` is given for the iupac and dnt columns only
+        """
+        return target_column in self.columns and (nt_dnt is not None) == (self.columns[target_column].ndim == 2)
+
+    def get_rows(self, exon_list):
+        """
+        :param exon_list: (list of tuple of 2 int) each sublist corresponds to an exon \
+        (gene_id + exon_position on gene)
+        :return: (numpy array of int) the row of each exon of ``exon_list`` in the arrays of the cache, \
+        -1 for the exons not in the ``sed`` table
+        """
+        if len(exon_list) == 0:
+            return np.zeros(0, dtype=int)
+        exons = np.array([[int(exon[0]), int(exon[1])] for exon in exon_list], dtype=np.int64)
+        keys = get_exon_keys(exons[:, 0], exons[:, 1])
+        rows = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[rows] == keys, rows, -1) if len(self.keys) > 0 else np.full(len(keys), -1)
+
+    def get_gene_rows(self, gene_list):
+        """
+        :param gene_list: (list of int) list of gene_id
+        :return: (numpy array of int) the row of the first exon of each gene of ``gene_list`` \
+        in the arrays of the cache, -1 for the genes not in the ``sed`` table
+        """
+        if len(gene_list) == 0 or len(self.keys) == 0:
+            return np.full(len(gene_list), -1)
+        genes = np.array([int(gene) for gene in gene_list], dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.keys, genes << exon_pos_bits), len(self.keys) - 1)
+        return np.where(self.keys[rows] >> exon_pos_bits == genes, rows, -1)
+
+    def get_values_at(self, rows, target_column, nt_dnt=None):
+        """
+        :param rows: (numpy array of int) rows of the cache (see ``get_rows`` and ``get_gene_rows``)
+        :param target_column: (string) a numeric column of the ``sed`` table
+        :param nt_dnt: (string) a nucleotide or di_nucleotide, to get its frequency in the iupac or dnt \
+        column ``target_column``, None for the other columns
+        :return: (numpy masked array) the values of ``target_column`` at ``rows`` (integers for the integer \
+        columns, floats else), masked for the NULL values and for the rows equal to -1
+        """
+        if not self.has_column(target_column, nt_dnt):
+            raise ValueError("The column %s can't be read from the cache with nt_dnt = %s" % (target_column, nt_dnt))
+        column = self.columns[target_column]
+        if nt_dnt is not None:
+            index = nt_dic[nt_dnt] if len(nt_dnt) == 1 else dnt_dic[nt_dnt]
+            column = column[:, index] if column.shape[1] > index else np.full(len(column), np.nan)
+        if len(column) == 0:
+            return np.ma.masked_all(len(rows), dtype=column.dtype)
+        nulls = self.nulls[target_column] if target_column in self.nulls else np.isnan(column)
+        return np.ma.array(column[np.maximum(rows, 0)], mask=(rows < 0) | nulls[np.maximum(rows, 0)])
+
+    def get_values(self, exon_list, target_column, nt_dnt=None):
+        """
+        :param exon_list: (list of tuple of 2 int) each sublist corresponds to an exon \
+        (gene_id + exon_position on gene)
+        :param target_column: (string) a numeric column of the ``sed`` table
+        :param nt_dnt: (string) a nucleotide or di_nucleotide (see ``get_values_at``) or None
+        :return: (numpy masked array) the values of ``target_column`` for the exons in ``exon_list``, \
+        masked for the NULL values and the exons not in the ``sed`` table
+        """
+        return self.get_values_at(self.get_rows(exon_list), target_column, nt_dnt)
+
+    def get_gene_values(self, gene_list, target_column, nt_dnt=None):
+        """
+        :param gene_list: (list of int) list of gene_id
+        :param target_column: (string) a numeric column of the ``sed`` table (a column of the genes, \
+        ex: ``gene_size``, ``iupac_gene``)
+        :param nt_dnt: (string) a nucleotide or di_nucleotide (see ``get_values_at``) or None
+        :return: (numpy masked array) the values of ``target_column`` for the genes in ``gene_list``, \
+        masked for the NULL values and the genes not in the ``sed`` table
+        """
+        return self.get_values_at(self.get_gene_rows(gene_list), target_column, nt_dnt)
+
+
+def get_sed_cache(cnx):
+    """
+    Get the cache of the sed database of a connection.
+
+    :param cnx: (sqlite3 connection object) connexion to sed database
+    :return: (SedCache object) the cache of the sed database or None if the database is not a file \
+    or has no ``sed`` table
+    """
+    seddb = None
+    for database in cnx.execute("PRAGMA database_list;").fetchall():
+        if database[1] == "main" and database[2]:
+            seddb = database[2]
+    if seddb is None or cnx.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+                                    "AND name = 'sed';").fetchone() is None:
+        return None
+    if seddb not in caches or not np.array_equal(caches[seddb].stamp, get_sed_stamp(seddb)):
+        caches[seddb] = SedCache(seddb)
+    return caches[seddb]
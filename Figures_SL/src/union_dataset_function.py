@@ -3,8 +3,21 @@
 # coding: utf-8
 
 import group_factor
+import os
+import copy
+import pickle
+import sqlite3
+import collections
 import numpy as np
 
+delta_psi_threshold = 0.1  # minimum absolute delta psi of a regulated exon
+pvalue_threshold = 0.05  # maximum p-value (pvalue_glm_cor, or pvalue if not available) of a regulated exon
+events_cache_size = 256  # number of exon sets kept in memory by get_memoized_events
+events_cache = collections.OrderedDict()
+events_cache_version = 3  # changed with the format or the order of the exon sets, to ignore older cached results
+exon_pos_bits = 20  # number of bits of the exon keys (see get_exon_key) storing the exon position
+exon_pos_mask = (1 << exon_pos_bits) - 1
+
 
 def get_gene_name(cnx, gene_id):
     """
@@ -22,6 +35,33 @@ def get_gene_name(cnx, gene_id):
     return gene_name[0]
 
 
+def get_exon_type_condition(cnx, exon_type, table="sed", alias=""):
+    """
+    Get the condition of a query selecting the exons of a type. If the database contains the table \
+    listing the types of every exon (**sed_exon_types** in sed database, **exon_types** in fasterDB lite), \
+    the exons are selected through its index, else through a ``LIKE`` on the ``exon_type`` column \
+    (scan of the whole table).
+
+    :param cnx: (sqlite3 connection object) connexion to sed database or to fasterDB lite
+    :param exon_type: (string) the type of exon we want to select (ex: CCE)
+    :param table: (string) the table containing the exons: ``sed`` or ``exons`` (fasterDB lite)
+    :param alias: (string) the alias of ``table`` in the query (ex: ``t1``) or an empty string
+    :return: (string) the condition selecting the ``exon_type`` exons of ``table``
+    """
+    if table == "sed":
+        type_table, gene, pos = "sed_exon_types", "gene_id", "exon_pos"
+    else:
+        type_table, gene, pos = "exon_types", "id_gene", "pos_on_gene"
+    if alias:
+        alias += "."
+    cursor = cnx.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (type_table,))
+    if cursor.fetchone() is None:
+        return "{}exon_type LIKE '%{}%'".format(alias, exon_type)
+    return "({0}{1}, {0}{2}) IN (SELECT {1}, {2} FROM {3} WHERE exon_type = '{4}')".format(alias, gene, pos,
+                                                                                        type_table, exon_type)
+
+
 def get_splicing_factor_name(cnx):
     """
     Get the name of every splicing factor in splicing lore.
@@ -43,10 +83,10 @@ def get_projects_links_to_a_splicing_factor(cnx, sf_name):
 
     :param cnx: (sqlite3 connection object) connexion to sed database
     :param sf_name: (string) splicing factor name
-    :return: (list of int) list of id_project
+    :return: (list of int) list of id_project, sorted
     """
     cursor = cnx.cursor()
-    query = "SELECT id FROM rnaseq_projects WHERE sf_name = ?"
+    query = "SELECT id FROM rnaseq_projects WHERE sf_name = ? ORDER BY id"
     cursor.execute(query, (sf_name,))
     res = cursor.fetchall()
     idp = [val[0] for val in res if val[0] not in group_factor.bad_id_projects]
@@ -60,23 +100,25 @@ def get_ase_events(cnx, id_project):
     :param cnx: (sqlite3 connection object) connexion to sed database
     :param id_project: (int) a project id
     :return: (list of tuple of one str 2 int) each sublist corresponds to an exon (\
-    exon_regulation + gene_id + exon_position on gene)
+    exon_regulation + gene_id + exon_position on gene), sorted by event id
     """
     cursor = cnx.cursor()
     query = """SELECT delta_psi, gene_id, exon_skipped
                FROM ase_event
                WHERE id_project = ?
-               AND (delta_psi >= 0.1 OR delta_psi <= -0.1)
-               AND pvalue_glm_cor <= 0.05"""
-    cursor.execute(query, (id_project,))
+               AND (delta_psi >= ? OR delta_psi <= ?)
+               AND pvalue_glm_cor <= ?
+               ORDER BY id"""
+    cursor.execute(query, (id_project, delta_psi_threshold, -delta_psi_threshold, pvalue_threshold))
     res = cursor.fetchall()
     if len(res) == 0:
             query = """SELECT delta_psi, gene_id, exon_skipped
                FROM ase_event
                WHERE id_project = ?
-               AND (delta_psi >= 0.1 OR delta_psi <= -0.1)
-               AND pvalue <= 0.05"""
-            cursor.execute(query, (id_project,))
+               AND (delta_psi >= ? OR delta_psi <= ?)
+               AND pvalue <= ?
+               ORDER BY id"""
+            cursor.execute(query, (id_project, delta_psi_threshold, -delta_psi_threshold, pvalue_threshold))
             res = cursor.fetchall()
     nres = []
     for exon in res:
@@ -89,39 +131,141 @@ def get_ase_events(cnx, id_project):
     return nres
 
 
+def get_exon_key(gene_id, exon_pos):
+    """
+    Pack an exon into an integer key.
+
+    :param gene_id: (int or string) the gene_id of the exon
+    :param exon_pos: (int or string) the position of the exon on its gene
+    :return: (int) the key of the exon
+    """
+    return (int(gene_id) << exon_pos_bits) | int(exon_pos)
+
+
 def washing_events(exon_list):
     """
     Remove redundant exons or remove exons showing different regulation.
 
-    :param exon_list: (list of tuple of 2 int ans 1 str) each sublist corresponds to an exon (gene_id + \
-    exon_position on gene + exon_regulation). \
-    Every exon regulated by a splicing factor in different projects.
-    :return: (list of tuple of 2 int ans 1 str) each sublist corresponds to an exon (gene_id + exon_position on gene + \
-    exon_regulation). Every exon regulated by a splicing factor in different projects without redundancy.
+    :param exon_list: (list of tuple of 1 str and 2 int) each sublist corresponds to an exon (exon_regulation + \
+    gene_id + exon_position on gene). Every exon regulated by a splicing factor in different projects.
+    :return: (list of tuple of 1 str and 2 int) each sublist corresponds to an exon (exon_regulation + gene_id + \
+    exon_position on gene). Every exon regulated by a splicing factor in different projects without redundancy, \
+    in the order of their first occurrence in ``exon_list``.
     """
-    replace_dic = {"up": "down", "down": "up"}
-    dic = {}
-    prefix_list = []
+    regulations = collections.OrderedDict()  # the regulation of each exon, None if it has different regulations
     for exon in exon_list:
-        exon_prefix = "%s_%s" % (exon[1], exon[2])
-        exon_name = "%s_%s" % (exon[0], exon_prefix)
-        if exon_name not in dic:
-            if exon_prefix not in prefix_list:
-                dic[exon_name] = 1
-                prefix_list.append(exon_prefix)
-            else:
-                reverse_name = exon_name.replace(exon[0], replace_dic[exon[0]])
-                if reverse_name in dic:
-                    del(dic[reverse_name])
-                # Else : the exon was deleted before because of a different regulation
-        else:
-            dic[exon_name] += 1
-    # creation of the new list of exons
-    new_exon_list = []
-    for key in dic:
-        my_exon = key.split("_")
-        new_exon_list.append(my_exon)
-    return new_exon_list
+        key = get_exon_key(exon[1], exon[2])
+        if key not in regulations:
+            regulations[key] = exon[0]
+        elif regulations[key] != exon[0]:
+            regulations[key] = None
+    return [(regulation, key >> exon_pos_bits, key & exon_pos_mask) for key, regulation in regulations.items()
+            if regulation is not None]
+
+
+def get_sed_fingerprint(cnx):
+    """
+    Get the fingerprint of the sed database of a connection.
+
+    :param cnx: (sqlite3 connection object) connexion to sed database
+    :return: (string) the path, the modification time and the size of the sed database, \
+    None if the database is not a file
+    """
+    for database in cnx.execute("PRAGMA database_list;").fetchall():
+        if database[1] == "main" and database[2]:
+            stat = os.stat(database[2])
+            return "%s:%s:%s" % (database[2], stat.st_mtime, stat.st_size)
+    return None
+
+
+def read_events_cache(cache_file, fingerprint, key):
+    """
+    Read a result stored in the cache file of a sed database.
+
+    :param cache_file: (string) the cache file of the sed database (``<sed database>_events_cache.db``)
+    :param fingerprint: (string) the fingerprint of the sed database (see ``get_sed_fingerprint``)
+    :param key: (string) the key of the result
+    :return: (list of list) the result, None if it isn't in ``cache_file`` or if ``cache_file`` can't be read
+    """
+    if not os.path.isfile(cache_file):
+        return None
+    try:
+        cache_cnx = sqlite3.connect(cache_file)
+        try:
+            cursor = cache_cnx.cursor()
+            cursor.execute("SELECT result FROM events_cache WHERE fingerprint = ? AND key = ?", (fingerprint, key))
+            res = cursor.fetchone()
+        finally:
+            cache_cnx.close()
+    except sqlite3.Error as e:
+        print("WARNING : the cache %s can't be read (%s)" % (cache_file, e))
+        return None
+    return pickle.loads(res[0]) if res is not None else None
+
+
+def write_events_cache(cache_file, fingerprint, key, result):
+    """
+    Store a result in the cache file of a sed database, the results of the previous versions \
+    of the sed database are removed. Nothing is stored if ``cache_file`` can't be written \
+    (read-only directory, database locked by another process...).
+
+    :param cache_file: (string) the cache file of the sed database (``<sed database>_events_cache.db``)
+    :param fingerprint: (string) the fingerprint of the sed database (see ``get_sed_fingerprint``)
+    :param key: (string) the key of the result
+    :param result: (list of list) the result to store
+    """
+    try:
+        cache_cnx = sqlite3.connect(cache_file)
+        try:
+            cursor = cache_cnx.cursor()
+            cursor.execute("""CREATE TABLE IF NOT EXISTS events_cache (
+                              fingerprint VARCHAR(200) NOT NULL,
+                              key VARCHAR(200) NOT NULL,
+                              result BLOB NOT NULL,
+                              PRIMARY KEY(fingerprint, key));""")
+            cursor.execute("DELETE FROM events_cache WHERE fingerprint != ?", (fingerprint,))
+            cursor.execute("INSERT OR REPLACE INTO events_cache VALUES (?, ?, ?)",
+                           (fingerprint, key, pickle.dumps(result)))
+            cache_cnx.commit()
+        finally:
+            cache_cnx.close()
+    except sqlite3.Error as e:
+        print("WARNING : the result can't be saved in the cache %s (%s)" % (cache_file, e))
+
+
+def get_memoized_events(cnx, function, sf_name, regulation):
+    """
+    Get the exons regulated by a splicing factor, computed by ``function`` only if they are not \
+    already in the memory cache (the last ``events_cache_size`` results) or in the cache file of the \
+    sed database (``<sed database>_events_cache.db``). The results are stored with the splicing factor, \
+    the regulation, the thresholds of the regulated exons, the ignored projects and the fingerprint of \
+    the sed database (see ``get_sed_fingerprint``): they are computed again when one of them changes. \
+    If the cache file can't be used, only the memory cache is.
+
+    :param cnx: (sqlite3 connection object) connexion to sed database
+    :param function: (function) takes ``cnx``, ``sf_name`` and ``regulation`` and returns the regulated exons \
+    (ex: ``compute_every_events_4_a_sl``)
+    :param sf_name: (string) the name of a splicing factor
+    :param regulation: (string) up or down
+    :return: (list of list) the result of ``function``
+    """
+    fingerprint = get_sed_fingerprint(cnx)
+    if fingerprint is None:
+        return function(cnx, sf_name, regulation)
+    key = repr((events_cache_version, function.__name__, sf_name, regulation, delta_psi_threshold,
+                pvalue_threshold, sorted(group_factor.bad_id_projects)))
+    if (fingerprint, key) in events_cache:
+        events_cache.move_to_end((fingerprint, key))
+        return copy.deepcopy(events_cache[(fingerprint, key)])
+    cache_file = os.path.splitext(fingerprint.rsplit(":", 2)[0])[0] + "_events_cache.db"
+    result = read_events_cache(cache_file, fingerprint, key)
+    if result is None:
+        result = function(cnx, sf_name, regulation)
+        write_events_cache(cache_file, fingerprint, key, result)
+    events_cache[(fingerprint, key)] = result
+    if len(events_cache) > events_cache_size:
+        events_cache.popitem(last=False)
+    return copy.deepcopy(result)
 
 
 def get_every_events_4_a_sl(cnx, sf_name, regulation):
@@ -132,8 +276,58 @@ def get_every_events_4_a_sl(cnx, sf_name, regulation):
     :param sf_name: (string) the name of a splicing factor
     :param regulation: (string) up or down
     :return: (list of tuple of 2 int) each sublist corresponds to an exon (gene_id + exon_position on gene + \
-    exon_regulation). Every exon regulated by a splicing factor in different projects.
+    exon_regulation). Every exon regulated by a splicing factor in different projects. \
+    The result is memoized (see ``get_memoized_events``).
+    """
+    return get_memoized_events(cnx, compute_every_events_4_a_sl, sf_name, regulation)
+
+
+def get_sf_exon_set(cnx, sf_name, regulation):
+    """
+    Get the exons regulated by a splicing factor from the table **sf_exon_set** of the sed database, \
+    built with the same rules as ``compute_every_events_4_a_sl``.
+
+    :param cnx: (sqlite3 connection object) connexion to sed database
+    :param sf_name: (string) the name of a splicing factor
+    :param regulation: (string) up or down
+    :return: (list of tuple of 2 int) each sublist corresponds to an exon (gene_id + exon_position on gene), \
+    in the order of ``compute_every_events_4_a_sl`` (column ``exon_order``). None if the sed database \
+    doesn't contain the table **sf_exon_set** or if it was built with other thresholds or other ignored \
+    projects than ``delta_psi_threshold``, ``pvalue_threshold`` and ``group_factor.bad_id_projects`` \
+    (table **sf_exon_set_parameters**).
+    """
+    cursor = cnx.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sf_exon_set_parameters';")
+    if cursor.fetchone() is None:
+        return None
+    cursor.execute("SELECT delta_psi_threshold, pvalue_threshold, bad_id_projects FROM sf_exon_set_parameters")
+    if cursor.fetchall() != [(delta_psi_threshold, pvalue_threshold,
+                              ",".join(map(str, sorted(group_factor.bad_id_projects))))]:
+        return None
+    query = """SELECT gene_id, exon_pos
+               FROM sf_exon_set
+               WHERE sf_name = ?
+               AND regulation = ?
+               ORDER BY exon_order"""
+    cursor.execute(query, (sf_name, regulation))
+    return cursor.fetchall()
+
+
+def compute_every_events_4_a_sl(cnx, sf_name, regulation):
     """
+    Get every splicing events for a give splicing factor.
+
+    :param cnx: (sqlite3 connection object) connexion to sed database
+    :param sf_name: (string) the name of a splicing factor
+    :param regulation: (string) up or down
+    :return: (list of tuple of 2 int) each sublist corresponds to an exon (gene_id + exon_position on gene + \
+    exon_regulation). Every exon regulated by a splicing factor in different projects. \
+    The exons are read in the table **sf_exon_set** if the sed database contains it and if it was built \
+    with the same thresholds and ignored projects (see ``get_sf_exon_set``).
+    """
+    exon_set = get_sf_exon_set(cnx, sf_name, regulation)
+    if exon_set is not None:
+        return exon_set
     exons_list = []
     id_projects = get_projects_links_to_a_splicing_factor(cnx, sf_name)
     for id_project in id_projects:
@@ -153,6 +347,21 @@ def get_events_4_a_sl(cnx, sf_name, regulation):
     Get every splicing events for a give splicing factor. Every exon down or up saw at least once will be reported \
     even if for a splicing factor some exons are up-and down regulated in differents project.
 
+    :param cnx: (sqlite3 connection object) connexion to sed database
+    :param sf_name: (string) the name of a splicing factor
+    :param regulation: (string) up or down
+    :return: (list of tuple of 2 int) each sublist corresponds to an exon (gene_id + exon_position on gene + \
+    exon_regulation). Every exon regulated by a splicing factor in different projects. \
+    The result is memoized (see ``get_memoized_events``).
+    """
+    return get_memoized_events(cnx, compute_events_4_a_sl, sf_name, regulation)
+
+
+def compute_events_4_a_sl(cnx, sf_name, regulation):
+    """
+    Get every splicing events for a give splicing factor. Every exon down or up saw at least once will be reported \
+    even if for a splicing factor some exons are up-and down regulated in differents project.
+
     :param cnx: (sqlite3 connection object) connexion to sed database
     :param sf_name: (string) the name of a splicing factor
     :param regulation: (string) up or down
@@ -179,25 +388,15 @@ def washing_events_all(exon_list):
     """
     Remove redundant exons
 
-    :param exon_list: (list of tuple of 2 int ans 1 str) each sublist corresponds to an exon \
-    (gene_id + exon_position on gene + exon_regulation). \
+    :param exon_list: (list of tuple of 2 int) each sublist corresponds to an exon \
+    (gene_id + exon_position on gene). \
     Every exon regulated by a splicing factor in different projects.
-    :return: (list of tuple of 2 int ans 1 str) each sublist corresponds to an exon (gene_id + exon_position on gene + \
-    exon_regulation). Every exon regulated by a splicing factor in different projects without redundancy.
+    :return: (list of tuple of 2 int) each sublist corresponds to an exon (gene_id + exon_position on gene). \
+    Every exon regulated by a splicing factor in different projects without redundancy, in the order \
+    of their first occurrence in ``exon_list``.
     """
-    dic = {}
-    for exon in exon_list:
-        exon_name = "%s_%s" % (exon[0], exon[1])
-        if exon_name not in dic:
-            dic[exon_name] = 1
-        else:
-            dic[exon_name] += 1
-    # creation of the new list of exons
-    new_exon_list = []
-    for key in dic:
-        my_exon = key.split("_")
-        new_exon_list.append(my_exon)
-    return new_exon_list
+    keys = collections.OrderedDict.fromkeys(get_exon_key(exon[0], exon[1]) for exon in exon_list)
+    return [(key >> exon_pos_bits, key & exon_pos_mask) for key in keys]
 
 
 def get_exon_regulated_by_sf(cnx, regulation):
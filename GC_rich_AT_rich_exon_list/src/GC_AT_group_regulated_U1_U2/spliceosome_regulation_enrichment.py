@@ -17,6 +17,7 @@ import rpy2.robjects as robj
 import rpy2.robjects.vectors as v
 sys.path.insert(0, os.path.realpath(os.path.dirname(__file__).replace("/GC_AT_group_regulated_U1_U2", "")))
 import group_factor
+import union_dataset_function
 from figure_creator import get_exons_list
 
 
@@ -88,7 +89,7 @@ def get_control_exon(cnx, exon_type):
     if exon_type != "ALL":
         query = """SELECT gene_id, exon_pos
                    FROM sed
-                   WHERE exon_type LIKE '%{}%'""".format(exon_type)
+                   WHERE {}""".format(union_dataset_function.get_exon_type_condition(cnx, exon_type))
     else:
         query = """SELECT gene_id, exon_pos
                    FROM sed"""
@@ -9,6 +9,11 @@ median_intron_size of the AT, GC, CCE genes (gene containing at least one exons
 """
 
 import numpy as np
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)).replace("/boxplot_GC_content_and_flanking_intron_size",
+                                                                       ""))
+import union_dataset_function
 
 
 def get_exon_control_min_flanking_intron_size(cnx, exon_type, exon2remove):
@@ -24,8 +29,8 @@ def get_exon_control_min_flanking_intron_size(cnx, exon_type, exon2remove):
     if exon_type != "ALL":
         query = """SELECT gene_id, exon_pos, upstream_intron_size, downstream_intron_size
                        FROM sed
-                       WHERE exon_type LIKE '%{}%'
-                       """.format(exon_type)
+                       WHERE {}
+                       """.format(union_dataset_function.get_exon_type_condition(cnx, exon_type))
     else:
         query = """SELECT gene_id, exon_pos, upstream_intron_size, downstream_intron_size
                        FROM exons
@@ -53,8 +58,8 @@ def get_gene_control_median_flanking_intron_size(cnx, exon_type, gene2remove):
     if exon_type != "ALL":
         query = """SELECT DISTINCT median_intron_size, gene_id
                        FROM sed
-                       WHERE exon_type LIKE '%{}%'
-                       """.format(exon_type)
+                       WHERE {}
+                       """.format(union_dataset_function.get_exon_type_condition(cnx, exon_type))
     else:
         query = """SELECT DISTINCT median_intron_size, gene_id
                        FROM exons
@@ -8,6 +8,12 @@ for the gene containing those exons)
 """
 
 import numpy as np
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)).replace("/boxplot_GC_content_and_flanking_intron_size",
+                                                                       ""))
+import union_dataset_function
+import sed_cache
 
 
 def get_exon_control_gc_content(cnx, exon_type, exon2remove):
@@ -23,8 +29,8 @@ def get_exon_control_gc_content(cnx, exon_type, exon2remove):
     if exon_type != "ALL":
         query = """SELECT gene_id, exon_pos, iupac_exon
                        FROM sed
-                       WHERE exon_type LIKE '%{}%'
-                       """.format(exon_type)
+                       WHERE {}
+                       """.format(union_dataset_function.get_exon_type_condition(cnx, exon_type))
     else:
         query = """SELECT gene_id, exon_pos, iupac_exon
                        FROM exons
@@ -50,8 +56,8 @@ def get_gene_control_gc_content(cnx, exon_type, gene2remove):
     if exon_type != "ALL":
         query = """SELECT DISTINCT iupac_gene, gene_id
                        FROM sed
-                       WHERE exon_type LIKE '%{}%'
-                       """.format(exon_type)
+                       WHERE {}
+                       """.format(union_dataset_function.get_exon_type_condition(cnx, exon_type))
     else:
         query = """SELECT DISTINCT iupac_gene, gene_id
                        FROM exons
@@ -114,14 +120,14 @@ def extract_exon_gc_content_from_file(cnx, filename):
     :param filename: (string) the name of the file containing  exons
     :return: (list of float) the list of the gc content of the exon in ``filename``
     """
-    list_gc = []
+    exon_list = []
     with open(filename, "r") as in_file:
         line = in_file.readline()
         while line:
             line = line.split("\t")
-            list_gc.append(calculate_exon_gc_content(cnx, line[0], line[1]))
+            exon_list.append([line[0], line[1]])
             line = in_file.readline()
-    return list_gc
+    return extract_exon_gc_content_from_list(cnx, exon_list)
 
 
 def extract_gene_gc_content_from_file(cnx, filename, gene2remove):
@@ -156,6 +162,9 @@ def extract_exon_gc_content_from_list(cnx, exon_list):
     :param exon_list: (list of 2 int) list of exons identified by its gene_id and position wihtin this gene
     :return: (list of float) the list of gc content of every exons within
     """
+    cache = sed_cache.get_sed_cache(cnx)
+    if cache is not None:
+        return cache.get_values(exon_list, "iupac_exon", "S").tolist()
     list_gc = []
     for exon in exon_list:
         list_gc.append(calculate_exon_gc_content(cnx, exon[0], exon[1]))
@@ -170,6 +179,9 @@ def extract_gene_gc_content_from_list(cnx, gene_list):
     :param gene_list: (list of 1 int) list of gene_id
     :return: (list of float) the list of gc content of every gene within ``gene_list``
     """
+    cache = sed_cache.get_sed_cache(cnx)
+    if cache is not None:
+        return cache.get_gene_values(gene_list, "iupac_gene", "S").tolist()
     list_gc = []
     for gene in gene_list:
         val = calculate_gene_gc_content(cnx, gene)
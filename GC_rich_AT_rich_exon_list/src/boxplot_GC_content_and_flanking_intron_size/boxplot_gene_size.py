@@ -8,6 +8,11 @@ Description:
 """
 
 import numpy as np
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)).replace("/boxplot_GC_content_and_flanking_intron_size",
+                                                                       ""))
+import union_dataset_function
 
 
 def get_control_gene_size(cnx, exon_type, gene2remove):
@@ -23,8 +28,8 @@ def get_control_gene_size(cnx, exon_type, gene2remove):
     if exon_type != "ALL":
         query = """SELECT DISTINCT gene_size, gene_id
                        FROM sed
-                       WHERE exon_type LIKE '%{}%'
-                       """.format(exon_type)
+                       WHERE {}
+                       """.format(union_dataset_function.get_exon_type_condition(cnx, exon_type))
     else:
         query = """SELECT DISTINCT gene_size, gene_id
                    FROM sed
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+"""
+Description:
+
+    This script contains the functions used to compute long loops over a list of exons \
+    chunk by chunk, with a checkpoint store: the result of each chunk is committed in a \
+    local sqlite database with the position of the last exon it covers. If the computation \
+    is stopped, a restart loads the chunks already computed and resumes after the last one.
+"""
+
+import sqlite3
+import pickle
+import hashlib
+
+CHUNK_SIZE = 500  # number of exons computed between two commits of the checkpoint store
+
+
+def checkpoint_connection(checkpoint_file):
+    """
+    Connection to a checkpoint store, the store is created if it doesn't exist.
+
+    :param checkpoint_file: (string) path to the checkpoint store
+    :return: (sqlite3 object) connection to the checkpoint store
+    """
+    cnx = sqlite3.connect(checkpoint_file)
+    cursor = cnx.cursor()
+    query = """CREATE TABLE IF NOT EXISTS checkpoint (
+               name VARCHAR(100) NOT NULL,
+               items_hash VARCHAR(40) NOT NULL,
+               chunk INT NOT NULL,
+               last_position INT NOT NULL,
+               result BLOB NOT NULL,
+               PRIMARY KEY(name, chunk));
+               """
+    cursor.execute(query)
+    cnx.commit()
+    return cnx
+
+
+def clear_checkpoint(cnx, name):
+    """
+    Remove the chunks of a computation from the checkpoint store.
+
+    :param cnx: (sqlite3 object) connection to the checkpoint store
+    :param name: (string) the name of the computation
+    """
+    cursor = cnx.cursor()
+    cursor.execute("DELETE FROM checkpoint WHERE name = ?", (name,))
+    cnx.commit()
+
+
+def run_by_chunks(cnx, name, items, compute, chunk_size=CHUNK_SIZE):
+    """
+    Apply ``compute`` to ``items``, chunk by chunk. The result of each chunk is committed in the \
+    checkpoint store. The chunks already stored for ``name`` are loaded instead of being computed \
+    again, unless ``items`` changed since they were stored.
+
+    :param cnx: (sqlite3 object) connection to the checkpoint store
+    :param name: (string) the name of the computation
+    :param items: (list) the items to compute (ex: list of control exons)
+    :param compute: (function) takes a sublist of ``items`` and returns a picklable result
+    :param chunk_size: (int) the number of items in a chunk
+    :return: (list) the result of ``compute`` for each chunk of ``items``, in order
+    """
+    items_hash = hashlib.sha1(repr(items).encode()).hexdigest()
+    cursor = cnx.cursor()
+    cursor.execute("SELECT DISTINCT items_hash FROM checkpoint WHERE name = ?", (name,))
+    if [row[0] for row in cursor.fetchall()] not in [[], [items_hash]]:
+        print("The items of %s changed since the last checkpoint, starting from the beginning" % name)
+        clear_checkpoint(cnx, name)
+    cursor.execute("SELECT last_position, result FROM checkpoint WHERE name = ? ORDER BY chunk", (name,))
+    results = []
+    position = 0
+    for last_position, result in cursor.fetchall():
+        results.append(pickle.loads(result))
+        position = last_position
+    if position > 0:
+        print("Resuming %s after %s / %s items" % (name, position, len(items)))
+    while position < len(items) or not results:
+        chunk = items[position:position + chunk_size]
+        results.append(compute(chunk))
+        position += len(chunk)
+        cursor.execute("INSERT INTO checkpoint VALUES (?, ?, ?, ?, ?)",
+                       (name, items_hash, len(results) - 1, position, pickle.dumps(results[-1])))
+        cnx.commit()
+    return results
+
+
+def merge_chunk_results(results):
+    """
+    Merge the results of the chunks of a computation: the lists are concatenated, \
+    the tuples and the dictionaries are merged element by element.
+
+    :param results: (list) the result of each chunk (see ``run_by_chunks``)
+    :return: the result of the whole computation
+    """
+    if isinstance(results[0], tuple):
+        return tuple(merge_chunk_results(list(values)) for values in zip(*results))
+    if isinstance(results[0], dict):
+        return {key: merge_chunk_results([result[key] for result in results]) for key in results[0]}
+    return [value for result in results for value in result]
@@ -100,7 +100,7 @@ def input_writer_union(washed_exon_list, sf_name, output):
     """
     with open("%sinput_%s-union.txt" % (output, sf_name.strip()), "w") as out_file:
         for exon in washed_exon_list:
-            out_file.write(exon[0] + "\t" + exon[1] + "\n")
+            out_file.write("%s\t%s\n" % (exon[0], exon[1]))
 
 
 def main():
@@ -90,7 +90,7 @@ def get_control_exon_information(cnx, exon_type, target_column):
     if exon_type != "ALL":
         query = """SELECT {}
                    FROM sed
-                   WHERE exon_type LIKE '%{}%'""".format(target_column, exon_type)
+                   WHERE {}""".format(target_column, union_dataset_function.get_exon_type_condition(cnx, exon_type))
     else:
         query = """SELECT {}
                    FROM sed
@@ -15,6 +15,7 @@ import function_bp
 import sys
 sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)).replace("/make_control_files_bp_ppt", ""))
 import union_dataset_function
+import checkpoint
 
 
 def get_control_exon_information(cnx, exon_type, exon2remove):
@@ -32,8 +33,9 @@ def get_control_exon_information(cnx, exon_type, exon2remove):
     if exon_type != "ALL":
         query = """SELECT t2.official_symbol, t1.id_gene, t1.pos_on_gene
                    FROM exons t1, genes t2
-                   WHERE t1.exon_type LIKE '%{}%'
-                   AND t1.id_gene = t2.id""".format(exon_type)
+                   WHERE {}
+                   AND t1.id_gene = t2.id""".format(
+            union_dataset_function.get_exon_type_condition(cnx, exon_type, "exons", "t1"))
     else:
         query = """SELECT t2.official_symbol, t1.id_gene, t1.pos_on_gene
                    FROM exons t1, genes t2
@@ -48,9 +50,25 @@ def get_control_exon_information(cnx, exon_type, exon2remove):
     return nresult
 
 
+def bp_ppt_chunk_calculator(cnx, ctrl_exon_list, sizes):
+    """
+    Compute the bp and ppt scores of some control exons for every size of upstream sequence.
+
+    :param cnx: (sqlite3 object) connection to fasterDB Lite
+    :param ctrl_exon_list: (list of list of string and 2 int) the gene symbol, the gene id and the position \
+    of the control exons
+    :param sizes: (list of int) the sizes of the upstream sequences wanted
+    :return: (dictionary of tuple of list) links each size to the results of ``function_bp.bp_ppt_calculator``
+    """
+    list_exon = [exon_class_bp.ExonClass(cnx, exon[0], exon[1], exon[2]) for exon in ctrl_exon_list]
+    return {size: function_bp.bp_ppt_calculator(list_exon, size) for size in sizes}
+
+
 def control_dictionaries_creator():
     """
-    Create the control dictionary containing the values corresponding to the score of bp and ppt for every control exons
+    Create the control dictionary containing the values corresponding to the score of bp and ppt for every control exons. \
+    The scores are computed by chunks of exons saved in a checkpoint store (``control_dictionaries/checkpoint.db``), \
+    a restart resumes after the last saved chunk.
     """
     exon_class_bp.set_debug(0)
     dir_path = os.path.dirname(os.path.realpath(__file__))
@@ -63,16 +81,19 @@ def control_dictionaries_creator():
     exon2remove = union_dataset_function.get_exon_regulated_by_sf(cnx_sed, "down")
     if not os.path.isdir(ctrl_dir):
         os.mkdir(ctrl_dir)
+    cnx_checkpoint = checkpoint.checkpoint_connection(ctrl_dir + "checkpoint.db")
     exon_type = ["CCE"]
     sizes = [100, 50, 35, 25]
     for cur_exon_type in exon_type:
         ctrl_exon_list = get_control_exon_information(cnx, cur_exon_type, exon2remove)
-        print("retrieving upstream intron sequence")
-        list_exon = [exon_class_bp.ExonClass(cnx, exon[0], exon[1], exon[2]) for exon in ctrl_exon_list]
+        print("retrieving upstream intron sequence and calculating bp and ppt score")
+        checkpoint_name = "%s_bp_ppt" % cur_exon_type
+        results = checkpoint.run_by_chunks(cnx_checkpoint, checkpoint_name, ctrl_exon_list,
+                                           lambda chunk: bp_ppt_chunk_calculator(cnx, chunk, sizes))
+        results = checkpoint.merge_chunk_results(results)
         for size in sizes:
-            print("calculating bp and ppt score")
             bp_score_list, ppt_score_list, nb_bp_list, nb_good_bp_list, sequence_list, ag_count_list, \
-                hbound_list, uaa_list, una_list = function_bp.bp_ppt_calculator(list_exon, size)
+                hbound_list, uaa_list, una_list = results[size]
             cur_file = open(ctrl_dir + cur_exon_type + "_" + str(size) + "_bp_ppt_score.py", "w")
             cur_file.write("bp_score=" + str(bp_score_list) + "\n")
             cur_file.write("ppt_score=" + str(ppt_score_list) + "\n")
@@ -84,6 +105,7 @@ def control_dictionaries_creator():
             cur_file.write("uaa_count=" + str(uaa_list) + "\n")
             cur_file.write("una_count=" + str(una_list) + "\n")
             cur_file.close()
+        checkpoint.clear_checkpoint(cnx_checkpoint, checkpoint_name)
 
 
 def main():
@@ -10,6 +10,7 @@ import win_size
 import sys
 sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)).replace("/metaexon_figure", ""))
 import union_dataset_function
+import checkpoint
 
 
 def get_control_exon_information(cnx, exon_type, exon2remove):
@@ -27,8 +28,9 @@ def get_control_exon_information(cnx, exon_type, exon2remove):
     if exon_type != "ALL":
         query = """SELECT t2.official_symbol, t1.id_gene, t1.pos_on_gene
                     FROM exons t1, genes t2
-                    WHERE t1.exon_type LIKE '%{}%'
-                    AND t1.id_gene = t2.id""".format(exon_type)
+                    WHERE {}
+                    AND t1.id_gene = t2.id""".format(
+            union_dataset_function.get_exon_type_condition(cnx, exon_type, "exons", "t1"))
     else:
         query = """SELECT t2.official_symbol, t1.id_gene, t1.pos_on_gene
                     FROM exons t1, genes t2
@@ -49,6 +51,8 @@ def control_dictionaries_creator(window_size):
     display the frequencies of a given nucleotide in a meta-exon figures for the control exons. \
     Create control dictionary files that contain the values for the boxplot, metagene and metagene windowed figure for \
     coding CCE exons, CE exon, ACE exons and ASE exons.
+    The control exons are created by chunks saved in a checkpoint store (``control_dictionaries/checkpoint.db``), \
+    a restart resumes after the last saved chunk.
     :param window_size: (int) the size of the window we want to use to create the control metagene windowsed \
     dictionaries
     """
@@ -61,12 +65,18 @@ def control_dictionaries_creator(window_size):
     cnx_sed = sqlite3.connect(seddb)
     if not os.path.isdir(ctrl_dir):
         os.mkdir(ctrl_dir)
+    cnx_checkpoint = checkpoint.checkpoint_connection(ctrl_dir + "checkpoint.db")
     exon2remove = union_dataset_function.get_exon_regulated_by_sf(cnx_sed, "down")
     exon_type = ["ACE", "CCE"]
     for cur_exon_type in exon_type:
         ctrl_exon_list = get_control_exon_information(cnx, cur_exon_type, exon2remove)
         # ctrl_exon_list = ctrl_exon_list[0:2]
-        list_exon = [exon_class_metaexon.ExonClass(cnx, exon[0], exon[1], exon[2], window_size) for exon in ctrl_exon_list]
+        checkpoint_name = "%s_metaexon_%s" % (cur_exon_type, window_size)
+        list_exon = checkpoint.run_by_chunks(cnx_checkpoint, checkpoint_name, ctrl_exon_list,
+                                             lambda chunk: [exon_class_metaexon.ExonClass(cnx, exon[0], exon[1],
+                                                                                          exon[2], window_size)
+                                                            for exon in chunk])
+        list_exon = checkpoint.merge_chunk_results(list_exon)
         print("creating metagene windowsed")
         final_res_5p, final_res_3p, p5_analyzed, p3_analyzed = \
             exon_class_metaexon.get_metagene_vectors_windowsed(list_exon, window_size)
@@ -77,6 +87,7 @@ def control_dictionaries_creator(window_size):
         cur_file.write("# " + str(p5_analyzed) + " sequences 5' analysees\n")
         cur_file.write("# " + str(p3_analyzed) + " sequences 3' analysees\n")
         cur_file.close()
+        checkpoint.clear_checkpoint(cnx_checkpoint, checkpoint_name)
         del (final_res_5p, final_res_3p, p5_analyzed, p3_analyzed)
 
 
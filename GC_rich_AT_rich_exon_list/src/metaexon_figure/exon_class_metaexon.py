@@ -13,6 +13,10 @@ Description:
 
 import math
 import numpy as np
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)).replace("/metaexon_figure", ""))
+from packed_sequence import is_packed, get_length, get_sequence
 
 
 class ExonClassMain:
@@ -84,7 +88,7 @@ class ExonClass(ExonClassMain):
         self.downstream_intron = Intron(cnx, gene_id, self.position, "downstream")
         self.sequence_5p_ext = None
         self.sequence_3p_ext = None
-        self.retrieve_adjacent_exon_sequence(window_size)
+        self.retrieve_adjacent_exon_sequence(cnx, window_size)
         printd("sequence_5p_ext")
         printd(self.sequence_5p_ext)
         printd("sequence_3p_ext")
@@ -92,18 +96,25 @@ class ExonClass(ExonClassMain):
         # once the exon is fully created we delete the gene sequence for memory efficiency
         self.gene.sequence = None
 
-    def retrieve_adjacent_exon_sequence(self, window_size):
+    def retrieve_adjacent_exon_sequence(self, cnx, window_size):
         """
-        Retrieve the adjacent exon sequences
+        Retrieve the adjacent exon sequences. Only the ends of the exon and of its introns \
+        used by the sequences are read.
+
+        :param cnx: (sqlite3 object) connection to fasterDB Lite
         :param window_size: (int) the size of the windows
         :return: (2 string) the sequences surrounding the introns
         """
         val_start = 100 + math.floor(window_size/2)
         val_stop = 50 + round(window_size/2)
+        length = self.gene.length or 0
+        if self.start is not None and self.end is not None:
+            exon_start, exon_end, step = slice(self.start, self.end).indices(length)
         if self.upstream_intron.start is not None and self.upstream_intron.end \
                 and self.start is not None and self.end is not None:
-            upstream_sequence = self.gene.sequence[self.upstream_intron.start:self.upstream_intron.end]
-            exon_sequence = self.gene.sequence[self.start:self.end]
+            intron_start, intron_end, step = slice(self.upstream_intron.start, self.upstream_intron.end).indices(length)
+            upstream_sequence = self.gene.get_region(cnx, max(intron_start, intron_end - val_start), intron_end)
+            exon_sequence = self.gene.get_region(cnx, exon_start, min(exon_end, exon_start + val_stop))
             if len(upstream_sequence) > val_start:
                 upstream_sequence = upstream_sequence[-val_start:]
             else:
@@ -121,8 +132,10 @@ class ExonClass(ExonClassMain):
 
         if self.downstream_intron.start is not None and self.downstream_intron.end and \
                 self.start is not None and self.end is not None:
-            downstream_sequence = self.gene.sequence[self.downstream_intron.start:self.downstream_intron.end]
-            exon_sequence = self.gene.sequence[self.start:self.end]
+            intron_start, intron_end, step = slice(self.downstream_intron.start,
+                                                   self.downstream_intron.end).indices(length)
+            downstream_sequence = self.gene.get_region(cnx, intron_start, min(intron_end, intron_start + val_start))
+            exon_sequence = self.gene.get_region(cnx, max(exon_start, exon_end - val_stop), exon_end)
             if len(exon_sequence) > val_stop:
                 exon_sequence = exon_sequence[-val_stop:]
             else:
@@ -164,7 +177,8 @@ class Gene:
 
     def gene_filler(self, cnx):
         """
-        Get iupac-dnt information and length of a gene
+        Get iupac-dnt information and length of a gene. If the gene sequences of fasterDB are packed, \
+        only the length of the gene is read: its regions are decoded by ``get_region``.
 
         :param cnx: (sqlite3 object) connection to fasterDB
         """
@@ -179,12 +193,30 @@ class Gene:
             print("Exiting...")
             exit(1)
         sequence = result[0][0]
+        if not sequence and is_packed(cnx):
+            self.length = get_length(cnx, self.id) or None
+            return None
         self.sequence = sequence
         if len(sequence) > 0:
             self.length = len(sequence)
         else:
             self.length = None
 
+    def get_region(self, cnx, start, end):
+        """
+        Get a region of the gene sequence.
+
+        :param cnx: (sqlite3 object) connection to fasterDB
+        :param start: (int) start of the region, its bounds are those of the python \
+        slice ``sequence[start:end]`` of the gene sequence
+        :param end: (int) end of the region
+        :return: (string) the sequence of the region, only the region is decoded if \
+        the gene sequence is packed
+        """
+        if self.sequence is None:
+            return get_sequence(cnx, self.id, start, end)
+        return self.sequence[start:end]
+
 
 class Intron:
     """Create an intron"""
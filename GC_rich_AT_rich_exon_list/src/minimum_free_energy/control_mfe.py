@@ -15,6 +15,7 @@ import function
 import sys
 sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)).replace("/minimum_free_energy", ""))
 import union_dataset_function
+import checkpoint
 
 
 def get_control_exon_information(cnx, exon_type, exon2remove):
@@ -32,8 +33,9 @@ def get_control_exon_information(cnx, exon_type, exon2remove):
     if exon_type != "ALL":
         query = """SELECT t2.official_symbol, t1.id_gene, t1.pos_on_gene
                    FROM exons t1, genes t2
-                   WHERE t1.exon_type LIKE '%{}%'
-                   AND t1.id_gene = t2.id""".format(exon_type)
+                   WHERE {}
+                   AND t1.id_gene = t2.id""".format(
+            union_dataset_function.get_exon_type_condition(cnx, exon_type, "exons", "t1"))
     else:
         query = """SELECT t2.official_symbol, t1.id_gene, t1.pos_on_gene
                    FROM exons t1, genes t2
@@ -48,9 +50,24 @@ def get_control_exon_information(cnx, exon_type, exon2remove):
     return nresult
 
 
+def mfe_chunk_calculator(cnx, ctrl_exon_list):
+    """
+    Compute the mfe at the 3' and 5' splice sites of some control exons.
+
+    :param cnx: (sqlite3 object) connection to fasterDB Lite
+    :param ctrl_exon_list: (list of list of string and 2 int) the gene symbol, the gene id and the position \
+    of the control exons
+    :return: (tuple of 2 lists of float) the result of ``function.mfe_calculator``
+    """
+    list_exon = [exon_class.ExonClass(cnx, exon[0], exon[1], exon[2]) for exon in ctrl_exon_list]
+    return tuple(function.mfe_calculator(list_exon))
+
+
 def control_dictionaries_creator():
     """
-    Create the control dictionary containing the values corresponding to the score of bp and ppt for every control exons
+    Create the control dictionary containing the values corresponding to the score of bp and ppt for every control exons. \
+    The mfe are computed by chunks of exons saved in a checkpoint store (``control_dictionaries/checkpoint.db``), \
+    a restart resumes after the last saved chunk.
     """
     exon_class.set_debug(0)
     dir_path = os.path.dirname(os.path.realpath(__file__))
@@ -61,17 +78,20 @@ def control_dictionaries_creator():
     cnx_sed = sqlite3.connect(seddb)
     if not os.path.isdir(ctrl_dir):
         os.mkdir(ctrl_dir)
+    cnx_checkpoint = checkpoint.checkpoint_connection(ctrl_dir + "checkpoint.db")
     exon_type = "CCE"
     exon2remove = union_dataset_function.get_exon_regulated_by_sf(cnx_sed, "down")
     ctrl_exon_list = get_control_exon_information(cnx, exon_type, exon2remove)
-    print("retrieving upstream intron sequence")
-    list_exon = [exon_class.ExonClass(cnx, exon[0], exon[1], exon[2]) for exon in ctrl_exon_list]
-    print("calculating mfe")
-    mfe_list_3ss,  mfe_list_5ss = function.mfe_calculator(list_exon)
+    print("retrieving upstream intron sequence and calculating mfe")
+    checkpoint_name = "%s_mfe" % exon_type
+    results = checkpoint.run_by_chunks(cnx_checkpoint, checkpoint_name, ctrl_exon_list,
+                                       lambda chunk: mfe_chunk_calculator(cnx, chunk))
+    mfe_list_3ss,  mfe_list_5ss = checkpoint.merge_chunk_results(results)
     cur_file = open(ctrl_dir + exon_type + "_mfe.py", "w")
     cur_file.write("mfe_3ss=" + str(mfe_list_3ss) + "\n")
     cur_file.write("mfe_5ss=" + str(mfe_list_5ss) + "\n")
     cur_file.close()
+    checkpoint.clear_checkpoint(cnx_checkpoint, checkpoint_name)
 
 
 def main():
@@ -8,6 +8,11 @@ Description:
 
 """
 
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)).replace("/minimum_free_energy", ""))
+from packed_sequence import is_packed, get_length, get_sequence
+
 
 class ExonClassMain:
     """
@@ -67,10 +72,11 @@ class ExonClass(ExonClassMain):
         self.gene.gene_filler(cnx)
         self.seq_3ss = None
         self.seq_5ss = None
-        if self.start - 25 >= 0 and self.start + 25 < len(self.gene.sequence):
-            self.seq_3ss = self.gene.sequence[self.start - 25: self.start + 25]
-        if self.stop - 25 >= 0 and self.stop + 25 < len(self.gene.sequence):
-            self.seq_5ss = self.gene.sequence[self.stop - 25: self.stop + 25]
+        length = self.gene.length or 0
+        if self.start - 25 >= 0 and self.start + 25 < length:
+            self.seq_3ss = self.gene.get_region(cnx, self.start - 25, self.start + 25)
+        if self.stop - 25 >= 0 and self.stop + 25 < length:
+            self.seq_5ss = self.gene.get_region(cnx, self.stop - 25, self.stop + 25)
         # once the exon is fully created we delete the gene sequence for memory efficiency
         printd("3' ss sequence")
         printd(self.seq_3ss)
@@ -97,7 +103,8 @@ class Gene:
 
     def gene_filler(self, cnx):
         """
-        Get iupac-dnt information and length of a gene
+        Get iupac-dnt information and length of a gene. If the gene sequences of fasterDB are packed, \
+        only the length of the gene is read: its regions are decoded by ``get_region``.
 
         :param cnx: (sqlite3 object) connection to fasterDB
         """
@@ -112,12 +119,30 @@ class Gene:
             print("Exiting...")
             exit(1)
         sequence = result[0][0]
+        if not sequence and is_packed(cnx):
+            self.length = get_length(cnx, self.id) or None
+            return None
         self.sequence = sequence
         if len(sequence) > 0:
             self.length = len(sequence)
         else:
             self.length = None
 
+    def get_region(self, cnx, start, end):
+        """
+        Get a region of the gene sequence.
+
+        :param cnx: (sqlite3 object) connection to fasterDB
+        :param start: (int) start of the region, its bounds are those of the python \
+        slice ``sequence[start:end]`` of the gene sequence
+        :param end: (int) end of the region
+        :return: (string) the sequence of the region, only the region is decoded if \
+        the gene sequence is packed
+        """
+        if self.sequence is None:
+            return get_sequence(cnx, self.id, start, end)
+        return self.sequence[start:end]
+
 
 def set_debug(debug=0):
     """
@@ -18,6 +18,7 @@ sys.path.insert(0, os.path.realpath(os.path.dirname(__file__)).replace("stretch_
 import exon_class_bp
 sys.path.insert(0, os.path.realpath(os.path.dirname(__file__)).replace("/stretch_calculator", ""))
 import union_dataset_function
+import checkpoint
 
 
 def get_control_exon_information(cnx, exon_type, exon2remove):
@@ -35,8 +36,9 @@ def get_control_exon_information(cnx, exon_type, exon2remove):
     if exon_type != "ALL":
         query = """SELECT t2.official_symbol, t1.id_gene, t1.pos_on_gene
                    FROM exons t1, genes t2
-                   WHERE t1.exon_type LIKE '%{}%'
-                   AND t1.id_gene = t2.id""".format(exon_type)
+                   WHERE {}
+                   AND t1.id_gene = t2.id""".format(
+            union_dataset_function.get_exon_type_condition(cnx, exon_type, "exons", "t1"))
     else:
         query = """SELECT t2.official_symbol, t1.id_gene, t1.pos_on_gene
                    FROM exons t1, genes t2
@@ -51,9 +53,28 @@ def get_control_exon_information(cnx, exon_type, exon2remove):
     return nresult
 
 
+def stretch_chunk_calculator(cnx, ctrl_exon_list, stretches, sequence_boundaries):
+    """
+    Count the stretches in the upstream intron of some control exons.
+
+    :param cnx: (sqlite3 object) connection to fasterDB Lite
+    :param ctrl_exon_list: (list of list of string and 2 int) the gene symbol, the gene id and the position \
+    of the control exons
+    :param stretches: (list of list of 2 int) the stretches to count (see ``config.stretches``)
+    :param sequence_boundaries: (list of 2 int) the indices of the upstream sequence wanted
+    :return: (dictionary of dictionary of list of int) links the index of each stretch in ``stretches`` \
+    to the result of ``stretch_calculator.stretch_counter``
+    """
+    list_exon = [exon_class_bp.ExonClass(cnx, exon[0], exon[1], exon[2]) for exon in ctrl_exon_list]
+    return {i: stretch_calculator.stretch_counter(list_exon, cur_stretch, sequence_boundaries)
+            for i, cur_stretch in enumerate(stretches)}
+
+
 def control_dictionaries_creator():
     """
-    Create the control dictionary containing the values corresponding to the score of bp and ppt for every control exons
+    Create the control dictionary containing the values corresponding to the score of bp and ppt for every control exons. \
+    The stretches are computed by chunks of exons saved in a checkpoint store \
+    (``control_dictionaries/checkpoint.db``), a restart resumes after the last saved chunk.
     """
     exon_class_bp.set_debug(0)
     dir_path = os.path.dirname(os.path.realpath(__file__))
@@ -65,20 +86,24 @@ def control_dictionaries_creator():
     exon2remove = union_dataset_function.get_exon_regulated_by_sf(cnx_sed, "down")
     if not os.path.isdir(ctrl_dir):
         os.mkdir(ctrl_dir)
+    cnx_checkpoint = checkpoint.checkpoint_connection(ctrl_dir + "checkpoint.db")
     exon_type = config.exon_type
     stretches = config.stretches
     sequence_boundaries = config.sequence_boundaries
     for cur_exon_type in exon_type:
         print("Working on %s exons ..." % cur_exon_type)
         ctrl_exon_list = get_control_exon_information(cnx, cur_exon_type, exon2remove)
-        print("\t--> Getting upstream intron sequence")
-        list_exon = [exon_class_bp.ExonClass(cnx, exon[0], exon[1], exon[2]) for exon in ctrl_exon_list]
+        print("\t--> Getting upstream intron sequence and calculating stretches")
+        checkpoint_name = "%s_stretches" % cur_exon_type
+        results = checkpoint.run_by_chunks(cnx_checkpoint, checkpoint_name, ctrl_exon_list,
+                                           lambda chunk: stretch_chunk_calculator(cnx, chunk, stretches,
+                                                                                  sequence_boundaries))
+        results = checkpoint.merge_chunk_results(results)
         cur_file = open(ctrl_dir + cur_exon_type + "_stretches.py", "w")
-        for cur_stretch in stretches:
-            print("\t--> Calculating stretches %s/%s" % (cur_stretch[1], cur_stretch[0]))
-            stretch_dic = stretch_calculator.stretch_counter(list_exon, cur_stretch, sequence_boundaries)
-            cur_file.write("stretch_%sX%s = %s\n" % (cur_stretch[0], cur_stretch[1], str(stretch_dic)))
+        for i, cur_stretch in enumerate(stretches):
+            cur_file.write("stretch_%sX%s = %s\n" % (cur_stretch[0], cur_stretch[1], str(results[i])))
         cur_file.close()
+        checkpoint.clear_checkpoint(cnx_checkpoint, checkpoint_name)
 
 
 def main():